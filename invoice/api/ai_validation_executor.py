@@ -0,0 +1,342 @@
+"""
+Asenkron AI validation executor (AsyncOpenAI)
+(doctype, name) listesindeki faturalar tek event loop'ta, ortak bir semaphore ile sınırlı sayıda
+eşzamanlı LLM çağrısıyla doğrulanır. Dakikalık istek ve token limitleri token bucket ile uygulanır;
+429 / 5xx / bağlantı hatalarında jitter'lı exponential backoff yapılır (Retry-After varsa ona uyulur).
+LLM çağrıları sürerken DB'ye dokunulmaz: chunk'ın mesajları önceden hazırlanır, sonuçları chunk
+sonunda toplu yazılır (DocType başına bulk_update + tek commit).
+
+Site config:
+- invoice_ai_validation_concurrency: eşzamanlı LLM çağrısı (varsayılan 4)
+- invoice_ai_requests_per_minute: dakikalık istek limiti (varsayılan 500, 0 = limitsiz)
+- invoice_ai_tokens_per_minute: dakikalık token limiti (varsayılan 150000, 0 = limitsiz)
+- invoice_ai_max_retries: 429 / 5xx için tekrar deneme sayısı (varsayılan 5)
+- openai_base_url: OpenAI uyumlu endpoint (test için yerel mock sunucu)
+"""
+
+import asyncio
+import json
+import random
+import time
+
+import frappe
+from frappe.utils import cint, flt
+
+try:
+    from openai import APIConnectionError, AsyncOpenAI
+except ImportError:
+    APIConnectionError = None
+    AsyncOpenAI = None
+
+from invoice.api.constants import (
+    AI_VALIDATION_BACKOFF_BASE,
+    AI_VALIDATION_BACKOFF_MAX,
+    AI_VALIDATION_CONCURRENCY_DEFAULT,
+    AI_VALIDATION_MAX_RETRIES_DEFAULT,
+    AI_VALIDATION_MAX_TOKENS,
+    AI_VALIDATION_REQUESTS_PER_MINUTE_DEFAULT,
+    AI_VALIDATION_STATUS_ERROR,
+    AI_VALIDATION_TOKENS_PER_MINUTE_DEFAULT,
+    AI_VALIDATION_WRITE_CHUNK_SIZE,
+)
+from invoice.api.invoice_ai_validation import (
+    build_validation_messages,
+    clean_response_text,
+    get_completion_kwargs,
+    get_json_fix_kwargs,
+    get_openai_settings,
+    load_fixed_json,
+    load_validation_json,
+    report_parse_error,
+)
+
+logger = frappe.logger("invoice.ai_validation_executor", allow_site=frappe.local.site)
+
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+
+def _conf_int(key, default):
+    value = frappe.conf.get(key)
+    return default if value is None else cint(value)
+
+
+def get_concurrency(concurrency=None):
+    if not cint(concurrency):
+        concurrency = frappe.conf.get("invoice_ai_validation_concurrency")
+    return max(cint(concurrency) or AI_VALIDATION_CONCURRENCY_DEFAULT, 1)
+
+
+def get_executor_settings(concurrency=None):
+    return {
+        "concurrency": get_concurrency(concurrency),
+        "requests_per_minute": _conf_int("invoice_ai_requests_per_minute", AI_VALIDATION_REQUESTS_PER_MINUTE_DEFAULT),
+        "tokens_per_minute": _conf_int("invoice_ai_tokens_per_minute", AI_VALIDATION_TOKENS_PER_MINUTE_DEFAULT),
+        "max_retries": _conf_int("invoice_ai_max_retries", AI_VALIDATION_MAX_RETRIES_DEFAULT),
+    }
+
+
+def get_async_openai_client():
+    """AsyncOpenAI client (SDK'nın kendi retry'ı kapalı, backoff executor'da)"""
+    if AsyncOpenAI is None:
+        frappe.throw("OpenAI paketi yüklü değil. Lütfen 'pip install openai' komutu ile yükleyin.")
+    api_key, base_url = get_openai_settings()
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+
+def estimate_tokens(kwargs):
+    """İstek token tahmini (~4 karakter / token + yanıt üst sınırı) - yanıttaki usage ile düzeltilir"""
+    chars = sum(len(message.get("content") or "") for message in kwargs["messages"])
+    return chars // 4 + kwargs.get("max_tokens", AI_VALIDATION_MAX_TOKENS)
+
+
+class TokenBucket:
+    """
+    Dakikalık limit: kapasite = limit, saniyede limit / 60 dolar. limit 0 = limitsiz.
+    acquire token'ları hemen ayırır (bakiye eksiye düşebilir) ve sadece açık kadar bekler: bekleyenler
+    birbirini bloklamaz, sıra geliş sırasıdır (FIFO) ve büyük istekler küçüklerin arkasında aç kalmaz.
+    """
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = flt(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        if not self.capacity:
+            return
+        # Tek istek kapasiteden büyükse kapasite kadar beklenir (aksi halde hiç geçemez)
+        amount = min(amount, self.capacity)
+        # Event loop tek thread: refill + ayırma arasında await yok, kilit gerekmez
+        self._refill()
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def adjust(self, delta):
+        """Tahmin ile gerçek kullanım farkı (pozitif = fazladan harcanan)"""
+        if self.capacity:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return APIConnectionError is not None and isinstance(error, APIConnectionError)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    return flt(headers.get("retry-after"))
+
+
+class ValidationExecutor:
+    """
+    items: [(key, messages)] → {key: validation_result veya Exception}
+    should_stop() True dönerse yeni çağrı başlatılmaz (başlamamış key'ler sonuçta yer almaz).
+    on_result(key, result) her sonuçta event loop thread'inde çağrılır.
+    """
+
+    def __init__(
+        self,
+        client,
+        concurrency,
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        max_retries=AI_VALIDATION_MAX_RETRIES_DEFAULT,
+        should_stop=None,
+        on_result=None,
+    ):
+        self.client = client
+        self.concurrency = max(cint(concurrency), 1)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max(cint(max_retries), 0)
+        self.should_stop = should_stop
+        self.on_result = on_result
+        self.stats = {"requests": 0, "retries": 0, "tokens": 0}
+
+    async def _create(self, kwargs):
+        """Rate limit'li çağrı; 429 / 5xx / bağlantı hatasında jitter'lı exponential backoff"""
+        estimate = estimate_tokens(kwargs)
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimate)
+            try:
+                response = await self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                # Full jitter: [0, min(max, base * 2^attempt)], Retry-After alt sınır
+                backoff = min(AI_VALIDATION_BACKOFF_MAX, AI_VALIDATION_BACKOFF_BASE * 2**attempt)
+                delay = max(_retry_after(e), random.uniform(0, backoff))
+                self.stats["retries"] += 1
+                logger.warning(f"LLM çağrısı tekrar denenecek ({attempt + 1}/{self.max_retries}, {delay:.1f}s): {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+
+            self.stats["requests"] += 1
+            usage = getattr(response, "usage", None)
+            used = cint(getattr(usage, "total_tokens", 0)) if usage else 0
+            if used:
+                self.stats["tokens"] += used
+                self.tokens.adjust(used - estimate)
+            return response
+
+    async def validate(self, messages):
+        """request_validation'ın asenkron karşılığı (JSON mode → normal mod, parse → AI'a düzelttirme)"""
+        try:
+            response = await self._create(get_completion_kwargs(messages))
+        except Exception as api_error:
+            if _status_code(api_error) != 400:
+                raise
+            # Eğer model JSON mode desteklemiyorsa, normal modda dene
+            logger.warning(f"JSON mode desteklenmiyor, normal modda denenecek: {str(api_error)}")
+            response = await self._create(get_completion_kwargs(messages, json_mode=False))
+
+        response_text = clean_response_text(response.choices[0].message.content.strip())
+        try:
+            return load_validation_json(response_text)
+        except json.JSONDecodeError as parse_error:
+            logger.warning("Tüm parse denemeleri başarısız, AI'dan tekrar isteniyor...")
+            try:
+                retry_response = await self._create(get_json_fix_kwargs(response_text))
+                return load_fixed_json(retry_response.choices[0].message.content)
+            except Exception as retry_error:
+                logger.error(f"Retry parse başarısız: {str(retry_error)}")
+                raise parse_error
+
+    async def run(self, items):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = {}
+
+        async def worker(key, messages):
+            async with semaphore:
+                if self.should_stop and self.should_stop():
+                    return
+                try:
+                    result = await self.validate(messages)
+                except Exception as e:
+                    result = e
+            results[key] = result
+            if self.on_result:
+                self.on_result(key, result)
+
+        await asyncio.gather(*(worker(key, messages) for key, messages in items))
+        return results
+
+
+def _error_values(error):
+    return {
+        "ai_validation_status": AI_VALIDATION_STATUS_ERROR,
+        "ai_validation_summary": f"Error: {str(error)}"[:200],
+        "ai_validation_date": frappe.utils.now(),
+    }
+
+
+def _result_values(validation_result):
+    """update_ai_validation_fields ile aynı alanlar"""
+    confidence = validation_result.get("confidence")
+    return {
+        "ai_validation_status": validation_result.get("status", AI_VALIDATION_STATUS_ERROR),
+        "ai_validation_summary": (validation_result.get("summary") or "")[:200],
+        "ai_validation_confidence": confidence * 100 if confidence else None,
+        "ai_validation_result": json.dumps(validation_result, indent=2, ensure_ascii=False),
+        "ai_validation_date": frappe.utils.now(),
+    }
+
+
+def write_validation_results(results):
+    """{(doctype, name): sonuç veya Exception} → DocType (ve alan kümesi) başına bulk_update, tek commit"""
+    updates = {}
+    for (doctype, name), result in results.items():
+        if isinstance(result, Exception):
+            if isinstance(result, json.JSONDecodeError):
+                result = report_parse_error(result)
+            else:
+                frappe.log_error(
+                    title="AI Validation Error",
+                    message=f"Invoice: {doctype} / {name}\nError: {str(result)}",
+                )
+            values = _error_values(result)
+        else:
+            values = _result_values(result)
+        # Aynı alan kümesine sahip satırlar birlikte yazılır (hata satırları önceki sonucu silmez)
+        updates.setdefault((doctype, tuple(values)), {})[name] = values
+
+    for (doctype, _fields), doc_updates in updates.items():
+        # Submit edilmiş faturalarda da çalışır (set_value gibi doğrudan UPDATE)
+        frappe.db.bulk_update(doctype, doc_updates, update_modified=False)
+    frappe.db.commit()
+
+
+def _prepare_items(pairs):
+    """(doctype, name) → [(key, messages)], hazırlanamayanlar için {key: Exception}"""
+    items, failed = [], {}
+    for doctype, name in pairs:
+        try:
+            items.append(((doctype, name), build_validation_messages(frappe.get_doc(doctype, name))))
+        except Exception as e:
+            frappe.clear_messages()
+            failed[(doctype, name)] = e
+    return items, failed
+
+
+async def _validate_chunks(executor, pairs, should_stop, on_result, on_written):
+    """Tek event loop: chunk hazırla (DB) → paralel doğrula → toplu yaz (DB)"""
+    results = {}
+    for start in range(0, len(pairs), AI_VALIDATION_WRITE_CHUNK_SIZE):
+        if should_stop and should_stop():
+            break
+        items, chunk_results = _prepare_items(pairs[start:start + AI_VALIDATION_WRITE_CHUNK_SIZE])
+        for key, error in chunk_results.items():
+            if on_result:
+                on_result(key, error)
+        chunk_results.update(await executor.run(items))
+        write_validation_results(chunk_results)
+        if on_written:
+            on_written(chunk_results)
+        results.update(chunk_results)
+    return results
+
+
+def validate_invoices(pairs, concurrency=None, should_stop=None, on_result=None, on_written=None, client=None):
+    """
+    (doctype, name) listesini asenkron executor ile doğrula; sonuçlar AI_VALIDATION_WRITE_CHUNK_SIZE'lık
+    chunk'lar halinde toplu yazılır (her chunk commit'inden sonra on_written çağrılır)
+    → {(doctype, name): sonuç veya Exception}
+    """
+    settings = get_executor_settings(concurrency)
+    executor = ValidationExecutor(
+        client or get_async_openai_client(),
+        settings["concurrency"],
+        requests_per_minute=settings["requests_per_minute"],
+        tokens_per_minute=settings["tokens_per_minute"],
+        max_retries=settings["max_retries"],
+        should_stop=should_stop,
+        on_result=on_result,
+    )
+
+    pairs = [tuple(pair) for pair in pairs]
+    started = time.monotonic()
+    results = asyncio.run(_validate_chunks(executor, pairs, should_stop, on_result, on_written))
+
+    logger.info(
+        f"AI validation: {len(results)}/{len(pairs)} fatura, {executor.stats['requests']} istek, "
+        f"{executor.stats['retries']} tekrar, {executor.stats['tokens']} token, "
+        f"{time.monotonic() - started:.1f}s"
+    )
+    return results
@@ -0,0 +1,285 @@
+"""
+Toplu AI validation (arka plan job'u)
+List view'daki "Batch AI Validation" butonu faturaları tarayıcıdan tek tek doğrulamak yerine tek bir
+arka plan job'u başlatır. Doğrulama ai_validation_executor ile yapılır (N eşzamanlı LLM çağrısı,
+istek / token rate limit'i, chunk başına toplu yazma); sekme kapansa da job devam eder.
+
+- İlerleme publish_realtime (invoice_ai_batch_progress) ile başlatan kullanıcıya gönderilir
+- Durum Redis'te tutulur: cancel_batch_ai_validation yeni çağrı başlatılmasını durdurur,
+  resume_batch_ai_validation henüz doğrulanmamış faturalarla devam eder
+
+Site config: bkz. invoice.api.ai_validation_executor
+"""
+
+import json
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import (
+    AI_VALIDATION_BATCH_KEY,
+    AI_VALIDATION_BATCH_STATUS_CANCELLED,
+    AI_VALIDATION_BATCH_STATUS_COMPLETED,
+    AI_VALIDATION_BATCH_STATUS_FAILED,
+    AI_VALIDATION_BATCH_STATUS_QUEUED,
+    AI_VALIDATION_BATCH_STATUS_RUNNING,
+    AI_VALIDATION_BATCH_TTL,
+    AI_VALIDATION_STATUS_ERROR,
+    INVOICE_DOCTYPES,
+    REALTIME_EVENT_AI_BATCH_PROGRESS,
+)
+from invoice.api.ai_validation_executor import get_concurrency, validate_invoices
+
+logger = frappe.logger("invoice.batch_ai_validation", allow_site=frappe.local.site)
+
+COUNTER_FIELDS = ("processed", "valid", "issues", "errors")
+RESULT_COUNTERS = {"Valid": "valid", "Issues Found": "issues"}
+
+
+def _job_id(batch_id):
+    return f"invoice-ai-batch::{batch_id}"
+
+
+def _keys(cache, batch_id):
+    """(durum hash'i, doğrulanmış faturalar set'i)"""
+    key = cache.make_key(f"{AI_VALIDATION_BATCH_KEY}:{batch_id}")
+    return key, f"{key}:done"
+
+
+def get_batch(batch_id):
+    """Batch durumu (faturalar + sayaçlar) veya None"""
+    cache = frappe.cache()
+    batch_key, done_key = _keys(cache, batch_id)
+    values = cache.hgetall(batch_key)
+    if not values:
+        return None
+    batch = {key.decode(): value.decode() for key, value in values.items()}
+    batch["names"] = json.loads(batch.get("names") or "[]")
+    batch["done"] = {name.decode() for name in cache.smembers(done_key)}
+    for field in ("total", "concurrency", "cancel", *COUNTER_FIELDS):
+        batch[field] = cint(batch.get(field))
+    batch["batch_id"] = batch_id
+    return batch
+
+
+def _summary(batch):
+    return {
+        field: batch.get(field)
+        for field in ("batch_id", "doctype", "status", "total", "concurrency", "error", *COUNTER_FIELDS)
+    }
+
+
+def _set_status(batch, status, **values):
+    cache = frappe.cache()
+    batch_key, _done_key = _keys(cache, batch["batch_id"])
+    cache.hset(batch_key, mapping={"status": status, **values})
+    batch.update(status=status, **values)
+
+
+def _is_cancelled(batch_id):
+    cache = frappe.cache()
+    batch_key, _done_key = _keys(cache, batch_id)
+    return cint(cache.hget(batch_key, "cancel"))
+
+
+def _publish_progress(batch, current=None, result_status=None):
+    frappe.publish_realtime(
+        REALTIME_EVENT_AI_BATCH_PROGRESS,
+        {**_summary(batch), "current": current, "result_status": result_status},
+        user=batch["user"],
+    )
+
+
+def _result_status(result):
+    if isinstance(result, Exception):
+        return AI_VALIDATION_STATUS_ERROR
+    return result.get("status", AI_VALIDATION_STATUS_ERROR)
+
+
+def _on_result(batch, key, result):
+    """Her LLM sonucunda canlı ilerleme (sayaçlar Redis'e chunk commit'inden sonra yazılır)"""
+    status = _result_status(result)
+    batch["processed"] += 1
+    batch[RESULT_COUNTERS.get(status, "errors")] += 1
+    _publish_progress(batch, current=key[1], result_status=status)
+
+
+def _on_written(batch, chunk_results):
+    """
+    Chunk commit edildi: başarılı faturaları tamamlandı işaretle ve sayaçları artır (atomik).
+    Hata alan faturalar (429, timeout, parse hatası) done'a eklenmez; resume'da tekrar doğrulanır.
+    """
+    counters = {}
+    succeeded = []
+    for (_doctype, name), result in chunk_results.items():
+        status = _result_status(result)
+        counter = RESULT_COUNTERS.get(status, "errors")
+        counters[counter] = counters.get(counter, 0) + 1
+        if status != AI_VALIDATION_STATUS_ERROR:
+            succeeded.append(name)
+
+    cache = frappe.cache()
+    batch_key, done_key = _keys(cache, batch["batch_id"])
+    pipe = cache.pipeline()
+    if succeeded:
+        pipe.sadd(done_key, *succeeded)
+        pipe.expire(done_key, AI_VALIDATION_BATCH_TTL)
+    # processed = done set'indeki fatura sayısı
+    pipe.hincrby(batch_key, "processed", len(succeeded))
+    for counter, count in counters.items():
+        pipe.hincrby(batch_key, counter, count)
+    pipe.execute()
+
+
+def run_batch_ai_validation(batch_id):
+    """Arka plan job'u: doğrulanmamış faturaları asenkron executor ile doğrula"""
+    batch = get_batch(batch_id)
+    if not batch:
+        logger.warning(f"Batch AI validation bulunamadı (süresi dolmuş olabilir): {batch_id}")
+        return None
+    if batch["cancel"]:
+        _set_status(batch, AI_VALIDATION_BATCH_STATUS_CANCELLED)
+        _publish_progress(batch)
+        return _summary(batch)
+
+    pending = [name for name in batch["names"] if name not in batch["done"]]
+    _set_status(batch, AI_VALIDATION_BATCH_STATUS_RUNNING)
+    _publish_progress(batch)
+    logger.info(
+        f"Batch AI validation başladı: {batch_id} - {len(pending)}/{batch['total']} fatura, "
+        f"{batch['concurrency']} eşzamanlı çağrı"
+    )
+
+    try:
+        validate_invoices(
+            [(batch["doctype"], name) for name in pending],
+            concurrency=batch["concurrency"],
+            should_stop=lambda: _is_cancelled(batch_id),
+            on_result=lambda key, result: _on_result(batch, key, result),
+            on_written=lambda chunk_results: _on_written(batch, chunk_results),
+        )
+    except Exception as e:
+        frappe.clear_messages()
+        logger.error(f"Batch AI validation durdu: {batch_id} - {str(e)}")
+        frappe.log_error(title="Batch AI Validation Error", message=f"Batch: {batch_id}\n{frappe.get_traceback()}")
+        # Commit edilmemiş chunk'ın sonuçları resume'da tekrar doğrulanır
+        batch = get_batch(batch_id)
+        _set_status(batch, AI_VALIDATION_BATCH_STATUS_FAILED, error=str(e)[:200])
+        _publish_progress(batch)
+        return _summary(batch)
+
+    # Durum iptal bayrağından belirlenir (sayaçlar sadece commit edilmiş chunk'ları içerir)
+    batch = get_batch(batch_id)
+    _set_status(batch, AI_VALIDATION_BATCH_STATUS_CANCELLED if batch["cancel"] else AI_VALIDATION_BATCH_STATUS_COMPLETED)
+    _publish_progress(batch)
+    logger.info(
+        f"Batch AI validation {batch['status']}: {batch_id} - {batch['processed']}/{batch['total']} fatura, "
+        f"{batch['valid']} valid, {batch['issues']} issues, {batch['errors']} hata"
+    )
+    return _summary(batch)
+
+
+def _enqueue(batch_id, total):
+    frappe.enqueue(
+        "invoice.api.batch_ai_validation.run_batch_ai_validation",
+        queue="long",
+        timeout=max(3600, total * 60),
+        job_id=_job_id(batch_id),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        batch_id=batch_id,
+    )
+
+
+def _get_permitted_batch(batch_id):
+    batch = get_batch(batch_id)
+    if not batch:
+        frappe.throw(f"Batch AI validation bulunamadı: {batch_id}")
+    if batch["user"] != frappe.session.user and "System Manager" not in frappe.get_roles():
+        frappe.throw("Bu batch'e erişim yetkiniz yok", frappe.PermissionError)
+    return batch
+
+
+@frappe.whitelist()
+def enqueue_batch_ai_validation(doctype, names, concurrency=None):
+    """Seçili faturaların AI validation'ını arka planda başlat → batch özeti (batch_id ile)"""
+    if doctype not in INVOICE_DOCTYPES:
+        frappe.throw(f"Geçersiz DocType: {doctype}")
+    frappe.has_permission(doctype, "write", throw=True)
+    if isinstance(names, str):
+        names = frappe.parse_json(names)
+    names = list(dict.fromkeys(names or []))
+    if not names:
+        frappe.throw("Lütfen validasyon yapmak istediğiniz invoice'ları seçin.")
+
+    # Sonuçlar frappe.db.bulk_update ile yazılır (doküman izni kontrol edilmez): kullanıcının
+    # yazamadığı faturalar baştan batch'e alınmaz
+    permitted = [name for name in names if frappe.has_permission(doctype, "write", doc=name)]
+    if not permitted:
+        frappe.throw("Seçili invoice'lar için yazma yetkiniz yok", frappe.PermissionError)
+    if len(permitted) < len(names):
+        frappe.msgprint(f"{len(names) - len(permitted)} invoice için yazma yetkiniz yok, batch'e eklenmedi")
+    names = permitted
+
+    batch_id = frappe.generate_hash(length=10)
+    cache = frappe.cache()
+    batch_key, _done_key = _keys(cache, batch_id)
+    pipe = cache.pipeline()
+    pipe.hset(
+        batch_key,
+        mapping={
+            "doctype": doctype,
+            "user": frappe.session.user,
+            "names": json.dumps(names),
+            "total": len(names),
+            "concurrency": get_concurrency(concurrency),
+            "status": AI_VALIDATION_BATCH_STATUS_QUEUED,
+            "cancel": 0,
+            **{field: 0 for field in COUNTER_FIELDS},
+        },
+    )
+    pipe.expire(batch_key, AI_VALIDATION_BATCH_TTL)
+    pipe.execute()
+
+    _enqueue(batch_id, len(names))
+    return _summary(get_batch(batch_id))
+
+
+@frappe.whitelist()
+def cancel_batch_ai_validation(batch_id):
+    """Çalışan batch'i durdur: başlamış LLM çağrıları tamamlanır, yenileri başlatılmaz"""
+    batch = _get_permitted_batch(batch_id)
+    cache = frappe.cache()
+    batch_key, _done_key = _keys(cache, batch_id)
+    cache.hset(batch_key, "cancel", 1)
+    return _summary(batch)
+
+
+@frappe.whitelist()
+def resume_batch_ai_validation(batch_id, concurrency=None):
+    """İptal edilmiş / yarım kalmış / hata alan faturaları olan batch'e doğrulanmamış faturalarla devam et"""
+    from frappe.utils.background_jobs import is_job_enqueued
+
+    batch = _get_permitted_batch(batch_id)
+    if len(batch["done"]) >= batch["total"]:
+        return _summary(batch)
+    if is_job_enqueued(_job_id(batch_id)):
+        frappe.throw("Bu batch zaten çalışıyor")
+
+    cache = frappe.cache()
+    batch_key, done_key = _keys(cache, batch_id)
+    # Hata alan faturalar tekrar doğrulanacak: hata sayacı sıfırdan başlar
+    values = {"cancel": 0, "error": "", "errors": 0}
+    if cint(concurrency):
+        values["concurrency"] = get_concurrency(concurrency)
+    _set_status(batch, AI_VALIDATION_BATCH_STATUS_QUEUED, **values)
+    cache.expire(batch_key, AI_VALIDATION_BATCH_TTL)
+    cache.expire(done_key, AI_VALIDATION_BATCH_TTL)
+    _enqueue(batch_id, batch["total"] - len(batch["done"]))
+    return _summary(batch)
+
+
+@frappe.whitelist()
+def get_batch_ai_validation_status(batch_id):
+    """Batch ilerlemesi (sayaçlar + durum)"""
+    return _summary(_get_permitted_batch(batch_id))
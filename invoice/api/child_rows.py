@@ -0,0 +1,81 @@
+"""
+Child table toplu kayıt
+Büyük faturalarda (binlerce sipariş satırı) her satır için ayrı INSERT yerine satırlar
+chunk'lar halinde çok satırlı INSERT ile yazılır. name/parent/idx gibi standart alanlar
+önceden üretilir; satırlar generator ile akıtılır, bellekte Document nesnesi oluşmaz.
+
+Site config:
+- invoice_child_bulk_threshold: toplam satır sayısı bu değere ulaşınca toplu kayıt kullanılır
+  (varsayılan 200, 0 = her zaman ORM)
+"""
+
+from itertools import chain
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import (
+    CHILD_BULK_INSERT_CHUNK_SIZE,
+    CHILD_BULK_INSERT_THRESHOLD_DEFAULT,
+)
+
+logger = frappe.logger("invoice.child_rows", allow_site=frappe.local.site)
+
+STANDARD_CHILD_FIELDS = (
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "idx", "parent", "parentfield", "parenttype",
+)
+
+
+def get_bulk_threshold():
+    threshold = frappe.conf.get("invoice_child_bulk_threshold")
+    return CHILD_BULK_INSERT_THRESHOLD_DEFAULT if threshold is None else cint(threshold)
+
+
+def use_bulk_insert(row_count):
+    """Satır sayısı eşiği geçtiyse True"""
+    threshold = get_bulk_threshold()
+    return threshold > 0 and row_count >= threshold
+
+
+def _row_values(row):
+    return row._asdict() if hasattr(row, "_asdict") else row
+
+
+def bulk_insert_child_rows(parent_doc, parentfield, child_doctype, rows, chunk_size=CHILD_BULK_INSERT_CHUNK_SIZE):
+    """Kayıtlı parent doc için child satırlarını toplu yaz, yazılan satır sayısını döndür.
+
+    rows: namedtuple veya dict; alanlar ilk satırdan alınır. Satırlar validate/hook'lardan geçmez,
+    bu yüzden sadece parser'ın ürettiği düz veri için kullanılmalı.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+
+    first = _row_values(first)
+    row_fields = tuple(first)
+    now = frappe.utils.now()
+    user = frappe.session.user
+    start_idx = len(parent_doc.get(parentfield) or [])
+    count = 0
+
+    def values():
+        nonlocal count
+        for idx, row in enumerate(chain((first,), rows), start=start_idx + 1):
+            row = _row_values(row)
+            count += 1
+            yield (
+                frappe.generate_hash(length=10), now, now, user, user, 0,
+                idx, parent_doc.name, parentfield, parent_doc.doctype,
+                *(row.get(field) for field in row_fields),
+            )
+
+    frappe.db.bulk_insert(
+        child_doctype,
+        STANDARD_CHILD_FIELDS + row_fields,
+        values(),
+        chunk_size=chunk_size,
+    )
+    logger.info(f"{child_doctype}: {count} satır toplu yazıldı ({parent_doc.name})")
+    return count
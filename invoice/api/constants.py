@@ -26,6 +26,14 @@ DOCTYPE_UBER_EATS_INVOICE = "Uber Eats Invoice"
 DOCTYPE_COMMUNICATION = "Communication"
 DOCTYPE_FILE = "File"
 DOCTYPE_USER = "User"
+DOCTYPE_NOTIFICATION_LOG = "Notification Log"
+DOCTYPE_INVOICE_INGESTION_LOG = "Invoice Ingestion Log"
+DOCTYPE_INVOICE_PDF_FINGERPRINT = "Invoice PDF Fingerprint"
+DOCTYPE_INVOICE_RAW_TEXT = "Invoice Raw Text"
+DOCTYPE_WOLT_PENDING_NETTING = "Wolt Pending Netting"
+DOCTYPE_INVOICE_LEDGER_ENTRY = "Invoice Ledger Entry"
+DOCTYPE_LIEFERANDO_INVOICE_ORDER_ITEM = "Lieferando Invoice Order Item"
+DOCTYPE_LIEFERANDO_INVOICE_TIP_ITEM = "Lieferando Invoice Tip Item"
 
 # Field Names
 FIELD_PDF_FILE = "pdf_file"
@@ -39,6 +47,24 @@ PLATFORM_WOLT = "wolt"
 PLATFORM_UBER_EATS = "uber_eats"
 PLATFORM_UNKNOWN = "unknown"
 
+# Platform → fatura DocType'ı
+PLATFORM_INVOICE_DOCTYPES = {
+    PLATFORM_LIEFERANDO: DOCTYPE_LIEFERANDO_INVOICE,
+    PLATFORM_WOLT: DOCTYPE_WOLT_INVOICE,
+    PLATFORM_UBER_EATS: DOCTYPE_UBER_EATS_INVOICE,
+}
+INVOICE_DOCTYPES = tuple(PLATFORM_INVOICE_DOCTYPES.values())
+
+# PDF Kinds (ilk sayfa sınıflandırıcısı)
+PDF_KIND_UBER_EATS_ORDER_SUMMARY = "uber_eats_order_summary"
+PDF_KIND_UBER_EATS = "uber_eats"
+PDF_KIND_WOLT_SELF_BILLING = "wolt_self_billing"
+PDF_KIND_WOLT_NETTING = "wolt_netting"
+PDF_KIND_WOLT_SALES_REPORT = "wolt_sales_report"
+PDF_KIND_WOLT = "wolt"
+PDF_KIND_LIEFERANDO = "lieferando"
+PDF_KIND_UNKNOWN = "unknown"
+
 PLATFORM_NAME_LIEFERANDO = "Lieferando"
 PLATFORM_NAME_WOLT = "Wolt"
 PLATFORM_NAME_UBER_EATS = "Uber Eats"
@@ -67,9 +93,27 @@ NOTIFICATION_TITLE_BATCH_SUMMARY = "Fatura İşleme - Toplu Özet"
 # Realtime Event Types
 REALTIME_EVENT_SHOW_ALERT = "show_alert"
 REALTIME_EVENT_MSGPRINT = "msgprint"
-
-# Session Keys
-SESSION_KEY_INVOICE_STATS = "invoice_processing_stats"
+REALTIME_EVENT_AI_BATCH_PROGRESS = "invoice_ai_batch_progress"
+
+# Notification aggregator (Redis tamponu)
+NOTIFICATION_WINDOW_DEFAULT = 60
+NOTIFICATION_INVOICE_LIMIT = 50
+NOTIFICATION_BUFFER_KEY = "invoice_notify:buffer"
+NOTIFICATION_INVOICES_KEY = "invoice_notify:invoices"
+NOTIFICATION_SUBJECTS_KEY = "invoice_notify:subjects"
+NOTIFICATION_STATS_KEY = "invoice_notify:stats"
+
+# Notification Log oluşturma (site config: invoice_notification_mode)
+# per_email: email başına bir enqueue_create_notification job'u (kullanıcı başına insert)
+# digest: pencere / sync çalışması başına tek job, tüm kullanıcılar için çok satırlı insert
+NOTIFICATION_MODE_PER_EMAIL = "per_email"
+NOTIFICATION_MODE_DIGEST = "digest"
+
+# Ingestion istatistikleri (Redis, worker'lar arası): toplam + dakika / saat bucket'ları
+INGESTION_STATS_KEY = "invoice_ingest_stats"
+INGESTION_STATS_MINUTE_TTL = 2 * 60 * 60
+INGESTION_STATS_HOUR_TTL = 8 * 24 * 60 * 60
+INGESTION_STATS_RECENT_LIMIT = 100
 
 # ============================================================================
 # EMAIL TYPE CONSTANTS
@@ -78,6 +122,99 @@ EMAIL_TYPE_INVOICE = "invoice"
 EMAIL_TYPE_UBER_EATS_REPORT = "uber_eats_report"
 EMAIL_TYPE_WOLT_PAYOUT_REPORT = "wolt_payout_report"
 
+# ============================================================================
+# INGESTION JOB CONSTANTS
+# ============================================================================
+INGESTION_QUEUE_DEFAULT = "invoice_ingest"
+INGESTION_FALLBACK_QUEUE = "long"
+INGESTION_JOB_TIMEOUT = 1500
+INGESTION_MAX_RETRIES_DEFAULT = 3
+INGESTION_SLOT_TTL = 1800
+INGESTION_SLOT_MAX_RETRIES = 30
+INGESTION_SLOT_RETRY_DELAY = 60
+INGESTION_RETRY_BACKOFF_MAX = 900
+INGESTION_RETRY_KEY = "invoice_ingest_retry"
+INVOICE_LOCK_TIMEOUT_DEFAULT = 30
+TEMP_INVOICE_SEQUENCE_KEY = "invoice_temp_number_seq"
+
+# ============================================================================
+# INGESTION LEDGER OUTCOMES
+# ============================================================================
+INGESTION_OUTCOME_CREATED = "Created"
+INGESTION_OUTCOME_ALREADY_PROCESSED = "Already Processed"
+INGESTION_OUTCOME_SKIPPED = "Skipped"
+INGESTION_OUTCOME_NETTING_ATTACHED = "Netting Attached"
+INGESTION_OUTCOME_NETTING_PENDING = "Netting Pending"
+INGESTION_OUTCOME_NETTING_UNMATCHED = "Netting Unmatched"
+INGESTION_OUTCOME_ERROR = "Error"
+INGESTION_OUTCOME_FAILED = "Failed"
+
+# Bu sonuçlar tekrar denenir, diğerleri "settled" kabul edilir
+INGESTION_RETRY_OUTCOMES = (INGESTION_OUTCOME_NETTING_UNMATCHED, INGESTION_OUTCOME_ERROR)
+# Tekrar denenen sonuç bu kadar kez kaydedilen ek Failed olarak sonuçlanır
+# (her Communication kaydında yeniden parse + yeni Error Log olmasın)
+INGESTION_OUTCOME_MAX_ATTEMPTS = 3
+
+# ============================================================================
+# PDF EXTRACTION CONSTANTS
+# ============================================================================
+# Email içindeki PDF'in rolü (sınıflandırma sonrası)
+PDF_ROLE_INVOICE = "invoice"
+PDF_ROLE_NETTING = "netting"
+PDF_ROLE_SKIP = "skip"
+
+# Metin çıkarma backend'i (site config: invoice_pdf_backend)
+PDF_BACKEND_DEFAULT = "pypdf2"
+
+# Fatura PDF eki (site config: invoice_pdf_attach_mode)
+# link: fatura File kaydı Communication ekiyle aynı dosyayı gösterir (ikinci kopya yazılmaz)
+# copy: eski davranış - public klasörüne ikinci bir kopya yazılır
+PDF_ATTACH_MODE_LINK = "link"
+PDF_ATTACH_MODE_COPY = "copy"
+
+# Ham PDF metni yan tabloda sıkıştırılmış tutulur (Invoice Raw Text)
+RAW_TEXT_KIND_PDF = "raw_text"
+RAW_TEXT_KIND_NETTING = "netting_raw_text"
+RAW_TEXT_CODEC_ZLIB = "zlib"
+RAW_TEXT_CODEC_ZSTD = "zstd"
+RAW_TEXT_COMPRESSION_LEVEL = 6
+
+# Ham metin üzerinden toplu yeniden parse (invoice.api.reparse)
+REPARSE_CHUNK_SIZE_DEFAULT = 200
+INVOICE_LEDGER_CHUNK_SIZE = 1000
+
+# SHA-256 parmak izi hesaplanırken dosya bu boyutta parçalar halinde okunur
+PDF_FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+# Process pool (site config: invoice_extraction_workers, 0/1 = seri)
+EXTRACTION_WORKERS_DEFAULT = 4
+EXTRACTION_POOL_MIN_JOBS_DEFAULT = 4
+EXTRACTION_START_METHOD_DEFAULT = "forkserver"
+
+# Toplu AI validation (site config: invoice_ai_validation_concurrency = paralel LLM çağrısı)
+AI_VALIDATION_CONCURRENCY_DEFAULT = 4
+AI_VALIDATION_MODEL = "gpt-4o"
+AI_VALIDATION_MAX_TOKENS = 2000
+AI_VALIDATION_STATUS_ERROR = "Error"
+# Asenkron executor (site config: invoice_ai_requests_per_minute, invoice_ai_tokens_per_minute, invoice_ai_max_retries)
+AI_VALIDATION_REQUESTS_PER_MINUTE_DEFAULT = 500
+AI_VALIDATION_TOKENS_PER_MINUTE_DEFAULT = 150000
+AI_VALIDATION_MAX_RETRIES_DEFAULT = 5
+AI_VALIDATION_BACKOFF_BASE = 1
+AI_VALIDATION_BACKOFF_MAX = 60
+AI_VALIDATION_WRITE_CHUNK_SIZE = 50
+AI_VALIDATION_BATCH_KEY = "invoice_ai_batch"
+AI_VALIDATION_BATCH_TTL = 7 * 24 * 60 * 60
+AI_VALIDATION_BATCH_STATUS_QUEUED = "Queued"
+AI_VALIDATION_BATCH_STATUS_RUNNING = "Running"
+AI_VALIDATION_BATCH_STATUS_CANCELLED = "Cancelled"
+AI_VALIDATION_BATCH_STATUS_COMPLETED = "Completed"
+AI_VALIDATION_BATCH_STATUS_FAILED = "Failed"
+
+# Child table toplu kayıt (site config: invoice_child_bulk_threshold, 0 = her zaman ORM)
+CHILD_BULK_INSERT_THRESHOLD_DEFAULT = 200
+CHILD_BULK_INSERT_CHUNK_SIZE = 1000
+
 # ============================================================================
 # LOG MESSAGE CONSTANTS
 # ============================================================================
@@ -0,0 +1,102 @@
+"""
+PDF extraction process pool
+Çok PDF'li email'lerde (Wolt payout, UberEats Aktivitätsübersicht) PDF metin çıkarma ve
+regex extraction CPU-bound olduğu için işler ayrı process'lere dağıtılır.
+Worker fonksiyonları saf olmalıdır (bytes in, dict out) - DB'ye erişmezler (bkz. extraction_worker).
+
+- Pool RQ worker process'i başına bir kez kurulur ve job'lar arasında yeniden kullanılır
+- fork yerine forkserver / spawn: worker'lar açık DB / Redis soketlerini miras almaz
+- Site, worker sayısı veya fatura numarası index versiyonu değişince pool yeniden kurulur
+- invoice_extraction_pool_min_pdfs'ten az PDF seri işlenir (process başlatma / IPC maliyeti)
+
+Site config:
+- invoice_extraction_workers: worker process sayısı (varsayılan min(4, CPU), 0/1 = seri)
+- invoice_extraction_pool_min_pdfs: pool kullanılacak en az PDF sayısı (varsayılan 4)
+- invoice_extraction_start_method: "forkserver" (varsayılan) veya "spawn"
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api import invoice_index
+from invoice.api.constants import (
+    EXTRACTION_POOL_MIN_JOBS_DEFAULT,
+    EXTRACTION_START_METHOD_DEFAULT,
+    EXTRACTION_WORKERS_DEFAULT,
+)
+from invoice.api.extraction_worker import init_worker
+
+logger = frappe.logger("invoice.extraction_pool", allow_site=frappe.local.site)
+
+# Process boyunca yaşayan pool: {"key": (site, worker sayısı, index versiyonu), "executor": ...}
+_pool = {"key": None, "executor": None}
+
+
+def get_extraction_workers(job_count):
+    """Kullanılacak worker sayısı; 1 veya daha az ise seri çalışılır"""
+    min_jobs = frappe.conf.get("invoice_extraction_pool_min_pdfs")
+    min_jobs = EXTRACTION_POOL_MIN_JOBS_DEFAULT if min_jobs is None else cint(min_jobs)
+    if job_count < max(min_jobs, 2):
+        return 0
+
+    configured = frappe.conf.get("invoice_extraction_workers")
+    if configured is None:
+        workers = min(EXTRACTION_WORKERS_DEFAULT, os.cpu_count() or 1)
+    else:
+        workers = cint(configured)
+    return max(0, min(workers, job_count))
+
+
+def _get_context():
+    method = frappe.conf.get("invoice_extraction_start_method") or EXTRACTION_START_METHOD_DEFAULT
+    if method not in multiprocessing.get_all_start_methods():
+        method = "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _get_executor(workers):
+    version, numbers = invoice_index.snapshot()
+    key = (frappe.local.site, workers, version)
+    if _pool["executor"] is not None and _pool["key"] == key:
+        return _pool["executor"]
+
+    shutdown_pool()
+    _pool["executor"] = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_get_context(),
+        initializer=init_worker,
+        initargs=(frappe.local.site, dict(frappe.conf), numbers),
+    )
+    _pool["key"] = key
+    logger.info(f"Extraction process pool kuruldu: {workers} worker")
+    return _pool["executor"]
+
+
+def shutdown_pool():
+    executor = _pool["executor"]
+    _pool["executor"] = _pool["key"] = None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_extraction_pool(worker, jobs, workers):
+    """
+    jobs: worker'a verilecek argüman tuple'ları. Sonuçlar aynı sırada döner.
+    Pool kurulamazsa veya çökerse exception fırlatır - çağıran seri moda düşmelidir.
+    """
+    executor = _get_executor(workers)
+    try:
+        futures = [executor.submit(worker, *job) for job in jobs]
+        results = [future.result() for future in futures]
+    except BrokenProcessPool:
+        # Çöken worker pool'u kullanılamaz; bir sonraki çağrıda yeniden kurulur
+        shutdown_pool()
+        raise
+
+    logger.info(f"Process pool extraction tamamlandı: {len(jobs)} PDF, {workers} worker")
+    return results
@@ -0,0 +1,59 @@
+"""
+Extraction process pool worker'ları
+Pool spawn / forkserver ile başlatılır: worker'lar RQ worker'ının DB / Redis bağlantılarını miras
+almaz. Bu modül import edilirken frappe context'ine dokunmaz; init_worker site context'ini (DB
+bağlantısı olmadan) kurar ve sadece saf extractor modüllerini yükler.
+
+Job fonksiyonları hem pool'da hem seri modda çalışır. `today` pool'da parent'ın günüdür
+(parse_date DB'ye gitmez); seri modda None verilir ve frappe.utils.today kullanılır.
+"""
+
+import traceback
+
+import frappe
+
+
+def init_worker(site, conf, invoice_numbers):
+    """Pool initializer: site + site config, saf extractor'lar ve fatura numarası index kopyası"""
+    frappe.local.site = site
+    frappe.local.conf = frappe._dict(conf)
+    frappe.local.flags = frappe._dict()
+
+    from invoice.api import invoice_extraction, invoice_index  # noqa: F401
+
+    invoice_index.load_snapshot(invoice_numbers)
+
+
+def prepare_pdf_job(today, file_name, content_hash, content, email_type):
+    """bytes in, sınıflandırma/extraction sonucu + sayfa metinleri out"""
+    from invoice.api.constants import PDF_ROLE_INVOICE
+    from invoice.api.field_extraction import set_fallback_date
+    from invoice.api.invoice_extraction import prepare_pdf
+    from invoice.api.pdf_cache import ParsedPDF
+
+    set_fallback_date(today)
+    parsed = ParsedPDF(content_hash, content=content)
+    try:
+        result = prepare_pdf(file_name, parsed, email_type)
+    except Exception:
+        result = {"kind": None, "role": PDF_ROLE_INVOICE, "data": {"raw_text": "", "confidence": 0}, "error": traceback.format_exc()}
+
+    try:
+        result["pages"] = parsed.extracted_pages
+    except Exception:
+        result["pages"] = None
+    return result
+
+
+def extract_text_job(today, name, raw_text, platform):
+    """Kayıtlı ham metin → (name, extraction sonucu (raw_text hariç), hata)"""
+    from invoice.api.field_extraction import set_fallback_date
+    from invoice.api.invoice_extraction import extract_invoice_data_from_text
+
+    set_fallback_date(today)
+    try:
+        data = extract_invoice_data_from_text(raw_text, platform)
+        data.pop("raw_text", None)
+        return name, data, None
+    except Exception as e:
+        return name, None, f"{type(e).__name__}: {str(e)}"
@@ -0,0 +1,1014 @@
+"""
+Fatura alan extraction'ı
+Alanlar declarative FieldSpec tablolarıyla tanımlanır; tüm pattern'ler import sırasında bir kez
+derlenir. Her spec bir anahtar kelime ön filtresi taşır - anahtar kelime metinde yoksa regex hiç
+çalıştırılmaz. Sıra veya önceki alanlara bağlı kurallar küçük yardımcı fonksiyonlarda kalır.
+Extractor'lar düz metin veya sayfa bazlı PdfText kabul eder.
+"""
+
+import re
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime
+
+import frappe
+
+from invoice.api.pdf_text import (
+    SCOPE_DOCUMENT,
+    SCOPE_FIRST_PAGE,
+    SOURCE_CLEAN,
+    SOURCE_TEXT,
+    as_pdf_text,
+)
+
+logger = frappe.logger("invoice.field_extraction", allow_site=frappe.local.site)
+
+# Extraction process pool worker'larında parse_date'in DB/cache'e gitmemesi için parent'ta set edilir
+_today_override = None
+
+
+def set_fallback_date(today):
+    """parse_date'in tarih bulunamadığında döndüreceği günü sabitle (None = frappe.utils.today)"""
+    global _today_override
+    _today_override = today
+
+
+def parse_decimal(value: str | None):
+    """String değeri decimal'e çevir"""
+    if value is None:
+        return None
+    clean = value.strip()
+    if not clean:
+        return None
+    clean = clean.replace("€", "").replace("%", "").replace("−", "-").replace(" ", "")
+
+    if "," in clean and "." in clean:
+        clean = clean.replace(".", "").replace(",", ".")
+    else:
+        clean = clean.replace(",", ".")
+
+    try:
+        return float(clean)
+    except ValueError:
+        return None
+
+
+def parse_date(date_str):
+    """Çeşitli tarih formatlarını parse et"""
+    formats = [
+        "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d",
+        "%m/%d/%Y", "%d.%m.%y", "%d/%m/%y",
+    ]
+
+    for fmt in formats:
+        try:
+            parsed_date = datetime.strptime(date_str.strip(), fmt)
+            return parsed_date.strftime("%Y-%m-%d")
+        except:
+            continue
+
+    return _today_override or frappe.utils.today()
+
+
+# ============================================================================
+# CONVERTERS - None dönerse alan yazılmaz (keep_none hariç)
+# ============================================================================
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _comma_float(value):
+    return _float(value.replace(",", "."))
+
+
+def _strip(value):
+    return value.strip()
+
+
+def _strip_or_none(value):
+    return (value or "").strip() or None
+
+
+def _no_spaces(value):
+    return value.replace(" ", "")
+
+
+def _tax_number(value):
+    # Format düzelt (DE36/159/6531 -> DE361596531)
+    return value.strip().replace("/", "")
+
+
+def _dash_date(value):
+    return parse_date(value.replace(".", "-"))
+
+
+def _short_message(value):
+    msg = re.sub(r'\s+', ' ', (value or "").replace("\n", " ").strip())
+    return msg[:255] or None
+
+
+def _constant(result):
+    return lambda _value: result
+
+
+# ============================================================================
+# SPEC ENGINE
+# ============================================================================
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    fields: yazılacak alanlar (groups sırasıyla)
+    patterns: sırayla denenir, ilk eşleşen kazanır
+    keyword: ön filtre - metinde yoksa pattern'ler çalıştırılmaz
+    scope: SCOPE_FIRST_PAGE ise önce sadece ilk sayfa aranır, bulunamazsa tüm doküman
+    only_missing: alanlar zaten doluysa spec atlanır
+    keep_none: converter None dönse de alan yazılır
+    require_all: herhangi bir değer None ise sonraki pattern denenir
+    """
+
+    fields: tuple
+    patterns: tuple
+    converters: tuple
+    groups: tuple
+    keyword: str | None = None
+    ignore_case: bool = False
+    source: str = SOURCE_TEXT
+    scope: str = SCOPE_DOCUMENT
+    only_missing: bool = False
+    keep_none: bool = False
+    require_all: bool = False
+
+
+def field_spec(fields, *patterns, convert=_strip, flags=0, keyword=None, groups=None, **options):
+    """FieldSpec oluştur ve pattern'leri derle"""
+    fields = (fields,) if isinstance(fields, str) else tuple(fields)
+    converters = tuple(convert) if isinstance(convert, (tuple, list)) else (convert,) * len(fields)
+    ignore_case = bool(flags & re.IGNORECASE)
+    return FieldSpec(
+        fields=fields,
+        patterns=tuple(re.compile(pattern, flags) for pattern in patterns),
+        converters=converters,
+        groups=tuple(groups) if groups else tuple(range(1, len(fields) + 1)),
+        keyword=(keyword.lower() if ignore_case else keyword) if keyword else None,
+        ignore_case=ignore_case,
+        **options,
+    )
+
+
+def apply_specs(specs, doc, data=None):
+    """Spec listesini sırayla uygula; data sözlüğünü günceller ve döndürür"""
+    if data is None:
+        data = {}
+    doc = as_pdf_text(doc)
+
+    for spec in specs:
+        if spec.only_missing and all(data.get(field) is not None for field in spec.fields):
+            continue
+
+        scopes = (spec.scope, SCOPE_DOCUMENT) if spec.scope != SCOPE_DOCUMENT and len(doc.pages) > 1 else (SCOPE_DOCUMENT,)
+        for scope in scopes:
+            if _apply_spec(spec, doc, scope, data):
+                break
+
+    return data
+
+
+def _apply_spec(spec, doc, scope, data):
+    if spec.keyword and spec.keyword not in doc.get(spec.source, scope, lower=spec.ignore_case):
+        return False
+
+    text = doc.get(spec.source, scope)
+    for pattern in spec.patterns:
+        match = pattern.search(text)
+        if not match:
+            continue
+        values = [convert(match.group(group)) for group, convert in zip(spec.groups, spec.converters)]
+        if spec.require_all and any(value is None for value in values):
+            continue
+        for field, value in zip(spec.fields, values):
+            if value is not None or spec.keep_none:
+                data[field] = value
+        return True
+    return False
+
+
+# ============================================================================
+# GENERIC (platformdan bağımsız) ALANLAR
+# ============================================================================
+
+# Format: "Rechnungsnummer: UBER_DEU-FIGGGCEE-01-2025-0000001"
+UBER_INVOICE_NUMBER_RE = re.compile(r'Rechnungsnummer:\s*([A-Z0-9_\-]+)', re.IGNORECASE)
+# Format: "Rechnungsnummer DEU/25/HRB274170B/1/35" veya "Rechnungsnummer: DEU/25/HRB274170B/1/35"
+WOLT_INVOICE_NUMBER_RE = re.compile(r'Rechnungsnummer[\s:]+([A-Z]{3}/\d{2}/[A-Z0-9]+(?:/\d+)+)', re.IGNORECASE)
+FALLBACK_INVOICE_NUMBER_RES = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'Rechnungsnummer[\s:]+([A-Z0-9\/\-]+)',
+    r'Invoice\s*(?:Number|No|#)[\s:]+([A-Z0-9\-]+)',
+    r'Rechnung\s*(?:Nr|#)[\s:]+([A-Z0-9\-]+)',
+    r'Fatura\s*(?:No|#)[\s:]+([A-Z0-9\-]+)',
+))
+VAT_ID_RE = re.compile(r'^DE\d{9}$')
+
+TOTAL_RES = (
+    re.compile(r'Total[\s:]*[€$£]?\s*([\d,\.]+)', re.IGNORECASE),
+    re.compile(r'Gesamt[\s:]*[€$£]?\s*([\d,\.]+)', re.IGNORECASE),
+    re.compile(r'Toplam[\s:]*[€$£]?\s*([\d,\.]+)', re.IGNORECASE),
+    re.compile(r'[€$£]\s*([\d,\.]+)', re.IGNORECASE),
+)
+
+GENERIC_SPECS = (
+    field_spec(
+        "invoice_date",
+        r'Date[\s:]*(\d{1,2}[\.\/\-]\d{1,2}[\.\/\-]\d{2,4})',
+        r'Datum[\s:]*(\d{1,2}[\.\/\-]\d{1,2}[\.\/\-]\d{2,4})',
+        r'(\d{1,2}[\.\/\-]\d{1,2}[\.\/\-]\d{2,4})',
+        convert=parse_date,
+    ),
+)
+
+IBAN_SPECS = (
+    field_spec("iban", r'([A-Z]{2}\d{2}[\s]?[\d\s]{10,30})', convert=_no_spaces),
+)
+
+
+def extract_invoice_number(text: str):
+    """Rechnungsnummer: UberEats pattern'i (öncelikli), sonra Wolt formatı, sonra genel pattern'ler"""
+    uber_rechnung_match = UBER_INVOICE_NUMBER_RE.search(text)
+    if uber_rechnung_match:
+        invoice_number = uber_rechnung_match.group(1).strip()
+        logger.info(f"UberEats Rechnungsnummer bulundu: {invoice_number}")
+        return invoice_number
+
+    rechnung_match = WOLT_INVOICE_NUMBER_RE.search(text)
+    if rechnung_match:
+        invoice_number = rechnung_match.group(1).strip()
+        logger.info(f"Rechnungsnummer bulundu: {invoice_number}")
+        return invoice_number
+
+    for pattern in FALLBACK_INVOICE_NUMBER_RES:
+        match = pattern.search(text)
+        if match:
+            invoice_num = match.group(1).strip()
+            # USt.-ID formatını (DE123456789) filtrele
+            if not VAT_ID_RE.match(invoice_num):
+                logger.info(f"Rechnungsnummer bulundu (fallback): {invoice_num}")
+                return invoice_num
+    return None
+
+
+def extract_generic_fields(full_text: str) -> dict:
+    """Platformdan bağımsız alanlar: Rechnungsnummer, tarih, toplam tutar, IBAN"""
+    doc = as_pdf_text(full_text)
+    data = {}
+
+    invoice_number = extract_invoice_number(doc.text)
+    if invoice_number:
+        data["invoice_number"] = invoice_number
+
+    apply_specs(GENERIC_SPECS, doc, data)
+
+    for pattern in TOTAL_RES:
+        matches = pattern.findall(doc.text)
+        if matches:
+            amounts = []
+            for m in matches:
+                try:
+                    amounts.append(float(m.replace(',', '')))
+                except:
+                    pass
+            if amounts:
+                data["total_amount"] = max(amounts)
+                break
+
+    return apply_specs(IBAN_SPECS, doc, data)
+
+
+# ============================================================================
+# LIEFERANDO
+# ============================================================================
+
+LIEFERANDO_SUMMARY_SPECS = (
+    field_spec("customer_number", r'Kundennummer[\s:]*(\d+)', convert=str, keyword="Kundennummer", scope=SCOPE_FIRST_PAGE),
+    field_spec("restaurant_name", r'z\.Hd\.\s*(.+?)(?:\n|$)', keyword="z.Hd."),
+    field_spec(
+        ("period_start", "period_end"),
+        r'(\d{2}-\d{2}-\d{4})\s+bis\s+(?:einschließlich\s+)?(\d{2}-\d{2}-\d{4})',
+        convert=parse_date,
+        keyword="bis",
+    ),
+    # Lieferando.de satırı (toplam sipariş + toplam ciro) - 1. sayfa
+    # Örnek: "Lieferando.de (02-11-2025 bis einschließlich 08-11-2025): 26 Bestellungen im Wert von € 627,59"
+    field_spec(
+        ("total_orders", "total_revenue"),
+        r'Lieferando\.de\s*\([^)]+\)\s*:\s*(\d+)\s+Bestellungen\s+im\s+Wert\s+von\s*€\s*([\d,\.]+)',
+        convert=(_int, parse_decimal),
+        flags=re.IGNORECASE,
+        keyword="Lieferando.de",
+        scope=SCOPE_FIRST_PAGE,
+    ),
+    # Fallback: "Ihr Umsatz in der Zeit ..." satırı (toplam ciro)
+    field_spec(
+        "total_revenue",
+        r'Ihr Umsatz in der Zeit[^€]*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Ihr Umsatz in der Zeit",
+        only_missing=True,
+        scope=SCOPE_FIRST_PAGE,
+    ),
+)
+
+# Fallback: "Gesamt X Bestellungen im Wert von € ..."
+LIEFERANDO_GESAMT_RE = re.compile(r'Gesamt\s+(\d+)\s+Bestellungen?[^€]*€\s*([\d,\.]+)', re.IGNORECASE)
+
+# Verwaltungsgebühr (Online-Zahlungen) satırı: online sipariş sayısı + online sipariş tutarı
+# Örnek: "Verwaltungsgebühr (Online-Zahlungen) (...): 21 Bestellungen im Wert von € 446,50"
+# İkinci pattern satırlar ayrılmış olabilecek durumlar için daha esnek
+LIEFERANDO_ONLINE_SPECS = (
+    field_spec(
+        ("online_paid_orders", "online_paid_amount"),
+        r'Verwaltungsgebühr\s*\(Online-Zahlungen\)\s*\([^)]+\)\s*:\s*(\d+)\s+Bestellungen\s+im\s+Wert\s+von\s*€\s*([\d,\.]+)',
+        r'Verwaltungsgebühr\s*\(Online-Zahlungen\)[\s\S]*?(\d+)\s+Bestellungen\s+im\s+Wert\s+von\s*€\s*([\d,\.]+)',
+        convert=(_int, parse_decimal),
+        flags=re.IGNORECASE | re.MULTILINE | re.DOTALL,
+        keyword="Verwaltungsgebühr",
+    ),
+)
+
+# Verwaltungsgebühr satırındaki rate ve count: "Servicegebühr: € 0,64 x 21"
+LIEFERANDO_ADMIN_RATE_RE = re.compile(
+    r'Verwaltungsgebühr\s*\(Online-Zahlungen\)[\s\S]*?Servicegebühr:\s*€\s*([\d,\.]+)\s*x\s*(\d+)',
+    re.IGNORECASE
+)
+
+LIEFERANDO_TOTALS_SPECS = (
+    field_spec(
+        ("service_fee_rate", "service_fee_amount"),
+        r'Servicegebühr:\s*([\d,\.]+)%[^€]*€\s*[\d,\.]+\s*€\s*([\d,\.]+)',
+        convert=(_comma_float, parse_decimal),
+        keyword="Servicegebühr:",
+    ),
+    field_spec("subtotal", r'Zwischensumme\s*€\s*([\d,\.]+)', convert=parse_decimal, keyword="Zwischensumme"),
+    field_spec(
+        ("tax_rate", "tax_amount"),
+        r'MwSt\.\s*\((\d+)%[^€]*€\s*[\d,\.]+\)\s*€\s*([\d,\.]+)',
+        convert=(_float, parse_decimal),
+        keyword="MwSt.",
+    ),
+    field_spec(
+        "total_amount",
+        r'Gesamtbetrag dieser Rechnung\s*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Gesamtbetrag dieser Rechnung",
+    ),
+    # Chargeback / Reversal (Rückbuchung)
+    # Example: "Rückbuchung 2 Bestellungen im Wert von € 0,89"
+    field_spec(
+        ("chargeback_orders", "chargeback_amount"),
+        r'R[üu]ckbuch\w*\s+(\d+)\s+Bestellungen?\s+im\s+Wert\s+von\s+€\s*([\d,\.]+)',
+        convert=(_int, parse_decimal),
+        flags=re.IGNORECASE,
+        keyword="ckbuch",
+    ),
+    field_spec(
+        "paid_online_payments",
+        r'Verrechnet mit eingegangenen Onlinebezahlungen\s*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Verrechnet mit eingegangenen Onlinebezahlungen",
+    ),
+    field_spec(
+        "outstanding_amount",
+        r'Offener Rechnungsbetrag\s*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Offener Rechnungsbetrag",
+    ),
+    field_spec(
+        "outstanding_balance",
+        r'Ausstehende Onlinebezahlungen am[^€]*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Ausstehende Onlinebezahlungen am",
+    ),
+    field_spec(
+        "payout_amount",
+        r'COLLECTIVE GmbH[^€]*€\s*([\d,\.]+)\s*Datum',
+        convert=parse_decimal,
+        flags=re.DOTALL,
+        keyword="COLLECTIVE GmbH",
+    ),
+    field_spec("customer_company", r'z\.Hd\.\s+(.+?GmbH)', keyword="z.Hd."),
+    field_spec("customer_bank_iban", r'Bankkonto\s+(DE[\d\s]+)', convert=_no_spaces, keyword="Bankkonto"),
+    field_spec("supplier_iban", r'IBAN:\s+(DE[\d\s]+)', convert=_no_spaces, keyword="IBAN:"),
+    field_spec("supplier_ust_idnr", r'USt\.-IdNr\.\s+(DE\d+)', convert=str, keyword="USt.-IdNr."),
+    # Steuernummer (Tax Number): "Steuernummer: DE361596531" veya "Steuernummer: DE36/159/6531"
+    field_spec(
+        "customer_tax_number",
+        r'Steuernummer[:\s]+(DE\d+)',
+        r'Steuernummer[:\s]+([A-Z]{2}\d+)',
+        r'Steuernummer[:\s]+([A-Z]{2}[\d\/]+)',  # DE36/159/6531 formatı
+        convert=_tax_number,
+        flags=re.IGNORECASE,
+        keyword="Steuernummer",
+    ),
+)
+
+# Servicegebühren (cash service fees)
+# Pattern: "Servicegebühren (02-11-2025 bis einschließlich 08-11-2025): 5 Bestellungen im Wert von € 3,38"
+LIEFERANDO_SERVICE_FEES_RE = re.compile(
+    r'Servicegebühren\s*\([^)]+\):\s*(\d+)\s+Bestellungen\s+im\s+Wert\s+von\s+€\s*([\d,\.]+)',
+    re.IGNORECASE
+)
+
+# Einzelauflistung / Trinkgelder satırları: "02-11-2025, 12:38:34 H7HH6B 22,00*" (sonundaki * online)
+ORDER_ROW_RE = re.compile(
+    r'^(?P<dt>\d{2}-\d{2}-\d{4},\s*\d{2}:\d{2}:\d{2})\s+(?P<oid>[A-Z0-9]+)\s+(?P<amt>[\d,\.]+)\*?$'
+)
+TIP_ROW_RE = re.compile(
+    r'^(?P<dt>\d{2}-\d{2}-\d{4},\s*\d{2}:\d{2}:\d{2})\s+(?P<tid>[A-Z0-9]+)\s+(?P<amt>[\d,\.]+)$'
+)
+
+# Kompakt satır kayıtları (dict yerine) - alan adları child tablo alanlarıyla aynı
+OrderItem = namedtuple("OrderItem", ("order_date", "order_id", "amount", "is_online"))
+TipItem = namedtuple("TipItem", ("tip_date", "tip_id", "amount"))
+
+GESCHAEFTSFUEHRER_RE = re.compile(r'Geschäftsführer\s*:\s*([^\n]+)', re.IGNORECASE)
+GESCHAEFTSFUEHRER_BLOCK_RE = re.compile(r'Geschäftsführer\s*:\s*([\s\S]{0,120})', re.IGNORECASE)
+GESCHAEFTSFUEHRER_STOP_RE = re.compile(r'\b(IBAN|USt\.?-IdNr|HRB|Amtsgericht|T:|Tel\.?)\b', re.IGNORECASE)
+
+LIEFERANDO_FOOTER_SPECS = (
+    # Tam "Amtsgericht Berlin-..." metni print format için saklanır
+    field_spec(
+        "supplier_amtsgericht",
+        r'Amtsgericht\s*[:\s]+([^\n]+)',
+        convert=_strip_or_none,
+        groups=(0,),
+        flags=re.IGNORECASE,
+        keyword="Amtsgericht",
+    ),
+    field_spec("supplier_hrb", r'HRB\s*[:\s]+([A-Z0-9]+)', convert=_strip_or_none, flags=re.IGNORECASE, keyword="HRB"),
+    # Confirmation & Payment alanları (sadece bazı dokümanlarda)
+    field_spec(
+        "zu_begleichender_betrag",
+        r'Zu\s+begleichender\s+Betrag\s*:\s*€?\s*([\d,\.]+)',
+        convert=parse_decimal,
+        flags=re.IGNORECASE,
+        keyword="begleichender",
+    ),
+    # Example: "Am 02-11-2025 wurde an Sie ..."
+    field_spec(
+        "confirmation_payment_date",
+        r'Am\s+(\d{2}[-\.]\d{2}[-\.]\d{4})\s+wurde\s+an\s+Sie',
+        convert=_dash_date,
+        flags=re.IGNORECASE,
+        keyword="wurde",
+    ),
+    # "Bestätigungscode" geçen kısa paragraf
+    field_spec(
+        "confirmation_code_message",
+        r'(.{0,10}Bestätigungscode.{0,220})',
+        convert=_short_message,
+        flags=re.IGNORECASE | re.DOTALL,
+        keyword="Bestätigungscode",
+    ),
+    # Stempelkarte (Stamp Card / Loyalty Program)
+    # Pattern: "davon mit Stempelkarte bezahlt **: 1 Bestellung im Wert von € 12,69"
+    field_spec(
+        ("stamp_card_orders", "stamp_card_amount"),
+        r'davon mit Stempelkarte bezahlt\s*\*\*\s*:\s*(\d+)\s+Bestellung[^€]*€\s*([\d,\.]+)',  # With colon
+        r'davon mit Stempelkarte bezahlt\s*\*\*\s+(\d+)\s+Bestellung[^€]*€\s*([\d,\.]+)',  # Without colon
+        r'Stempelkarte bezahlt\s*\*\*\s*:\s*(\d+)\s+Bestellung[^€]*€\s*([\d,\.]+)',  # Alternative format
+        convert=(_int, parse_decimal),
+        flags=re.IGNORECASE,
+        keyword="Stempelkarte bezahlt",
+        require_all=True,
+    ),
+)
+
+
+def _apply_lieferando_gesamt_fallback(doc, data):
+    if data.get("total_orders") and data.get("total_revenue") is not None:
+        return
+    gesamt_match = LIEFERANDO_GESAMT_RE.search(doc.text)
+    if gesamt_match:
+        try:
+            data["total_orders"] = int(gesamt_match.group(1))
+        except ValueError:
+            pass
+        amount = parse_decimal(gesamt_match.group(2))
+        if amount is not None and data.get("total_revenue") is None:
+            data["total_revenue"] = amount
+
+
+def _apply_lieferando_admin_fee(doc, data):
+    admin_rate_match = LIEFERANDO_ADMIN_RATE_RE.search(doc.text)
+    if not admin_rate_match:
+        return
+    rate = parse_decimal(admin_rate_match.group(1))
+    count = _int(admin_rate_match.group(2))
+
+    if rate is not None:
+        data["admin_fee_rate"] = rate
+    if count is not None and (not data.get("online_paid_orders")):
+        data["online_paid_orders"] = count
+    if rate is not None and count is not None:
+        data["admin_fee_amount"] = round(rate * count, 2)
+
+
+def _derive_lieferando_cash(data):
+    # Türetilen değerler (eğer PDF'de doğrudan yoksa)
+    if (data.get("total_orders") is not None and data.get("online_paid_orders") is not None) and not data.get("cash_paid_orders"):
+        cash_orders = max(0, int(data["total_orders"]) - int(data["online_paid_orders"]))
+        if cash_orders > 0:
+            data["cash_paid_orders"] = cash_orders
+
+    if (data.get("total_revenue") is not None and data.get("online_paid_amount") is not None) and data.get("cash_paid_amount") is None:
+        cash_amount = round(float(data["total_revenue"]) - float(data["online_paid_amount"]), 2)
+        if cash_amount > 0:
+            data["cash_paid_amount"] = cash_amount
+
+
+def _apply_lieferando_service_fees(doc, data):
+    servicegebuehren_match = LIEFERANDO_SERVICE_FEES_RE.search(doc.text)
+    if not servicegebuehren_match:
+        return
+    orders = int(servicegebuehren_match.group(1))
+    amount = parse_decimal(servicegebuehren_match.group(2))
+    if amount is not None:
+        # Bu satır cash service fees için olabilir
+        if not data.get("cash_paid_orders") or data.get("cash_paid_orders") == 0:
+            data["cash_paid_orders"] = orders
+        if not data.get("cash_service_fee_amount") or data.get("cash_service_fee_amount") == 0:
+            data["cash_service_fee_amount"] = amount
+
+
+def _iter_table_rows(doc, header_position, row_re):
+    """Başlık satırından sonraki tablo satırları; boş satır veya dipnotta biter"""
+    for line in doc.iter_lines_after(header_position):
+        clean = (line or "").strip()
+        if not clean:
+            break
+        # dipnot / footer gelince dur
+        if clean.startswith("**") or "Powered by TCPDF" in clean:
+            break
+        m = row_re.match(clean)
+        if m:
+            yield clean, m
+
+
+def parse_row_timestamp(value):
+    """"dd-mm-YYYY, HH:MM:SS" için hızlı parser; farklı biçimlerde strptime'a düşer, geçersizse None"""
+    if len(value) == 20 and value[10] == "," and value[11] == " " and value.isascii():
+        try:
+            return datetime(
+                int(value[6:10]), int(value[3:5]), int(value[0:2]),
+                int(value[12:14]), int(value[15:17]), int(value[18:20]),
+            )
+        except ValueError:
+            return None
+    try:
+        return datetime.strptime(value, "%d-%m-%Y, %H:%M:%S")
+    except Exception:
+        return None
+
+
+def iter_order_items(doc):
+    """Einzelauflistung - Order Items (PAGE 2), tablo başlığı: "Datum # €" - satırlar sayfa sayfa üretilir"""
+    doc = as_pdf_text(doc)
+    if doc.order_header is None:
+        return
+
+    for clean, m in _iter_table_rows(doc, doc.order_header, ORDER_ROW_RE):
+        amt = parse_decimal(m.group("amt"))
+        if amt is None:
+            continue
+        yield OrderItem(
+            parse_row_timestamp(m.group("dt")),
+            m.group("oid"),
+            amt,
+            1 if clean.endswith("*") else 0,
+        )
+
+
+def iter_tip_items(doc):
+    """Trinkgelder - Tip Items (PAGE 3): "Trinkgelder erhalten von" satırından sonra "Datum # €" başlığı gelir"""
+    doc = as_pdf_text(doc)
+    if doc.tips_header is None:
+        return
+
+    for _clean, m in _iter_table_rows(doc, doc.tips_header, TIP_ROW_RE):
+        amt = parse_decimal(m.group("amt"))
+        if amt is None:
+            continue
+        yield TipItem(parse_row_timestamp(m.group("dt")), m.group("tid"), amt)
+
+
+def _apply_geschaeftsfuehrer(doc, data):
+    if "geschäftsführer" not in doc.get(lower=True):
+        return
+    gf_match = GESCHAEFTSFUEHRER_RE.search(doc.text)
+    if gf_match:
+        gf = (gf_match.group(1) or "").strip()
+        if gf:
+            data["supplier_geschäftsführer"] = gf
+        return
+
+    # Bazen isimler sonraki satır(lar)da
+    gf_block = GESCHAEFTSFUEHRER_BLOCK_RE.search(doc.text)
+    if gf_block:
+        block = (gf_block.group(1) or "").strip()
+        # en fazla 2 satır al, sonraki etiketlerden önce dur
+        lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
+        if lines:
+            joined = " ".join(lines[:2])
+            joined = GESCHAEFTSFUEHRER_STOP_RE.split(joined)[0].strip()
+            if joined:
+                data["supplier_geschäftsführer"] = joined
+
+
+def extract_lieferando_fields(full_text: str) -> dict:
+    """Lieferando fatura alanlarını çıkar"""
+    doc = as_pdf_text(full_text)
+    data = apply_specs(LIEFERANDO_SUMMARY_SPECS, doc)
+    _apply_lieferando_gesamt_fallback(doc, data)
+
+    apply_specs(LIEFERANDO_ONLINE_SPECS, doc, data)
+    _apply_lieferando_admin_fee(doc, data)
+    _derive_lieferando_cash(data)
+
+    apply_specs(LIEFERANDO_TOTALS_SPECS, doc, data)
+    _apply_lieferando_service_fees(doc, data)
+
+    try:
+        order_items = list(iter_order_items(doc))
+        if order_items:
+            data["order_items"] = order_items
+    except Exception:
+        # Parsing hatası olursa ana extract'i bozma
+        pass
+
+    try:
+        tip_items = list(iter_tip_items(doc))
+        if tip_items:
+            data["tip_items"] = tip_items
+    except Exception:
+        pass
+
+    try:
+        _apply_geschaeftsfuehrer(doc, data)
+    except Exception:
+        pass
+
+    return apply_specs(LIEFERANDO_FOOTER_SPECS, doc, data)
+
+
+# ============================================================================
+# WOLT
+# ============================================================================
+
+WOLT_HEADER_SPECS = (
+    field_spec(
+        "invoice_number",
+        r'Rechnungsnummer[\s:]+([A-Z]{3}/\d{2}/[A-Z0-9]+(?:/\d+)+)',
+        flags=re.IGNORECASE,
+        keyword="Rechnungsnummer",
+    ),
+)
+
+WOLT_SUPPLIER_RE = re.compile(r'Bill To\s+(.*?)Leistungszeitraum', re.DOTALL)
+
+WOLT_DETAIL_SPECS = (
+    field_spec("supplier_vat", r'USt\.-ID:\s*(DE\d+)', convert=str, keyword="USt.-ID:"),
+    field_spec("invoice_date", r'Rechnungsdatum\s+(\d{2}\.\d{2}\.\d{4})', convert=parse_date, keyword="Rechnungsdatum"),
+    field_spec(
+        ("period_start", "period_end"),
+        r'Leistungszeitraum\s+(\d{2}\.\d{2}\.\d{4})\s*-\s*(\d{2}\.\d{2}\.\d{4})',
+        convert=parse_date,
+        keyword="Leistungszeitraum",
+    ),
+    field_spec("restaurant_name", r'Restaurant\s+([^\n]+)', keyword="Restaurant"),
+    field_spec("customer_number", r'Geschäfts-ID:\s*([A-Z0-9 ]+)', keyword="Geschäfts-ID:"),
+)
+
+WOLT_GOODS_RE = re.compile(r'Summe verkaufte Waren\s+([\-\d,\.]+)\s+(7\.00|19\.00)\s+([\-\d,\.]+)\s+([\-\d,\.]+)')
+WOLT_NETPRICE_RE = re.compile(
+    r'Summe Nettopreis \(A\s*-\s*B\) mit Umsatzsteuer\s+(7\.00|19\.00)\s*%[\s|]+([\-\d,\.]+)[\s|]+(?:7\.00|19\.00)[\s|]+([\-\d,\.]+)[\s|]+([\-\d,\.]+)'
+)
+
+WOLT_GOODS_TOTAL_SPECS = (
+    field_spec(
+        ("goods_net_total", "goods_vat_total", "goods_gross_total"),
+        r'Zwischensumme aller verkauften Waren \(A\)\s+([\-\d,\.]+)\s+([\-\d,\.]+)\s+([\-\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Zwischensumme aller verkauften Waren",
+        source=SOURCE_CLEAN,
+        keep_none=True,
+    ),
+    field_spec(
+        ("distribution_net_total", "distribution_vat_total", "distribution_gross_total"),
+        r'Zwischensumme Wolt Vertrieb \(B\)\s+([\-\d,\.]+)\s+([\-\d,\.]+)\s+([\-\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Zwischensumme Wolt Vertrieb",
+        source=SOURCE_CLEAN,
+        keep_none=True,
+    ),
+)
+
+WOLT_END_AMOUNT_SPECS = (
+    field_spec(
+        ("end_amount_net", "end_amount_vat", "end_amount_gross"),
+        r'Endbetrag\s+([\-\d,\.]+)\s+([\-\d,\.]+)\s+([\-\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Endbetrag",
+        source=SOURCE_CLEAN,
+        keep_none=True,
+    ),
+)
+
+
+def _apply_wolt_supplier(doc, data):
+    supplier_match = WOLT_SUPPLIER_RE.search(doc.text) if "Bill To" in doc.text else None
+    if supplier_match:
+        block = supplier_match.group(1)
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if lines:
+            data["supplier_name"] = lines[0]
+        address_lines = lines[1:]
+        if address_lines:
+            data["supplier_address"] = " ".join(address_lines)
+    else:
+        data["supplier_name"] = "Wolt Enterprises Deutschland GmbH"
+
+
+def _apply_wolt_rate_rows(doc, data):
+    if "Summe verkaufte Waren" in doc.clean:
+        for net, rate, vat, gross in WOLT_GOODS_RE.findall(doc.clean):
+            parsed = (
+                parse_decimal(net),
+                parse_decimal(vat),
+                parse_decimal(gross),
+            )
+            if rate.startswith("7"):
+                data["goods_net_7"], data["goods_vat_7"], data["goods_gross_7"] = parsed
+            else:
+                data["goods_net_19"], data["goods_vat_19"], data["goods_gross_19"] = parsed
+
+    apply_specs(WOLT_GOODS_TOTAL_SPECS, doc, data)
+
+    if "Summe Nettopreis" in doc.clean:
+        for rate, net, vat, gross in WOLT_NETPRICE_RE.findall(doc.clean):
+            values = (
+                parse_decimal(net),
+                parse_decimal(vat),
+                parse_decimal(gross),
+            )
+            if rate.startswith("7"):
+                data["netprice_net_7"], data["netprice_vat_7"], data["netprice_gross_7"] = values
+            else:
+                data["netprice_net_19"], data["netprice_vat_19"], data["netprice_gross_19"] = values
+
+    if any(key in data for key in ("netprice_net_7", "netprice_net_19")):
+        data["netprice_net_total"] = (data.get("netprice_net_7") or 0) + (data.get("netprice_net_19") or 0)
+        data["netprice_vat_total"] = (data.get("netprice_vat_7") or 0) + (data.get("netprice_vat_19") or 0)
+        data["netprice_gross_total"] = (data.get("netprice_gross_7") or 0) + (data.get("netprice_gross_19") or 0)
+
+
+def extract_wolt_fields(full_text: str) -> dict:
+    """Wolt fatura alanlarını çıkar"""
+    doc = as_pdf_text(full_text)
+    data = apply_specs(WOLT_HEADER_SPECS, doc, {"platform": "wolt"})
+    if "invoice_number" in data:
+        logger.info(f"Wolt Rechnungsnummer bulundu: {data['invoice_number']}")
+
+    _apply_wolt_supplier(doc, data)
+    apply_specs(WOLT_DETAIL_SPECS, doc, data)
+    _apply_wolt_rate_rows(doc, data)
+
+    apply_specs(WOLT_END_AMOUNT_SPECS, doc, data)
+    if "end_amount_gross" in data:
+        data["total_amount"] = data.get("end_amount_gross")
+
+    return data
+
+
+# ============================================================================
+# UBER EATS
+# ============================================================================
+
+UBER_HEADER_SPECS = (
+    # Format: UBER_DEU-FIGGGCEE-01-2025-0000001
+    field_spec(
+        "invoice_number",
+        r'Rechnungsnummer:\s*([A-Z0-9_\-]+)',
+        flags=re.IGNORECASE,
+        keyword="Rechnungsnummer:",
+    ),
+    field_spec("invoice_date", r'Rechnungsdatum:\s*(\d{2}\.\d{2}\.\d{4})', convert=parse_date, keyword="Rechnungsdatum:"),
+    field_spec("tax_date", r'Steuerdatum\s+(\d{2}\.\d{2}\.\d{4})', convert=parse_date, keyword="Steuerdatum"),
+    # "Zeitraum: 11.11.2025 - 16.11.2025" veya "vom 11.11.2025 bis zum 16.11.2025"
+    field_spec(
+        ("period_start", "period_end"),
+        r'Zeitraum:\s*(\d{2}\.\d{2}\.\d{4})\s*-\s*(\d{2}\.\d{2}\.\d{4})',
+        r'vom\s+(\d{2}\.\d{2}\.\d{4})\s+bis\s+(?:zum\s+)?(\d{2}\.\d{2}\.\d{4})',
+        convert=parse_date,
+    ),
+    field_spec(
+        "customer_company",
+        r'CC CULINARY COLLECTIVE GmbH',
+        convert=_constant("CC CULINARY COLLECTIVE GmbH"),
+        groups=(0,),
+        flags=re.IGNORECASE,
+        keyword="CC CULINARY COLLECTIVE GmbH",
+    ),
+)
+
+UBER_RESTAURANT_RE = re.compile(r'Restaurant:\s*([^\n]+)')
+# "Burger Boost - CC Culinary Collective (Weseler Straße)" formatı
+UBER_RESTAURANT_LOCATION_RE = re.compile(r'Burger Boost\s*-\s*CC Culinary Collective\s*\(([^\)]+)\)', re.IGNORECASE | re.DOTALL)
+UBER_RESTAURANT_PLAIN_RE = re.compile(r'(Burger Boost\s*-\s*CC Culinary Collective[^\n]*)', re.IGNORECASE)
+
+# "Hohenzollerndamm 58,14199,Berlin\nGermany" veya "Hohenzollerndamm 58,14199,Berlin, Germany"
+UBER_ADDRESS_RE = re.compile(r'Hohenzollerndamm\s+(\d+)[,\s]+(\d+)[,\s]+([A-Za-z]+)[,\s]*([A-Za-z]+)?', re.IGNORECASE | re.MULTILINE)
+UBER_ADDRESS_FALLBACK_RE = re.compile(r'CC CULINARY COLLECTIVE GmbH\s+([^\n]+)\s+([^\n]+)', re.IGNORECASE | re.MULTILINE)
+
+UBER_AMOUNT_SPECS = (
+    field_spec(
+        "business_id",
+        r'Handelsregisternummer:\s*([A-Z0-9\s]+)',
+        flags=re.IGNORECASE,
+        keyword="Handelsregisternummer:",
+    ),
+    field_spec("customer_vat", r'USt-IdNr\.:\s*(DE\d+)', flags=re.IGNORECASE, keyword="USt-IdNr.:"),
+    field_spec("tax_number", r'St-Nr\.:\s*([\d\/]+)', flags=re.IGNORECASE, keyword="St-Nr.:"),
+    field_spec("total_orders", r'(\d+)\s+Bestellungen im Gesamtwert', convert=int, keyword="Bestellungen im Gesamtwert"),
+    field_spec(
+        "total_order_value",
+        r'Bestellungen im Gesamtwert von:\s*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Bestellungen im Gesamtwert von:",
+        keep_none=True,
+    ),
+    field_spec(
+        "gross_revenue_after_discounts",
+        r'Bruttoumsatz nach Rabatten\s*€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Bruttoumsatz nach Rabatten",
+        keep_none=True,
+    ),
+    field_spec(
+        "commission_own_delivery",
+        r'Provision, eigene Lieferung.*?€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Provision, eigene Lieferung",
+        keep_none=True,
+    ),
+    field_spec(
+        "commission_pickup",
+        r'Provision, Abholung.*?€\s*([\d,\.]+)',
+        convert=parse_decimal,
+        keyword="Provision, Abholung",
+        keep_none=True,
+    ),
+    field_spec("uber_eats_fee", r'Uber Eats Gebühr\s*€\s*([\d,\.]+)', convert=parse_decimal, keyword="Uber Eats Gebühr", keep_none=True),
+    field_spec("vat_19_percent", r'MwSt\.\s*\(19%[^€]*€\s*([\d,\.]+)', convert=parse_decimal, keyword="MwSt.", keep_none=True),
+    field_spec("cash_collected", r'Eingenommenes Bargeld\s*€\s*([\d,\.]+)', convert=parse_decimal, keyword="Eingenommenes Bargeld", keep_none=True),
+    field_spec("total_payout", r'Gesamtauszahlung\s*€\s*([\d,\.]+)', convert=parse_decimal, keyword="Gesamtauszahlung", keep_none=True),
+    field_spec("net_amount", r'Gesamtnettobetrag\s*([\d,\.]+)\s*€', convert=parse_decimal, keyword="Gesamtnettobetrag", keep_none=True),
+    field_spec("vat_amount", r'Gesamtbetrag USt 19%\s*([\d,\.]+)\s*€', convert=parse_decimal, keyword="Gesamtbetrag USt 19%", keep_none=True),
+    field_spec("total_amount", r'Gesamtbetrag\s*([\d,\.]+)\s*€', convert=parse_decimal, keyword="Gesamtbetrag", keep_none=True),
+)
+
+
+def _apply_uber_restaurant(doc, data):
+    # Önce "Restaurant:" etiketi, sonra "Burger Boost - CC Culinary Collective (...)" formatı
+    restaurant_match = UBER_RESTAURANT_RE.search(doc.text)
+    if restaurant_match:
+        data["restaurant_name"] = restaurant_match.group(1).strip()
+        return
+    if "burger boost" not in doc.get(lower=True):
+        return
+    restaurant_match2 = UBER_RESTAURANT_LOCATION_RE.search(doc.text)
+    if restaurant_match2:
+        location = restaurant_match2.group(1).strip()
+        data["restaurant_name"] = f"Burger Boost - CC Culinary Collective ({location})"
+    else:
+        restaurant_match3 = UBER_RESTAURANT_PLAIN_RE.search(doc.text)
+        if restaurant_match3:
+            data["restaurant_name"] = restaurant_match3.group(1).strip()
+
+
+def _apply_uber_address(doc, data):
+    address_match = UBER_ADDRESS_RE.search(doc.text) if "hohenzollerndamm" in doc.get(lower=True) else None
+    if address_match:
+        street = address_match.group(1)
+        postal = address_match.group(2)
+        city = address_match.group(3)
+        country = address_match.group(4) or "Germany"
+        data["restaurant_address"] = f"Hohenzollerndamm {street}, {postal}, {city}, {country}"
+    else:
+        # Alternatif: "CC CULINARY COLLECTIVE GmbH" sonrasındaki adres satırları
+        address_match2 = UBER_ADDRESS_FALLBACK_RE.search(doc.text)
+        if address_match2:
+            line1 = address_match2.group(1).strip()
+            line2 = address_match2.group(2).strip()
+            data["restaurant_address"] = f"{line1}, {line2}"
+
+
+def extract_uber_eats_fields(full_text: str) -> dict:
+    """UberEats fatura alanlarını çıkar"""
+    doc = as_pdf_text(full_text)
+    data = apply_specs(UBER_HEADER_SPECS, doc, {"platform": "uber_eats"})
+    if "invoice_number" in data:
+        logger.info(f"UberEats Rechnungsnummer bulundu: {data['invoice_number']}")
+
+    _apply_uber_restaurant(doc, data)
+    _apply_uber_address(doc, data)
+    return apply_specs(UBER_AMOUNT_SPECS, doc, data)
+
+
+# ============================================================================
+# WOLT NETTING
+# ============================================================================
+
+# DEU/... içeren satırlar: ilki merchant, ikincisi wolt
+NETTING_ROW_RE = re.compile(r'(DEU/[A-Z0-9\/]+).*?([-+]?\d[\d\.,]*).*?([-+]?\d[\d\.,]*).*?([-+]?\d[\d\.,]*)')
+NETTING_PAYOUT_RE = re.compile(r'Nettoauszahlung\s+([\d\.,]+)', re.IGNORECASE)
+NETTING_AMOUNT_RE = re.compile(r'[-+]?\d[\d\.,]*')
+NETTING_INVOICE_NUMBER_RE = re.compile(r'Rechnungsnummer\s*[:\-]?\s*([A-Z0-9\/\-]+)', re.IGNORECASE)
+NETTING_DEU_NUMBER_RE = re.compile(r'DEU/\d{2}/[A-Z0-9]+(?:/\d+)+', re.IGNORECASE)
+
+
+def extract_netting_invoice_number(full_text: str):
+    """Netting raporunun ait olduğu Wolt faturasının Rechnungsnummer'i (büyük harf) veya None"""
+    full_text = as_pdf_text(full_text).full_text
+    invoice_number = None
+    # Tablo başlığındaki "Gesamtbetrag" değerini almamak için filtrele
+    for m in NETTING_INVOICE_NUMBER_RE.finditer(full_text or ""):
+        candidate = (m.group(1) or "").strip()
+        if candidate.lower() == "gesamtbetrag":
+            continue
+        invoice_number = candidate
+        break
+
+    # Eğer üstte bulunamadıysa, PDF içindeki DEU/.. formatını yakala (örn: DEU/25/HRB274170B/1/37)
+    if not invoice_number:
+        deu_match = NETTING_DEU_NUMBER_RE.search(full_text or "")
+        if deu_match:
+            invoice_number = deu_match.group(0).strip()
+
+    return invoice_number.upper() if invoice_number else None
+
+
+def extract_netting_fields(full_text: str) -> dict:
+    """
+    Netting raporundan temel rakamları çıkarır:
+    - merchant_invoice_number / net / vat / gross
+    - wolt_invoice_number / net / vat / gross
+    - net_payout
+    Döndürdüğü değerler parse edilebilenler; bulunamazsa alan boş kalır.
+    """
+    doc = as_pdf_text(full_text)
+    if not doc.full_text:
+        return {}
+
+    result = {}
+    lines = [ln.strip() for ln in doc.lines if ln.strip()]
+
+    invoice_rows = []
+    for ln in lines:
+        if "DEU/" not in ln:
+            continue
+        m = NETTING_ROW_RE.search(ln)
+        if m:
+            invoice_rows.append(m.groups())
+            if len(invoice_rows) == 2:
+                break
+
+    for prefix, row in zip(("merchant", "wolt"), invoice_rows):
+        inv, net, vat, gross = row
+        result[f"{prefix}_invoice_number"] = inv
+        result[f"{prefix}_net"] = parse_decimal(net)
+        result[f"{prefix}_vat"] = parse_decimal(vat)
+        result[f"{prefix}_gross"] = parse_decimal(gross)
+
+    # Net payout (Nettoauszahlung)
+    payout_match = NETTING_PAYOUT_RE.search(doc.full_text)
+    if payout_match:
+        result["net_payout"] = parse_decimal(payout_match.group(1))
+    else:
+        # Yedek: "Nettoauszahlung" satırında negatif/pozitif miktarları tara
+        payout_line = next((ln for ln in lines if "nettoauszahlung" in ln.lower()), None)
+        if payout_line:
+            amt_match = NETTING_AMOUNT_RE.search(payout_line)
+            if amt_match:
+                result["net_payout"] = parse_decimal(amt_match.group(0))
+
+    return {k: v for k, v in result.items() if v is not None}
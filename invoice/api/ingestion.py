@@ -0,0 +1,218 @@
+"""
+Fatura email ingestion pipeline
+Communication hook'u sadece hafif bir job kuyruğa atar. Sınıflandırma, extraction
+ve kayıt işlemleri worker'da (process_invoice_email) yapılır.
+
+Site config:
+- invoice_ingest_queue: kuyruk adı (varsayılan "invoice_ingest", common_site_config
+  "workers" içinde tanımlı değilse "long" kullanılır)
+- invoice_ingest_concurrency: aynı anda çalışabilecek ingestion job sayısı (0 = sınırsız)
+- invoice_ingest_max_retries: geçici hatalarda tekrar deneme sayısı
+
+Worker hiçbir zaman uyuyarak beklemez: slot doluysa veya geçici bir hata olursa job gecikmeli
+tekrar listesine (Redis sorted set) yazılır, scheduler her dakika vadesi gelenleri kuyruğa alır.
+Slot denemeleri hata denemelerinden ayrı sayılır (INGESTION_SLOT_MAX_RETRIES).
+"""
+
+import json
+import time
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import (
+    COMMUNICATION_TYPE,
+    DOCTYPE_COMMUNICATION,
+    INGESTION_FALLBACK_QUEUE,
+    INGESTION_JOB_TIMEOUT,
+    INGESTION_MAX_RETRIES_DEFAULT,
+    INGESTION_QUEUE_DEFAULT,
+    INGESTION_RETRY_BACKOFF_MAX,
+    INGESTION_RETRY_KEY,
+    INGESTION_SLOT_MAX_RETRIES,
+    INGESTION_SLOT_RETRY_DELAY,
+    INGESTION_SLOT_TTL,
+    SENT_OR_RECEIVED_RECEIVED,
+)
+from invoice.api.invoice_email_handler import (
+    TRANSIENT_DB_ERRORS,
+    get_email_type,
+    process_invoice_email,
+)
+from invoice.api.ingestion_ledger import is_communication_settled
+
+logger = frappe.logger("invoice.ingestion", allow_site=frappe.local.site)
+
+STANDARD_QUEUES = ("short", "default", "long")
+
+
+class IngestionSlotTimeout(Exception):
+    """Concurrency limiti dolu, job gecikmeli olarak tekrar kuyruğa alınacak"""
+
+
+def get_ingestion_queue():
+    """Ingestion kuyruğunu döndür; tanımlı değilse standart 'long' kuyruğuna düş"""
+    queue = frappe.conf.get("invoice_ingest_queue") or INGESTION_QUEUE_DEFAULT
+    if queue in STANDARD_QUEUES or queue in (frappe.conf.get("workers") or {}):
+        return queue
+    return INGESTION_FALLBACK_QUEUE
+
+
+def get_idempotency_key(communication_name):
+    """Communication + ek sayısı: ekler sonradan eklenince yeni bir job oluşur"""
+    attachment_count = frappe.db.count(
+        "File",
+        {"attached_to_doctype": DOCTYPE_COMMUNICATION, "attached_to_name": communication_name},
+    )
+    return f"invoice-ingest::{communication_name}::{attachment_count}"
+
+
+def enqueue_invoice_email(doc, method=None):
+    """Communication doc_event: sadece aday email'ler için ingestion job'u kuyruğa al"""
+    try:
+        if doc.communication_type != COMMUNICATION_TYPE or doc.sent_or_received != SENT_OR_RECEIVED_RECEIVED:
+            return
+
+        if not get_email_type(doc.subject):
+            return
+
+        # Tüm ekleri daha önce sonuçlanmış Communication'lar için job açma
+        if is_communication_settled(doc.name):
+            return
+
+        idempotency_key = get_idempotency_key(doc.name)
+
+        # Aynı request içinde after_insert + on_update iki kez tetiklenebilir
+        enqueued = frappe.flags.invoice_ingest_enqueued or set()
+        if idempotency_key in enqueued:
+            return
+        enqueued.add(idempotency_key)
+        frappe.flags.invoice_ingest_enqueued = enqueued
+
+        _enqueue_job(doc.name, idempotency_key, attempt=1, job_id=idempotency_key)
+        logger.info(f"Ingestion job kuyruğa alındı: {idempotency_key}")
+
+    except Exception as e:
+        # Email senkronizasyonunu asla bloklama
+        logger.error(f"Ingestion job kuyruğa alınamadı: {doc.name} - {str(e)}")
+        frappe.log_error(
+            title="Invoice Ingestion Enqueue Error",
+            message=f"Communication: {doc.name}\nError: {str(e)}\n{frappe.get_traceback()}"
+        )
+
+
+def _enqueue_job(communication_name, idempotency_key, attempt, job_id, slot_attempt=0):
+    frappe.enqueue(
+        "invoice.api.ingestion.run_invoice_email_job",
+        queue=get_ingestion_queue(),
+        timeout=INGESTION_JOB_TIMEOUT,
+        job_id=job_id,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        communication_name=communication_name,
+        idempotency_key=idempotency_key,
+        attempt=attempt,
+        slot_attempt=slot_attempt,
+    )
+
+
+def run_invoice_email_job(communication_name, idempotency_key=None, attempt=1, slot_attempt=0):
+    """Worker tarafı: Communication'ı yükle ve fatura pipeline'ını çalıştır"""
+    slot = None
+    try:
+        slot = _acquire_slot(idempotency_key or communication_name)
+        doc = frappe.get_doc(DOCTYPE_COMMUNICATION, communication_name)
+        process_invoice_email(doc)
+
+    except IngestionSlotTimeout:
+        if slot_attempt >= INGESTION_SLOT_MAX_RETRIES:
+            frappe.log_error(
+                title="Invoice Ingestion Failed",
+                message=f"Communication: {communication_name}\nConcurrency slotu {slot_attempt} denemede alınamadı"
+            )
+            return
+        logger.info(f"Concurrency limiti dolu, job {INGESTION_SLOT_RETRY_DELAY}s sonra tekrar denenecek: {idempotency_key}")
+        _schedule_retry(communication_name, idempotency_key, attempt, slot_attempt + 1, INGESTION_SLOT_RETRY_DELAY)
+
+    except (frappe.DoesNotExistError, *TRANSIENT_DB_ERRORS) as e:
+        frappe.db.rollback()
+        max_retries = cint(frappe.conf.get("invoice_ingest_max_retries") or INGESTION_MAX_RETRIES_DEFAULT)
+        if attempt > max_retries:
+            frappe.log_error(
+                title="Invoice Ingestion Failed",
+                message=f"Communication: {communication_name}\nAttempts: {attempt}\nError: {str(e)}\n{frappe.get_traceback()}"
+            )
+            return
+        delay = min(INGESTION_SLOT_RETRY_DELAY * 2 ** (attempt - 1), INGESTION_RETRY_BACKOFF_MAX)
+        logger.warning(
+            f"Geçici hata, {delay}s sonra tekrar denenecek ({attempt}/{max_retries}): {communication_name} - {str(e)}"
+        )
+        _schedule_retry(communication_name, idempotency_key, attempt + 1, slot_attempt, delay)
+
+    finally:
+        _release_slot(slot, idempotency_key or communication_name)
+
+
+def _retry_key(cache):
+    return cache.make_key(INGESTION_RETRY_KEY)
+
+
+def _schedule_retry(communication_name, idempotency_key, attempt, slot_attempt, delay):
+    """Job'u `delay` saniye sonra kuyruğa alınmak üzere gecikmeli tekrar listesine yaz"""
+    cache = frappe.cache()
+    entry = json.dumps(
+        {
+            "communication_name": communication_name,
+            "idempotency_key": idempotency_key,
+            "attempt": attempt,
+            "slot_attempt": slot_attempt,
+        },
+        sort_keys=True,
+    )
+    # Aynı deneme iki kez yazılırsa tek kayıt kalır
+    cache.zadd(_retry_key(cache), {entry: time.time() + delay})
+
+
+def enqueue_due_retries():
+    """Scheduler (her dakika): vadesi gelen gecikmeli tekrarları ingestion kuyruğuna al"""
+    cache = frappe.cache()
+    key = _retry_key(cache)
+    for entry in cache.zrangebyscore(key, 0, time.time()):
+        # ZREM başarılı olan tek scheduler job'u kuyruğa alır
+        if not cache.zrem(key, entry):
+            continue
+        job = json.loads(entry)
+        base = job["idempotency_key"] or job["communication_name"]
+        _enqueue_job(
+            job["communication_name"],
+            job["idempotency_key"],
+            attempt=job["attempt"],
+            job_id=f"{base}::retry::{job['attempt']}::{job['slot_attempt']}",
+            slot_attempt=job["slot_attempt"],
+        )
+
+
+def _acquire_slot(owner):
+    """Redis üzerinde basit sayaçlı semafor - invoice_ingest_concurrency kadar slot; doluysa beklemeden hata"""
+    limit = cint(frappe.conf.get("invoice_ingest_concurrency"))
+    if limit <= 0:
+        return None
+
+    cache = frappe.cache()
+    for index in range(limit):
+        key = cache.make_key(f"invoice_ingest_slot:{index}")
+        if cache.set(key, owner, nx=True, ex=INGESTION_SLOT_TTL):
+            return key
+    raise IngestionSlotTimeout(owner)
+
+
+def _release_slot(key, owner):
+    if not key:
+        return
+    try:
+        cache = frappe.cache()
+        current = cache.get(key)
+        if current is not None and current.decode() == owner:
+            cache.delete(key)
+    except Exception as e:
+        logger.warning(f"Ingestion slot bırakılamadı: {key} - {str(e)}")
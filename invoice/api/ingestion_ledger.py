@@ -0,0 +1,109 @@
+"""
+Ingestion ledger
+Her (Communication, File content hash) çifti için işleme sonucunu saklar.
+Communication tekrar kaydedildiğinde sonuçlanmış ekler PDF açılmadan atlanır.
+Tekrar denenen sonuçlar (Error / Netting Unmatched) INGESTION_OUTCOME_MAX_ATTEMPTS kez kaydedilince
+ek Failed olarak sonuçlanır.
+"""
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import (
+    DOCTYPE_COMMUNICATION,
+    DOCTYPE_INVOICE_INGESTION_LOG,
+    INGESTION_OUTCOME_FAILED,
+    INGESTION_OUTCOME_MAX_ATTEMPTS,
+    INGESTION_RETRY_OUTCOMES,
+)
+
+logger = frappe.logger("invoice.ingestion_ledger", allow_site=frappe.local.site)
+
+
+def get_ledger_key(pdf_attachment):
+    """Ledger anahtarı: File.content_hash (yoksa File adı)"""
+    return pdf_attachment.get("content_hash") or pdf_attachment.get("name")
+
+
+def get_pdf_attachments(communication_name):
+    """Communication'a ekli PDF dosyaları"""
+    attachments = frappe.get_all(
+        "File",
+        filters={
+            "attached_to_doctype": DOCTYPE_COMMUNICATION,
+            "attached_to_name": communication_name,
+        },
+        fields=["name", "file_url", "file_name", "file_size", "content_hash"],
+    )
+    return [
+        att for att in attachments
+        if att.get("file_name") and att.get("file_name").lower().endswith(".pdf")
+    ]
+
+
+def get_settled_keys(communication_name):
+    """Bu Communication için tekrar işlenmesi gerekmeyen eklerin anahtarları"""
+    return set(
+        frappe.get_all(
+            DOCTYPE_INVOICE_INGESTION_LOG,
+            filters={
+                "communication": communication_name,
+                "outcome": ["not in", INGESTION_RETRY_OUTCOMES],
+            },
+            pluck="content_hash",
+        )
+    )
+
+
+def filter_unsettled(communication_name, pdf_attachments):
+    """Henüz sonuçlanmamış PDF'leri döndür"""
+    if not pdf_attachments:
+        return []
+    settled = get_settled_keys(communication_name)
+    return [pdf for pdf in pdf_attachments if get_ledger_key(pdf) not in settled]
+
+
+def is_communication_settled(communication_name):
+    """Tüm PDF ekleri sonuçlanmışsa True (ek yoksa False - email yine işlenir)"""
+    pdf_attachments = get_pdf_attachments(communication_name)
+    return bool(pdf_attachments) and not filter_unsettled(communication_name, pdf_attachments)
+
+
+def record_outcome(communication_name, pdf_attachment, outcome, invoice=None, message=None):
+    """Ek için sonucu kaydet (varsa güncelle); tekrar denenen sonuçlarda deneme sayısını artır"""
+    try:
+        content_hash = get_ledger_key(pdf_attachment)
+        name = f"{communication_name}-{content_hash}"
+        attempts = cint(frappe.db.get_value(DOCTYPE_INVOICE_INGESTION_LOG, name, "attempts"))
+
+        if outcome in INGESTION_RETRY_OUTCOMES:
+            attempts += 1
+            if attempts >= INGESTION_OUTCOME_MAX_ATTEMPTS:
+                logger.warning(f"Ek {attempts} denemede işlenemedi, Failed olarak kaydedildi: {name}")
+                message = f"{outcome} ({attempts} deneme): {message or ''}"
+                outcome = INGESTION_OUTCOME_FAILED
+
+        values = {
+            "outcome": outcome,
+            "attempts": attempts,
+            "file": pdf_attachment.get("name"),
+            "file_name": pdf_attachment.get("file_name"),
+            "invoice_doctype": invoice.doctype if invoice else None,
+            "invoice_name": invoice.name if invoice else None,
+            "message": (message or "")[:1000] or None,
+        }
+
+        if frappe.db.exists(DOCTYPE_INVOICE_INGESTION_LOG, name):
+            frappe.db.set_value(DOCTYPE_INVOICE_INGESTION_LOG, name, values, update_modified=True)
+            return
+
+        log = frappe.get_doc({
+            "doctype": DOCTYPE_INVOICE_INGESTION_LOG,
+            "communication": communication_name,
+            "content_hash": content_hash,
+            **values,
+        })
+        log.insert(ignore_permissions=True)
+    except Exception as e:
+        # Ledger hatası fatura işlemeyi bozmamalı
+        logger.error(f"Ingestion ledger kaydı yazılamadı: {communication_name} - {str(e)}")
@@ -0,0 +1,101 @@
+"""
+Ingestion istatistikleri (worker'lar arası, Redis)
+Her işlenen email'in sayaçları HINCRBY ile toplam, dakika ve saat bucket'larına yazılır; son
+oluşturulan faturalar sınırlı bir listede tutulur. Tüm worker'lar aynı anahtarlara yazar, okuma
+tek pipeline round-trip'idir (canlı ingestion dashboard'u için).
+
+- Dakika bucket'ları 2 saat, saat bucket'ları 8 gün saklanır
+- get_ingestion_stats(resolution="minute"|"hour", points=60): toplamlar + zaman serisi + son faturalar
+"""
+
+import json
+from datetime import timedelta
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from invoice.api.constants import (
+    INGESTION_STATS_HOUR_TTL,
+    INGESTION_STATS_KEY,
+    INGESTION_STATS_MINUTE_TTL,
+    INGESTION_STATS_RECENT_LIMIT,
+)
+
+logger = frappe.logger("invoice.ingestion_stats", allow_site=frappe.local.site)
+
+COUNTER_FIELDS = ("total_detected", "already_processed", "newly_processed", "errors")
+
+# resolution → (bucket formatı, adım, saklama süresi)
+RESOLUTIONS = {
+    "minute": ("%Y%m%d%H%M", timedelta(minutes=1), INGESTION_STATS_MINUTE_TTL),
+    "hour": ("%Y%m%d%H", timedelta(hours=1), INGESTION_STATS_HOUR_TTL),
+}
+
+
+def _key(cache, *parts):
+    return cache.make_key(":".join((INGESTION_STATS_KEY, *parts)))
+
+
+def record_email(stats, now=None):
+    """İşlenen bir email'in sayaçlarını ekle (atomik, tek pipeline)"""
+    now = now or now_datetime()
+    counters = {field: cint(stats.get(field)) for field in COUNTER_FIELDS}
+    counters["emails"] = 1
+    invoices = stats.get("invoices_created") or []
+    try:
+        cache = frappe.cache()
+        pipe = cache.pipeline()
+        buckets = {_key(cache, "totals"): None}
+        for resolution, (fmt, _step, ttl) in RESOLUTIONS.items():
+            buckets[_key(cache, resolution, now.strftime(fmt))] = ttl
+        for key, ttl in buckets.items():
+            for field, value in counters.items():
+                if value:
+                    pipe.hincrby(key, field, value)
+            # EXPIRE HINCRBY'den sonra: anahtar yokken verilen EXPIRE etkisizdir
+            if ttl:
+                pipe.expire(key, ttl)
+        if invoices:
+            recent_key = _key(cache, "recent")
+            stamp = now.isoformat(timespec="seconds")
+            pipe.lpush(recent_key, *(json.dumps({**inv, "at": stamp}, default=str) for inv in invoices))
+            pipe.ltrim(recent_key, 0, INGESTION_STATS_RECENT_LIMIT - 1)
+        pipe.execute()
+    except Exception as e:
+        # İstatistik yazılamaması ingestion'ı durdurmamalı
+        logger.warning(f"Ingestion istatistiği yazılamadı: {str(e)}")
+
+
+def _decode(values):
+    return {key.decode(): cint(value) for key, value in (values or {}).items()}
+
+
+@frappe.whitelist()
+def get_ingestion_stats(resolution="minute", points=60):
+    """Toplamlar, son `points` bucket'lık zaman serisi ve son oluşturulan faturalar"""
+    frappe.only_for("System Manager")
+    if resolution not in RESOLUTIONS:
+        frappe.throw(f"Geçersiz resolution: {resolution}")
+    fmt, step, _ttl = RESOLUTIONS[resolution]
+    points = min(max(cint(points) or 60, 1), 24 * 60)
+
+    now = now_datetime()
+    buckets = [(now - step * offset).strftime(fmt) for offset in reversed(range(points))]
+
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.hgetall(_key(cache, "totals"))
+    for bucket in buckets:
+        pipe.hgetall(_key(cache, resolution, bucket))
+    pipe.lrange(_key(cache, "recent"), 0, INGESTION_STATS_RECENT_LIMIT - 1)
+    totals, *series, recent = pipe.execute()
+
+    return {
+        "resolution": resolution,
+        "totals": _decode(totals),
+        "series": [
+            {"bucket": bucket, **{field: 0 for field in (*COUNTER_FIELDS, "emails")}, **_decode(values)}
+            for bucket, values in zip(buckets, series)
+        ],
+        "recent_invoices": [json.loads(item) for item in recent],
+    }
@@ -8,6 +8,10 @@ try:
 except ImportError:
     OpenAI = None
 
+from invoice.api.constants import AI_VALIDATION_MAX_TOKENS, AI_VALIDATION_MODEL
+from invoice.api.raw_text_store import get_raw_text
+from invoice.api.unit_of_work import commit
+
 logger = frappe.logger("invoice.ai_validation", allow_site=frappe.local.site)
 
 def repair_json(json_string):
@@ -39,16 +43,22 @@ def repair_json(json_string):
         # Son çare: None döndür
         return None
 
+def get_openai_settings():
+    """(api_key, base_url) - base_url OpenAI uyumlu başka bir endpoint / test sunucusu için"""
+    api_key = frappe.conf.get("openai_api_key") or os.getenv("OPENAI_API_KEY")
+
+    if not api_key:
+        frappe.throw("OpenAI API key bulunamadı. Lütfen 'openai_api_key' site config'e ekleyin veya OPENAI_API_KEY environment variable'ı ayarlayın.")
+    base_url = frappe.conf.get("openai_base_url") or os.getenv("OPENAI_BASE_URL") or None
+    return api_key, base_url
+
 def get_openai_client():
     """OpenAI client oluştur"""
     if OpenAI is None:
         frappe.throw("OpenAI paketi yüklü değil. Lütfen 'pip install openai' komutu ile yükleyin.")
     
-    api_key = frappe.conf.get("openai_api_key") or os.getenv("OPENAI_API_KEY")
-
-    if not api_key:
-        frappe.throw("OpenAI API key bulunamadı. Lütfen 'openai_api_key' site config'e ekleyin veya OPENAI_API_KEY environment variable'ı ayarlayın.")
-    return OpenAI(api_key=api_key)
+    api_key, base_url = get_openai_settings()
+    return OpenAI(api_key=api_key, base_url=base_url)
 
 def prepare_invoice_data_for_ai(invoice_doc):
     """Invoice DocType verilerini AI'ya göndermek için hazırla"""
@@ -98,21 +108,15 @@ def prepare_invoice_data_for_ai(invoice_doc):
     
     return data
 
-def validate_invoice_with_ai(invoice_doctype, invoice_name):
-    """Invoice'ı OpenAI ile doğrula"""
-    try:
-        invoice_doc = frappe.get_doc(invoice_doctype, invoice_name)
-        
-        # Invoice verilerini hazırla
-        invoice_data = prepare_invoice_data_for_ai(invoice_doc)
-        
-        # OpenAI client
-        client = get_openai_client()
-        
-        # Prompt hazırla (English for AI, results will be in Turkish)
-        prompt = f"""You are an invoice validation expert. Compare the invoice data in JSON format below with the PDF content and perform accuracy validation.
+def build_validation_messages(invoice_doc):
+    """Invoice verileri + PDF raw text → OpenAI mesajları"""
+    # Invoice verilerini hazırla
+    invoice_data = prepare_invoice_data_for_ai(invoice_doc)
+    
+    # Prompt hazırla (English for AI, results will be in Turkish)
+    prompt = f"""You are an invoice validation expert. Compare the invoice data in JSON format below with the PDF content and perform accuracy validation.
 
-Invoice DocType: {invoice_doctype}
+Invoice DocType: {invoice_doc.doctype}
 Invoice Number: {invoice_doc.invoice_number}
 
 Invoice data (extracted from DocType):
@@ -178,180 +182,235 @@ CRITICAL JSON FORMATTING RULES (MUST FOLLOW):
 
 IMPORTANT: Provide response in JSON format only, no additional text. The summary and recommendations should be in Turkish."""
 
-        # PDF raw text'i al (PDF gönderimi yerine metin kullanıyoruz; API PDF'i image olarak kabul etmiyor)
-        raw_text = invoice_doc.get("raw_text", "")
-        if not raw_text:
-            frappe.throw("PDF raw text bulunamadı. Önce fatura işlenmiş olmalı.")
-        
-        # OpenAI API çağrısı - PDF text'i ile analiz
-        messages = [
+    # PDF raw text'i al (PDF gönderimi yerine metin kullanıyoruz; API PDF'i image olarak kabul etmiyor)
+    raw_text = get_raw_text(invoice_doc.doctype, invoice_doc.name)
+    if not raw_text:
+        frappe.throw("PDF raw text bulunamadı. Önce fatura işlenmiş olmalı.")
+    
+    # OpenAI API çağrısı - PDF text'i ile analiz
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an invoice validation expert. You compare PDF text with DocType data and perform accuracy analysis. Provide responses in Turkish for summary and recommendations fields, but use English for technical terms and field names."
+        },
+        {
+            "role": "user",
+            "content": f"""{prompt}
+
+PDF Text (Raw):
+{raw_text[:15000]}  # Max 15000 chars
+"""
+        }
+    ]
+    return messages
+
+def get_completion_kwargs(messages, json_mode=True):
+    """chat.completions.create parametreleri (sync ve async client ortak)"""
+    kwargs = {
+        "model": AI_VALIDATION_MODEL,
+        "messages": messages,
+        "temperature": 0.3,
+        "max_tokens": AI_VALIDATION_MAX_TOKENS,
+    }
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}  # JSON mode - geçerli JSON garantisi
+    return kwargs
+
+def get_json_fix_kwargs(response_text):
+    """Parse edilemeyen yanıtı AI'a düzelttirme çağrısının parametreleri"""
+    return {
+        "model": AI_VALIDATION_MODEL,
+        "messages": [
             {
                 "role": "system",
-                "content": "You are an invoice validation expert. You compare PDF text with DocType data and perform accuracy analysis. Provide responses in Turkish for summary and recommendations fields, but use English for technical terms and field names."
+                "content": "You are a JSON-only response generator. You MUST respond with ONLY valid JSON, no explanations, no markdown, no code blocks. Your response must be parseable by json.loads() without any errors. Escape all special characters in strings properly."
             },
             {
                 "role": "user",
-                "content": f"""{prompt}
-
-PDF Text (Raw):
-{raw_text[:15000]}  # Max 15000 chars
-"""
+                "content": f"Please fix this JSON and return ONLY the corrected JSON (no explanations, no markdown, no code blocks, just pure JSON):\n\n{response_text[:2000]}"
             }
-        ]
+        ],
+        "temperature": 0.1,
+        "max_tokens": AI_VALIDATION_MAX_TOKENS,
+        "response_format": {"type": "json_object"}
+    }
+
+def request_validation(client, messages):
+    """OpenAI çağrısı + JSON parse (frappe.local / DB kullanmaz, thread'lerde çalışabilir)"""
+    # OpenAI API çağrısı - JSON mode ile (geçerli JSON garantisi)
+    try:
+        response = client.chat.completions.create(**get_completion_kwargs(messages))
+    except Exception as api_error:
+        # Eğer model JSON mode desteklemiyorsa, normal modda dene
+        logger.warning(f"JSON mode desteklenmiyor, normal modda denenecek: {str(api_error)}")
+        response = client.chat.completions.create(**get_completion_kwargs(messages, json_mode=False))
+    
+    response_text = response.choices[0].message.content.strip()
+    
+    return parse_validation_response(client, response_text)
+
+def clean_response_text(response_text):
+    """Markdown code block'ları ve JSON dışı metni temizle"""
+    # Eğer yanıt ```json ... ``` formatındaysa temizle
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        # Herhangi bir ``` bloğu varsa içindekini al
+        parts = response_text.split("```")
+        if len(parts) >= 3:
+            response_text = parts[1].strip()
+            # Eğer "json" ile başlıyorsa onu da temizle
+            if response_text.lower().startswith("json"):
+                response_text = response_text[4:].strip()
+    
+    # JSON dışı metinleri temizle (başta ve sonda)
+    # Eğer { ile başlamıyorsa, ilk { karakterini bul
+    first_brace = response_text.find('{')
+    if first_brace > 0:
+        response_text = response_text[first_brace:]
+    
+    # Son } karakterini bul
+    last_brace = response_text.rfind('}')
+    if last_brace > 0 and last_brace < len(response_text) - 1:
+        response_text = response_text[:last_brace + 1]
+    return response_text
+
+def load_validation_json(response_text):
+    """Temizlenmiş yanıtı parse et (normal, repair, trailing comma) - başarısızsa ilk JSONDecodeError"""
+    # JSON parse et - önce normal deneme
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError as parse_error:
+        # İlk deneme başarısız oldu, JSON repair dene
+        logger.warning(f"Normal JSON parse başarısız, repair deneniyor: {str(parse_error)}")
+        try:
+            validation_result = repair_json(response_text)
+            if validation_result:
+                logger.info("JSON repair başarılı")
+                return validation_result
+        except Exception as repair_error:
+            logger.warning(f"JSON repair başarısız: {str(repair_error)}")
         
-        # OpenAI API çağrısı - JSON mode ile (geçerli JSON garantisi)
+        # Hala parse edilemediyse, daha agresif temizleme dene
+        # Trailing comma'ları kaldır
+        cleaned = re.sub(r',(\s*[}\]])', r'\1', response_text)
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o",  # veya "gpt-4-turbo"
-                messages=messages,
-                temperature=0.3,
-                max_tokens=2000,
-                response_format={"type": "json_object"}  # JSON mode - geçerli JSON garantisi
-            )
-        except Exception as api_error:
-            # Eğer model JSON mode desteklemiyorsa, normal modda dene
-            logger.warning(f"JSON mode desteklenmiyor, normal modda denenecek: {str(api_error)}")
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=2000
-            )
+            validation_result = json.loads(cleaned)
+            logger.info("Cleaned JSON parse başarılı")
+            return validation_result
+        except json.JSONDecodeError:
+            raise parse_error
+
+def load_fixed_json(retry_text):
+    """AI'ın düzelttiği JSON yanıtını parse et"""
+    retry_text = retry_text.strip()
+    retry_first_brace = retry_text.find('{')
+    retry_last_brace = retry_text.rfind('}')
+    if retry_first_brace >= 0 and retry_last_brace > retry_first_brace:
+        retry_text = retry_text[retry_first_brace:retry_last_brace + 1]
+    return json.loads(retry_text)
+
+def parse_validation_response(client, response_text):
+    """AI yanıtını JSON'a çevir (temizleme, repair, gerekirse AI'dan tekrar iste) - başarısızsa JSONDecodeError"""
+    response_text = clean_response_text(response_text)
+    try:
+        return load_validation_json(response_text)
+    except json.JSONDecodeError as parse_error:
+        # Son çare: AI'dan tekrar iste (retry)
+        logger.warning("Tüm parse denemeleri başarısız, AI'dan tekrar isteniyor...")
+        try:
+            retry_response = client.chat.completions.create(**get_json_fix_kwargs(response_text))
+            validation_result = load_fixed_json(retry_response.choices[0].message.content)
+            logger.info("Retry JSON parse başarılı")
+            return validation_result
+        except Exception as retry_error:
+            logger.error(f"Retry parse başarısız: {str(retry_error)}")
+            # Tüm denemeler başarısız, orijinal hatayı fırlat
+            raise parse_error
+
+def report_parse_error(e):
+    """Parse hatasını logla / Error Log'a yaz → kullanıcıya gösterilecek mesaj"""
+    response_text = e.doc
+    # Daha detaylı hata loglama
+    error_pos = getattr(e, 'pos', None)
+    error_msg = str(e)
+    
+    # Hata pozisyonu civarındaki metni göster
+    error_line = None
+    if error_pos:
+        start = max(0, error_pos - 200)
+        end = min(len(response_text), error_pos + 200)
+        error_context = response_text[start:end]
+        # Hata satırını bul
+        error_line_start = response_text.rfind('\n', 0, error_pos) + 1
+        error_line_end = response_text.find('\n', error_pos)
+        if error_line_end == -1:
+            error_line_end = len(response_text)
+        error_line = response_text[error_line_start:error_line_end]
+        
+        logger.error(
+            f"AI yanıtı parse edilemedi (pos {error_pos}):\n"
+            f"Error: {error_msg}\n"
+            f"Error line: {error_line}\n"
+            f"Context (200 chars around error):\n{error_context}\n"
+            f"Full response length: {len(response_text)}"
+        )
+    else:
+        logger.error(
+            f"AI yanıtı parse edilemedi:\n"
+            f"Error: {error_msg}\n"
+            f"Response (first 1000 chars):\n{response_text[:1000]}\n"
+            f"Full response length: {len(response_text)}"
+        )
+    
+    # Hata durumunda response_text'in tamamını kaydet (debug için)
+    # İlk 5000 karakteri kaydet, eğer daha uzunsa son 2000 karakteri de ekle
+    error_log_message = f"Error: {error_msg}\n\n"
+    if len(response_text) > 5000:
+        error_log_message += f"Response (first 5000 chars):\n{response_text[:5000]}\n\n"
+        error_log_message += f"Response (last 2000 chars):\n{response_text[-2000:]}\n"
+    else:
+        error_log_message += f"Response (full):\n{response_text}\n"
+    
+    frappe.log_error(
+        title="AI JSON Parse Error",
+        message=error_log_message
+    )
+    
+    # Kullanıcıya daha anlamlı hata mesajı
+    user_error_msg = f"AI yanıtı parse edilemedi: {error_msg}"
+    if error_pos:
+        user_error_msg += f"\n\nHata pozisyonu: karakter {error_pos}"
+        if error_line:
+            user_error_msg += f"\nHatalı satır: {error_line[:100]}"
+    
+    return user_error_msg
+
+def save_validation_error(invoice_doctype, invoice_name, error):
+    """Hata durumunda status'u güncelle (submit edilmiş invoice'larda da çalışması için set_value kullan)"""
+    try:
+        frappe.db.set_value(invoice_doctype, invoice_name, {
+            "ai_validation_status": "Error",
+            "ai_validation_summary": f"Error: {str(error)}"[:200],
+            "ai_validation_date": frappe.utils.now()
+        }, update_modified=False)
+        frappe.db.commit()
+    except Exception as update_error:
+        logger.error(f"Error field update hatası: {str(update_error)}")
+
+def validate_invoice_with_ai(invoice_doctype, invoice_name):
+    """Invoice'ı OpenAI ile doğrula"""
+    try:
+        invoice_doc = frappe.get_doc(invoice_doctype, invoice_name)
         
-        response_text = response.choices[0].message.content.strip()
+        # OpenAI client
+        client = get_openai_client()
+        messages = build_validation_messages(invoice_doc)
         
-        # JSON'u parse et
         try:
-            # Eğer yanıt ```json ... ``` formatındaysa temizle
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                # Herhangi bir ``` bloğu varsa içindekini al
-                parts = response_text.split("```")
-                if len(parts) >= 3:
-                    response_text = parts[1].strip()
-                    # Eğer "json" ile başlıyorsa onu da temizle
-                    if response_text.lower().startswith("json"):
-                        response_text = response_text[4:].strip()
-            
-            # JSON dışı metinleri temizle (başta ve sonda)
-            # Eğer { ile başlamıyorsa, ilk { karakterini bul
-            first_brace = response_text.find('{')
-            if first_brace > 0:
-                response_text = response_text[first_brace:]
-            
-            # Son } karakterini bul
-            last_brace = response_text.rfind('}')
-            if last_brace > 0 and last_brace < len(response_text) - 1:
-                response_text = response_text[:last_brace + 1]
-            
-            # JSON parse et - önce normal deneme
-            validation_result = None
-            try:
-                validation_result = json.loads(response_text)
-            except json.JSONDecodeError as parse_error:
-                # İlk deneme başarısız oldu, JSON repair dene
-                logger.warning(f"Normal JSON parse başarısız, repair deneniyor: {str(parse_error)}")
-                try:
-                    validation_result = repair_json(response_text)
-                    if validation_result:
-                        logger.info("JSON repair başarılı")
-                except Exception as repair_error:
-                    logger.warning(f"JSON repair başarısız: {str(repair_error)}")
-                
-                # Hala parse edilemediyse, daha agresif temizleme dene
-                if not validation_result:
-                    # Trailing comma'ları kaldır
-                    cleaned = re.sub(r',(\s*[}\]])', r'\1', response_text)
-                    try:
-                        validation_result = json.loads(cleaned)
-                        logger.info("Cleaned JSON parse başarılı")
-                    except json.JSONDecodeError:
-                        # Son çare: AI'dan tekrar iste (retry)
-                        logger.warning("Tüm parse denemeleri başarısız, AI'dan tekrar isteniyor...")
-                        try:
-                            retry_response = client.chat.completions.create(
-                                model="gpt-4o",
-                                messages=[
-                                    {
-                                        "role": "system",
-                                        "content": "You are a JSON-only response generator. You MUST respond with ONLY valid JSON, no explanations, no markdown, no code blocks. Your response must be parseable by json.loads() without any errors. Escape all special characters in strings properly."
-                                    },
-                                    {
-                                        "role": "user",
-                                        "content": f"Please fix this JSON and return ONLY the corrected JSON (no explanations, no markdown, no code blocks, just pure JSON):\n\n{response_text[:2000]}"
-                                    }
-                                ],
-                                temperature=0.1,
-                                max_tokens=2000,
-                                response_format={"type": "json_object"}
-                            )
-                            retry_text = retry_response.choices[0].message.content.strip()
-                            retry_first_brace = retry_text.find('{')
-                            retry_last_brace = retry_text.rfind('}')
-                            if retry_first_brace >= 0 and retry_last_brace > retry_first_brace:
-                                retry_text = retry_text[retry_first_brace:retry_last_brace + 1]
-                            validation_result = json.loads(retry_text)
-                            logger.info("Retry JSON parse başarılı")
-                        except Exception as retry_error:
-                            logger.error(f"Retry parse başarısız: {str(retry_error)}")
-                            # Tüm denemeler başarısız, orijinal hatayı fırlat
-                            raise parse_error
+            validation_result = request_validation(client, messages)
         except json.JSONDecodeError as e:
-            # Daha detaylı hata loglama
-            error_pos = getattr(e, 'pos', None)
-            error_msg = str(e)
-            
-            # Hata pozisyonu civarındaki metni göster
-            error_line = None
-            if error_pos:
-                start = max(0, error_pos - 200)
-                end = min(len(response_text), error_pos + 200)
-                error_context = response_text[start:end]
-                # Hata satırını bul
-                error_line_start = response_text.rfind('\n', 0, error_pos) + 1
-                error_line_end = response_text.find('\n', error_pos)
-                if error_line_end == -1:
-                    error_line_end = len(response_text)
-                error_line = response_text[error_line_start:error_line_end]
-                
-                logger.error(
-                    f"AI yanıtı parse edilemedi (pos {error_pos}):\n"
-                    f"Error: {error_msg}\n"
-                    f"Error line: {error_line}\n"
-                    f"Context (200 chars around error):\n{error_context}\n"
-                    f"Full response length: {len(response_text)}"
-                )
-            else:
-                logger.error(
-                    f"AI yanıtı parse edilemedi:\n"
-                    f"Error: {error_msg}\n"
-                    f"Response (first 1000 chars):\n{response_text[:1000]}\n"
-                    f"Full response length: {len(response_text)}"
-                )
-            
-            # Hata durumunda response_text'in tamamını kaydet (debug için)
-            # İlk 5000 karakteri kaydet, eğer daha uzunsa son 2000 karakteri de ekle
-            error_log_message = f"Error: {error_msg}\n\n"
-            if len(response_text) > 5000:
-                error_log_message += f"Response (first 5000 chars):\n{response_text[:5000]}\n\n"
-                error_log_message += f"Response (last 2000 chars):\n{response_text[-2000:]}\n"
-            else:
-                error_log_message += f"Response (full):\n{response_text}\n"
-            
-            frappe.log_error(
-                title="AI JSON Parse Error",
-                message=error_log_message
-            )
-            
-            # Kullanıcıya daha anlamlı hata mesajı
-            user_error_msg = f"AI yanıtı parse edilemedi: {error_msg}"
-            if error_pos:
-                user_error_msg += f"\n\nHata pozisyonu: karakter {error_pos}"
-                if error_line:
-                    user_error_msg += f"\nHatalı satır: {error_line[:100]}"
-            
-            frappe.throw(user_error_msg)
+            frappe.throw(report_parse_error(e))
         
         # Sonuçları invoice'a kaydet
         update_ai_validation_fields(invoice_doc, validation_result)
@@ -364,18 +423,7 @@ PDF Text (Raw):
             title="AI Validation Error",
             message=f"Invoice: {invoice_doctype} / {invoice_name}\nError: {str(e)}\n{frappe.get_traceback()}"
         )
-        
-        # Hata durumunda status'u güncelle (submit edilmiş invoice'larda da çalışması için set_value kullan)
-        try:
-            frappe.db.set_value(invoice_doctype, invoice_name, {
-                "ai_validation_status": "Error",
-                "ai_validation_summary": f"Error: {str(e)}"[:200],
-                "ai_validation_date": frappe.utils.now()
-            }, update_modified=False)
-            frappe.db.commit()
-        except Exception as update_error:
-            logger.error(f"Error field update hatası: {str(update_error)}")
-        
+        save_validation_error(invoice_doctype, invoice_name, e)
         frappe.throw(f"AI validation hatası: {str(e)}")
 
 def update_ai_validation_fields(invoice_doc, validation_result):
@@ -394,7 +442,7 @@ def update_ai_validation_fields(invoice_doc, validation_result):
         "ai_validation_result": result_json,
         "ai_validation_date": validation_date
     }, update_modified=False)
-    frappe.db.commit()
+    commit()
 
 @frappe.whitelist()
 def recheck_invoice_with_ai(doctype, name, show_message=True):
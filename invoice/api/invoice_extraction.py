@@ -0,0 +1,144 @@
+"""
+Fatura PDF extraction (saf fonksiyonlar)
+Sınıflandırma ve alan extraction'ı DB'ye, Redis'e veya frappe request context'ine dokunmaz;
+hem email işleyicide hem de extraction process pool worker'larında (bkz. extraction_worker)
+aynı kod çalışır. Worker'larda duplicate taraması pool kurulurken verilen index kopyasıyla yapılır.
+"""
+
+import traceback
+
+from invoice.api import invoice_index
+from invoice.api.constants import (
+    DEFAULT_EXTRACTION_CONFIDENCE,
+    EMAIL_TYPE_UBER_EATS_REPORT,
+    EMAIL_TYPE_WOLT_PAYOUT_REPORT,
+    PDF_KIND_UBER_EATS_ORDER_SUMMARY,
+    PDF_KIND_WOLT_NETTING,
+    PDF_KIND_WOLT_SELF_BILLING,
+    PDF_ROLE_INVOICE,
+    PDF_ROLE_NETTING,
+    PDF_ROLE_SKIP,
+    PLATFORM_INVOICE_DOCTYPES,
+)
+from invoice.api.field_extraction import (
+    extract_generic_fields,
+    extract_invoice_number,
+    extract_lieferando_fields,
+    extract_uber_eats_fields,
+    extract_wolt_fields,
+)
+from invoice.api.pdf_classifier import (
+    classify_filename,
+    classify_first_page,
+    classify_parsed_pdf,
+    detect_platform_from_filename,
+)
+from invoice.api.pdf_text import PdfText
+
+
+def scan_known_invoice(file_name, parsed):
+    """
+    Sadece ilk sayfadan platform + Rechnungsnummer oku; numara index'te varsa (DocType, numara) döner.
+    Bilinen duplicate'ler için PDF'in geri kalanı hiç çıkarılmaz.
+    """
+    if parsed is None or parsed.page_count == 0:
+        return None
+    platform = detect_platform_from_filename(file_name.lower()) or classify_first_page(parsed, file_name).platform
+    doctype = PLATFORM_INVOICE_DOCTYPES.get(platform)
+    if not doctype:
+        return None
+    invoice_number = extract_invoice_number(parsed.first_page_text)
+    if invoice_index.contains(doctype, invoice_number):
+        return (doctype, invoice_number)
+    return None
+
+
+def extract_invoice_data_from_parsed(parsed) -> dict:
+    """Parse edilmiş PDF'den fatura verilerini çıkar (saf fonksiyon - process pool'da da çalışır)"""
+    if parsed is None:
+        return {"raw_text": "", "confidence": 0}
+
+    text = parsed.text
+
+    data = {
+        "raw_text": text.full_text,
+        "confidence": DEFAULT_EXTRACTION_CONFIDENCE
+    }
+    data.update(extract_generic_fields(text))
+
+    platform = classify_parsed_pdf(parsed).platform
+    data["platform"] = platform or "lieferando"
+
+    if platform == "wolt":
+        data.update(extract_wolt_fields(text))
+    elif platform == "uber_eats":
+        data.update(extract_uber_eats_fields(text))
+    else:
+        data.update(extract_lieferando_fields(text))
+
+    return data
+
+
+def extract_invoice_data_from_text(full_text, platform) -> dict:
+    """Kayıtlı ham metinden (sayfa sınırları yok) bilinen platform için fatura verileri - yeniden parse için"""
+    text = PdfText.from_text(full_text)
+
+    data = {
+        "raw_text": text.full_text,
+        "confidence": DEFAULT_EXTRACTION_CONFIDENCE,
+        "platform": platform,
+    }
+    data.update(extract_generic_fields(text))
+
+    if platform == "wolt":
+        data.update(extract_wolt_fields(text))
+    elif platform == "uber_eats":
+        data.update(extract_uber_eats_fields(text))
+    else:
+        data.update(extract_lieferando_fields(text))
+
+    return data
+
+
+def get_pdf_role(email_type, kind):
+    """Email tipine ve PDF türüne göre PDF'in rolü: fatura, netting raporu veya atla"""
+    if email_type == EMAIL_TYPE_UBER_EATS_REPORT:
+        return PDF_ROLE_INVOICE if kind == PDF_KIND_UBER_EATS_ORDER_SUMMARY else PDF_ROLE_SKIP
+
+    if email_type == EMAIL_TYPE_WOLT_PAYOUT_REPORT:
+        if kind == PDF_KIND_WOLT_SELF_BILLING:
+            return PDF_ROLE_INVOICE
+        if kind == PDF_KIND_WOLT_NETTING:
+            return PDF_ROLE_NETTING
+        return PDF_ROLE_SKIP
+
+    return PDF_ROLE_INVOICE
+
+
+def prepare_pdf(file_name, parsed, email_type) -> dict:
+    """
+    Sınıflandırma + alan extraction (DB erişimi yok).
+    Özel email'lerde tür dosya adı veya sadece ilk sayfa ile belirlenir; atlanan PDF'lerin
+    geri kalan sayfaları hiç okunmaz.
+    """
+    result = {"kind": None, "role": PDF_ROLE_INVOICE, "data": None, "error": None, "duplicate": None}
+
+    if email_type in (EMAIL_TYPE_UBER_EATS_REPORT, EMAIL_TYPE_WOLT_PAYOUT_REPORT):
+        classification = classify_filename(file_name) or classify_first_page(parsed, file_name)
+        result["kind"] = classification.kind
+        result["role"] = get_pdf_role(email_type, classification.kind)
+
+    try:
+        if result["role"] == PDF_ROLE_INVOICE:
+            # Bilinen fatura: ilk sayfadaki numara index'te varsa tam extraction yapılmaz
+            result["duplicate"] = scan_known_invoice(file_name, parsed)
+            if result["duplicate"] is None:
+                result["data"] = extract_invoice_data_from_parsed(parsed)
+        elif result["role"] == PDF_ROLE_NETTING and parsed is not None:
+            # Netting raporu parent'ta DB ile eşleştirilir, metni burada çıkar
+            parsed.pages
+    except Exception:
+        result["data"] = {"raw_text": "", "confidence": 0}
+        result["error"] = traceback.format_exc()
+
+    return result
@@ -0,0 +1,216 @@
+"""
+Fatura numarası index'i (duplicate kontrolü)
+Lieferando/Wolt/Uber Eats Invoice invoice_number değerleri process içinde set olarak tutulur;
+bir email'in tüm PDF'leri tek seferde bellekte kontrol edilir (PDF başına DB sorgusu yok).
+
+Güncel tutma:
+- Yeni fatura commit edilince numara Redis pub/sub kanalına yayınlanır, diğer worker'lar
+  bir sonraki kontrolde mesajları okuyup kendi set'lerine ekler
+- Silme / yeniden adlandırma / numara değişikliğinde kanala "reset" yayınlanır ve Redis'teki
+  versiyon sayacı artırılır (abonelik kopmuş process'ler versiyondan anlar ve yeniden yükler)
+- Pub/sub kullanılamazsa index'te bulunmayan numaralar tek bir DB sorgusu ile doğrulanır
+"""
+
+import json
+
+import frappe
+
+from invoice.api.constants import FIELD_INVOICE_NUMBER, INVOICE_DOCTYPES
+from invoice.api.unit_of_work import get_active_unit_of_work
+
+logger = frappe.logger("invoice.invoice_index", allow_site=frappe.local.site)
+
+VERSION_KEY = "invoice_number_index:version"
+CHANNEL = "invoice_number_index"
+
+# Process boyunca yaşayan index (extraction pool worker'larına kurulurken kopyası verilir)
+_state = {"version": None, "numbers": None, "pubsub": None}
+
+
+def _version_key(cache):
+    return cache.make_key(VERSION_KEY)
+
+
+def _channel(cache):
+    return cache.make_key(CHANNEL)
+
+
+def _read_version(cache):
+    value = cache.get(_version_key(cache))
+    return value.decode() if value is not None else "0"
+
+
+def _subscribe(cache):
+    _close_pubsub()
+    try:
+        pubsub = cache.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(_channel(cache))
+        _state["pubsub"] = pubsub
+    except Exception as e:
+        logger.warning(f"Invoice index pub/sub aboneliği başarısız: {str(e)}")
+
+
+def _close_pubsub():
+    pubsub = _state["pubsub"]
+    _state["pubsub"] = None
+    if pubsub is not None:
+        try:
+            pubsub.close()
+        except Exception:
+            pass
+
+
+def _load(cache):
+    # Önce abone ol, sonra yükle: yükleme sırasında gelen eklemeler kaçmaz
+    _subscribe(cache)
+    _state["version"] = _read_version(cache)
+    _state["numbers"] = {
+        doctype: set(frappe.get_all(doctype, pluck=FIELD_INVOICE_NUMBER, filters={FIELD_INVOICE_NUMBER: ["is", "set"]}))
+        for doctype in INVOICE_DOCTYPES
+    }
+    logger.info(
+        "Invoice index yüklendi: "
+        + ", ".join(f"{doctype}={len(numbers)}" for doctype, numbers in _state["numbers"].items())
+    )
+
+
+def _drain():
+    """Bekleyen pub/sub mesajlarını uygula; reset gelirse False döner"""
+    pubsub = _state["pubsub"]
+    if pubsub is None:
+        return True
+    try:
+        while True:
+            message = pubsub.get_message(timeout=0)
+            if message is None:
+                return True
+            payload = json.loads(message["data"])
+            if payload.get("reset"):
+                return False
+            numbers = _state["numbers"].get(payload.get("doctype"))
+            if numbers is not None and payload.get("invoice_number"):
+                numbers.add(payload["invoice_number"])
+    except Exception as e:
+        logger.warning(f"Invoice index pub/sub okunamadı: {str(e)}")
+        _close_pubsub()
+        return True
+
+
+def sync():
+    """Index'i güncelle (gerekirse yeniden yükle) - pool'a dağıtmadan önce parent'ta çağrılır"""
+    cache = frappe.cache()
+    if _state["numbers"] is None or _read_version(cache) != _state["version"] or not _drain():
+        _load(cache)
+
+
+def _pending():
+    """Bu transaction'da eklenmiş, henüz commit edilmemiş numaralar"""
+    if frappe.flags.invoice_index_pending is None:
+        frappe.flags.invoice_index_pending = set()
+    return frappe.flags.invoice_index_pending
+
+
+def snapshot():
+    """(versiyon, numaralar) - extraction pool worker'larına verilen kopya"""
+    return _state["version"], _state["numbers"]
+
+
+def load_snapshot(numbers):
+    """Pool worker'ı: parent'ın kopyası (sonradan eklenen numaralar görülmez, sadece erken tarama etkilenir)"""
+    _state["numbers"] = numbers
+
+
+def contains(doctype, invoice_number) -> bool:
+    """Sadece bellek kontrolü (Redis/DB yok) - process pool worker'larında da güvenle çağrılabilir"""
+    numbers = (_state["numbers"] or {}).get(doctype)
+    return bool(invoice_number) and numbers is not None and invoice_number in numbers
+
+
+def check_many(pairs) -> set:
+    """[(doctype, invoice_number), ...] → mevcut olan çiftler (email başına tek kontrol)"""
+    pairs = {pair for pair in pairs if pair and all(pair)}
+    if not pairs:
+        return set()
+
+    sync()
+    pending = _pending()
+    known = {pair for pair in pairs if pair in pending or contains(*pair)}
+
+    if _state["pubsub"] is None:
+        # Pub/sub yoksa başka worker'ların eklemeleri kaçmış olabilir - kalanları DB'den doğrula
+        unknown_by_doctype = {}
+        for doctype, number in pairs - known:
+            unknown_by_doctype.setdefault(doctype, []).append(number)
+        for doctype, numbers in unknown_by_doctype.items():
+            found = frappe.get_all(doctype, filters={FIELD_INVOICE_NUMBER: ["in", numbers]}, pluck=FIELD_INVOICE_NUMBER)
+            known.update((doctype, number) for number in found)
+            _state["numbers"][doctype].update(found)
+
+    return known
+
+
+def exists(doctype, invoice_number) -> bool:
+    if not invoice_number:
+        return False
+    return (doctype, invoice_number) in check_many([(doctype, invoice_number)])
+
+
+def _publish(payload):
+    try:
+        cache = frappe.cache()
+        cache.publish(_channel(cache), json.dumps(payload))
+    except Exception as e:
+        logger.warning(f"Invoice index yayını başarısız: {str(e)}")
+
+
+def invalidate():
+    """Tüm process'lerin index'ini geçersiz kıl"""
+    try:
+        cache = frappe.cache()
+        cache.incr(_version_key(cache))
+    except Exception as e:
+        logger.warning(f"Invoice index versiyonu artırılamadı: {str(e)}")
+    _publish({"reset": True})
+    _state["numbers"] = None
+
+
+# ============================================================================
+# doc_events (Lieferando / Wolt / Uber Eats Invoice)
+# ============================================================================
+
+
+def on_invoice_insert(doc, method=None):
+    invoice_number = doc.get(FIELD_INVOICE_NUMBER)
+    if not invoice_number:
+        return
+    pair = (doc.doctype, invoice_number)
+    _pending().add(pair)
+
+    def _after_rollback():
+        _pending().discard(pair)
+
+    def _after_commit():
+        if pair not in _pending():
+            # Kayıt savepoint ile geri alındı
+            return
+        _pending().discard(pair)
+        if _state["numbers"] is not None:
+            _state["numbers"][doc.doctype].add(invoice_number)
+        _publish({"doctype": doc.doctype, "invoice_number": invoice_number})
+
+    frappe.db.after_commit.add(_after_commit)
+    frappe.db.after_rollback.add(_after_rollback)
+    unit_of_work = get_active_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.on_savepoint_rollback(_after_rollback)
+
+
+def on_invoice_update(doc, method=None):
+    previous = doc.get_doc_before_save()
+    if previous is not None and previous.get(FIELD_INVOICE_NUMBER) != doc.get(FIELD_INVOICE_NUMBER):
+        frappe.db.after_commit.add(invalidate)
+
+
+def on_invoice_change(doc, method=None, *args, **kwargs):
+    """on_trash / after_rename"""
+    frappe.db.after_commit.add(invalidate)
@@ -0,0 +1,211 @@
+"""
+Platformlar arası fatura defteri (Invoice Ledger Entry)
+Lieferando / Wolt / Uber Eats faturalarının ortak özet satırı: platform, restoran, dönem, brüt,
+komisyon, KDV, ödeme ve kaynak fatura. "Restoran başına haftalık ödeme" gibi raporlar üç tabloyu
+ayrı ayrı taramak yerine bu tablo üzerinde tek index'li aralık taraması yapar.
+
+- Fatura oluşturulurken (create_*_invoice_doc) ve güncellenince (on_update) satır upsert edilir
+- İptal / silmede satır kaldırılır
+- Mevcut faturalar için: rebuild_ledger (patch ve whitelisted arka plan job'u)
+"""
+
+import frappe
+from frappe.utils import flt
+
+from invoice.api.constants import (
+    DOCTYPE_INVOICE_LEDGER_ENTRY,
+    DOCTYPE_LIEFERANDO_INVOICE,
+    DOCTYPE_UBER_EATS_INVOICE,
+    DOCTYPE_WOLT_INVOICE,
+    INVOICE_LEDGER_CHUNK_SIZE,
+    PLATFORM_INVOICE_DOCTYPES,
+)
+
+logger = frappe.logger("invoice.invoice_ledger", allow_site=frappe.local.site)
+
+DOCTYPE_PLATFORMS = {doctype: platform for platform, doctype in PLATFORM_INVOICE_DOCTYPES.items()}
+
+LEDGER_FIELDS = (
+    "platform", "restaurant_name", "restaurant_id", "invoice_date", "period_start", "period_end",
+    "gross_amount", "fee_amount", "vat_amount", "payout_amount",
+    "source_doctype", "source_name", "invoice_number", "source_docstatus",
+)
+
+
+def _lieferando_amounts(row):
+    return {
+        "restaurant_id": row.get("customer_number"),
+        "gross_amount": flt(row.get("total_revenue")),
+        "fee_amount": flt(row.get("service_fee_amount")) + flt(row.get("admin_fee_amount")),
+        "vat_amount": flt(row.get("tax_amount")),
+        "payout_amount": flt(row.get("auszahlung_gesamt")) or flt(row.get("payout_amount")),
+    }
+
+
+def _wolt_amounts(row):
+    return {
+        "restaurant_id": row.get("customer_number"),
+        "gross_amount": flt(row.get("goods_gross_total")),
+        "fee_amount": flt(row.get("distribution_gross_total")),
+        "vat_amount": flt(row.get("distribution_vat_total")),
+        # Netting raporu geldiyse gerçek ödeme, yoksa fatura üzerindeki (A-B)
+        "payout_amount": flt(row.get("netting_net_payout")) or flt(row.get("netprice_gross_total")),
+    }
+
+
+def _uber_eats_amounts(row):
+    return {
+        "restaurant_id": row.get("business_id"),
+        "gross_amount": flt(row.get("total_order_value")),
+        "fee_amount": flt(row.get("uber_eats_fee")),
+        "vat_amount": flt(row.get("vat_amount")) or flt(row.get("vat_19_percent")),
+        "payout_amount": flt(row.get("total_payout")),
+    }
+
+
+# DocType → (tutar eşlemesi, kaynak alanlar)
+LEDGER_SOURCES = {
+    DOCTYPE_LIEFERANDO_INVOICE: (
+        _lieferando_amounts,
+        ("customer_number", "total_revenue", "service_fee_amount", "admin_fee_amount", "tax_amount",
+         "auszahlung_gesamt", "payout_amount"),
+    ),
+    DOCTYPE_WOLT_INVOICE: (
+        _wolt_amounts,
+        ("customer_number", "goods_gross_total", "distribution_gross_total", "distribution_vat_total",
+         "netting_net_payout", "netprice_gross_total"),
+    ),
+    DOCTYPE_UBER_EATS_INVOICE: (
+        _uber_eats_amounts,
+        ("business_id", "total_order_value", "uber_eats_fee", "vat_amount", "vat_19_percent", "total_payout"),
+    ),
+}
+COMMON_SOURCE_FIELDS = ("name", "docstatus", "invoice_number", "restaurant_name", "invoice_date", "period_start", "period_end")
+
+
+def get_ledger_name(doctype, name):
+    return f"{doctype}-{name}"
+
+
+def build_ledger_values(doctype, row):
+    """Fatura (doc veya get_all satırı) → Invoice Ledger Entry alanları"""
+    amounts, _fields = LEDGER_SOURCES[doctype]
+    return {
+        "platform": DOCTYPE_PLATFORMS[doctype],
+        "restaurant_name": row.get("restaurant_name"),
+        "invoice_date": row.get("invoice_date"),
+        "period_start": row.get("period_start"),
+        "period_end": row.get("period_end"),
+        **amounts(row),
+        "source_doctype": doctype,
+        "source_name": row.get("name"),
+        "invoice_number": row.get("invoice_number"),
+        "source_docstatus": row.get("docstatus") or 0,
+    }
+
+
+def upsert_ledger_entry(invoice):
+    """Faturanın defter satırını oluştur / güncelle (iptal edilmiş fatura satırı kaldırılır)"""
+    if invoice.doctype not in LEDGER_SOURCES:
+        return
+    if invoice.docstatus == 2:
+        delete_ledger_entry(invoice)
+        return
+
+    name = get_ledger_name(invoice.doctype, invoice.name)
+    values = build_ledger_values(invoice.doctype, invoice)
+    if frappe.db.exists(DOCTYPE_INVOICE_LEDGER_ENTRY, name):
+        frappe.db.set_value(DOCTYPE_INVOICE_LEDGER_ENTRY, name, values, update_modified=True)
+        return
+    frappe.get_doc({"doctype": DOCTYPE_INVOICE_LEDGER_ENTRY, **values}).insert(ignore_permissions=True)
+
+
+def refresh_ledger_entry(doctype, name):
+    """Fatura frappe.db.set_value ile güncellendiyse (hook çalışmaz) defter satırını yenile"""
+    if doctype in LEDGER_SOURCES:
+        upsert_ledger_entry(frappe.get_doc(doctype, name))
+
+
+def delete_ledger_entry(doc, method=None):
+    frappe.db.delete(DOCTYPE_INVOICE_LEDGER_ENTRY, {"name": get_ledger_name(doc.doctype, doc.name)})
+
+
+def on_invoice_update(doc, method=None):
+    """on_update / on_submit / on_update_after_submit / on_cancel"""
+    # Oluşturma sırasında create_*_invoice_doc upsert eder
+    if doc.flags.in_insert:
+        return
+    upsert_ledger_entry(doc)
+
+
+def on_invoice_rename(doc, method=None, old_name=None, new_name=None, merge=False):
+    """after_rename: defter satırının adı kaynak faturanın adını içerir"""
+    frappe.db.delete(DOCTYPE_INVOICE_LEDGER_ENTRY, {"name": get_ledger_name(doc.doctype, old_name)})
+    upsert_ledger_entry(doc)
+
+
+def _rebuild_doctype(doctype, chunk_size):
+    _amounts, source_fields = LEDGER_SOURCES[doctype]
+    fields = [*COMMON_SOURCE_FIELDS, *source_fields]
+    now = frappe.utils.now()
+    user = frappe.session.user
+    count = 0
+    last_name = None
+    while True:
+        filters = {"docstatus": ["<", 2]}
+        if last_name is not None:
+            filters["name"] = [">", last_name]
+        rows = frappe.get_all(doctype, filters=filters, fields=fields, order_by="name asc", limit=chunk_size)
+        if not rows:
+            return count
+
+        names = [get_ledger_name(doctype, row.name) for row in rows]
+        frappe.db.delete(DOCTYPE_INVOICE_LEDGER_ENTRY, {"name": ["in", names]})
+        frappe.db.bulk_insert(
+            DOCTYPE_INVOICE_LEDGER_ENTRY,
+            ("name", "creation", "modified", "owner", "modified_by", "docstatus", *LEDGER_FIELDS),
+            (
+                (ledger_name, now, now, user, user, 0, *(values[field] for field in LEDGER_FIELDS))
+                for ledger_name, values in zip(names, (build_ledger_values(doctype, row) for row in rows))
+            ),
+        )
+        frappe.db.commit()
+        count += len(rows)
+        last_name = rows[-1].name
+
+
+def rebuild_ledger(doctypes=None, chunk_size=INVOICE_LEDGER_CHUNK_SIZE):
+    """Defteri mevcut faturalardan yeniden kur (chunk başına commit, tekrar çalıştırılabilir)"""
+    if isinstance(doctypes, str):
+        doctypes = [doctypes]
+    counts = {}
+    for doctype in doctypes or LEDGER_SOURCES:
+        if doctype not in LEDGER_SOURCES:
+            continue
+        # Artık olmayan / iptal edilmiş faturaların satırları
+        frappe.db.sql(
+            f"""delete ledger from `tab{DOCTYPE_INVOICE_LEDGER_ENTRY}` ledger
+            left join `tab{doctype}` invoice on invoice.name = ledger.source_name
+            where ledger.source_doctype = %s and (invoice.name is null or invoice.docstatus = 2)""",
+            doctype,
+        )
+        counts[doctype] = _rebuild_doctype(doctype, chunk_size)
+        logger.info(f"Invoice Ledger: {doctype} - {counts[doctype]} satır")
+    return counts
+
+
+@frappe.whitelist()
+def enqueue_rebuild_ledger(doctypes=None):
+    """Defter backfill'ini arka planda başlat"""
+    frappe.only_for("System Manager")
+    if isinstance(doctypes, str) and doctypes.startswith("["):
+        doctypes = frappe.parse_json(doctypes)
+    frappe.enqueue(
+        "invoice.api.invoice_ledger.rebuild_ledger",
+        queue="long",
+        timeout=3600,
+        job_id="invoice-ledger-rebuild",
+        deduplicate=True,
+        doctypes=doctypes,
+    )
+    return True
@@ -0,0 +1,121 @@
+"""
+Fatura bazında advisory lock
+Birden fazla ingestion worker aynı anda çalışırken aynı (DocType, invoice_number) için
+kontrol + insert bloğu tek worker'da çalışır. Lock veritabanı oturumuna aittir (MariaDB GET_LOCK,
+Postgres pg_advisory_lock) ve transaction commit / rollback edilene kadar tutulur; böylece ikinci
+worker lock'u aldığında ilk worker'ın kaydı commit edilmiş olur.
+
+Site config:
+- invoice_lock_timeout: lock için beklenecek saniye (varsayılan 30); süre dolarsa
+  QueryTimeoutError fırlatılır ve ingestion job'u tekrar denenir
+"""
+
+import hashlib
+import time
+from datetime import datetime
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import INVOICE_LOCK_TIMEOUT_DEFAULT, TEMP_INVOICE_SEQUENCE_KEY
+
+logger = frappe.logger("invoice.invoice_lock", allow_site=frappe.local.site)
+
+
+def get_lock_timeout():
+    return cint(frappe.conf.get("invoice_lock_timeout") or INVOICE_LOCK_TIMEOUT_DEFAULT)
+
+
+def _lock_name(doctype, invoice_number):
+    # MariaDB lock adı en fazla 64 karakter; site başına ayrı isim alanı
+    digest = hashlib.sha1(f"{frappe.local.site}|{doctype}|{invoice_number}".encode("utf-8")).hexdigest()
+    return f"invoice:{digest}"
+
+
+def _pg_key(name):
+    # pg_advisory_lock bigint anahtar ister
+    return int(name.split(":", 1)[1][:15], 16)
+
+
+def _held_locks():
+    if frappe.flags.invoice_locks is None:
+        frappe.flags.invoice_locks = set()
+    return frappe.flags.invoice_locks
+
+
+def _get_lock(name, timeout):
+    if frappe.db.db_type == "postgres":
+        deadline = time.monotonic() + timeout
+        while True:
+            result = frappe.db.sql("select pg_try_advisory_lock(%s)", _pg_key(name))
+            if result and result[0][0]:
+                return True
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.2)
+    result = frappe.db.sql("select get_lock(%s, %s)", (name, timeout))
+    return bool(result and result[0][0])
+
+
+def _release_lock(name):
+    if frappe.db.db_type == "postgres":
+        frappe.db.sql("select pg_advisory_unlock(%s)", _pg_key(name))
+    else:
+        frappe.db.sql("select release_lock(%s)", name)
+
+
+def release_invoice_locks():
+    """Tutulan tüm fatura lock'larını bırak (commit / rollback sonrası)"""
+    locks = frappe.flags.invoice_locks
+    if not locks:
+        return
+    frappe.flags.invoice_locks = set()
+    for name in locks:
+        try:
+            _release_lock(name)
+        except Exception as e:
+            # Bağlantı kapanınca lock zaten düşer
+            logger.warning(f"Fatura lock'u bırakılamadı: {name} - {str(e)}")
+
+
+def acquire_invoice_lock(doctype, invoice_number):
+    """(DocType, invoice_number) lock'unu al - transaction sonuna kadar tutulur"""
+    if not invoice_number:
+        return
+    name = _lock_name(doctype, invoice_number)
+    held = _held_locks()
+    if name in held:
+        return
+
+    timeout = get_lock_timeout()
+    if not _get_lock(name, timeout):
+        raise frappe.QueryTimeoutError(f"Fatura lock'u alınamadı ({timeout} sn): {doctype} {invoice_number}")
+
+    if not held:
+        frappe.db.after_commit.add(release_invoice_locks)
+        frappe.db.after_rollback.add(release_invoice_locks)
+    held.add(name)
+
+
+def invoice_exists(doctype, invoice_number):
+    """Lock alındıktan sonra kesin kontrol: bellekteki index + (index'te yoksa) veritabanı"""
+    if not invoice_number:
+        return False
+    from invoice.api import invoice_index
+
+    if invoice_index.exists(doctype, invoice_number):
+        return True
+    # Başka bir worker az önce commit etmiş olabilir (pub/sub henüz ulaşmamış)
+    return bool(frappe.db.exists(doctype, {"invoice_number": invoice_number}))
+
+
+def generate_temp_invoice_number():
+    """Geçici fatura numarası: TEMP-<zaman>-<sıra>; sıra Redis sayacından, worker'lar arasında çakışmaz"""
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    try:
+        cache = frappe.cache()
+        sequence = cache.incr(cache.make_key(TEMP_INVOICE_SEQUENCE_KEY))
+        return f"TEMP-{timestamp}-{sequence:06d}"
+    except Exception as e:
+        logger.warning(f"Geçici numara sayacı okunamadı, rastgele ek kullanılıyor: {str(e)}")
+        return f"TEMP-{timestamp}-{frappe.generate_hash(length=8)}"
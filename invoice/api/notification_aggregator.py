@@ -0,0 +1,310 @@
+"""
+Fatura işleme bildirimleri (debounce'lu toplu özet)
+Email başına kullanıcı kullanıcı realtime yayın ve fatura başına msgprint yerine, email
+istatistikleri Redis'te biriktirilir. Scheduler her dakika pencereyi kontrol eder; pencere
+dolduysa tek bir site odası (room) yayını ve tek bir Notification Log gönderimi yapılır.
+Tasarruf edilen yayın sayısı loglanır ve get_notification_stats ile okunabilir.
+
+Notification Log'lar digest modunda pencere başına tek job'da, tüm kullanıcılar için çok satırlı
+insert ile yazılır (email başına kullanıcı sayısı kadar insert yerine).
+
+Site config:
+- invoice_notification_window: pencere süresi (saniye, varsayılan 60)
+- invoice_notification_mode: "digest" (varsayılan) veya "per_email" (email başına bir job)
+"""
+
+import json
+import time
+
+import frappe
+from frappe.realtime import get_site_room
+from frappe.utils import cint
+
+from invoice.api.constants import (
+    DOCTYPE_COMMUNICATION,
+    DOCTYPE_NOTIFICATION_LOG,
+    NOTIFICATION_BUFFER_KEY,
+    NOTIFICATION_INVOICE_LIMIT,
+    NOTIFICATION_INVOICES_KEY,
+    NOTIFICATION_MODE_DIGEST,
+    NOTIFICATION_MODE_PER_EMAIL,
+    NOTIFICATION_STATS_KEY,
+    NOTIFICATION_SUBJECTS_KEY,
+    NOTIFICATION_TITLE_BATCH_SUMMARY,
+    NOTIFICATION_TYPE_ALERT,
+    NOTIFICATION_WINDOW_DEFAULT,
+    REALTIME_EVENT_SHOW_ALERT,
+    USER_TYPE_SYSTEM,
+)
+
+logger = frappe.logger("invoice.notification_aggregator", allow_site=frappe.local.site)
+
+COUNTER_FIELDS = ("total_detected", "already_processed", "newly_processed", "errors")
+
+
+def get_notification_window():
+    window = frappe.conf.get("invoice_notification_window")
+    return NOTIFICATION_WINDOW_DEFAULT if window is None else cint(window)
+
+
+def get_notification_mode():
+    mode = frappe.conf.get("invoice_notification_mode")
+    return mode if mode in (NOTIFICATION_MODE_PER_EMAIL, NOTIFICATION_MODE_DIGEST) else NOTIFICATION_MODE_DIGEST
+
+
+def _keys(cache):
+    return (
+        cache.make_key(NOTIFICATION_BUFFER_KEY),
+        cache.make_key(NOTIFICATION_INVOICES_KEY),
+        cache.make_key(NOTIFICATION_SUBJECTS_KEY),
+    )
+
+
+def get_active_system_users():
+    return frappe.get_all("User", filters={"enabled": 1, "user_type": USER_TYPE_SYSTEM}, pluck="name")
+
+
+def add_email_stats(stats, email_subject):
+    """Bir email'in işleme istatistiklerini pencereye ekle (yayın yapılmaz)"""
+    if not stats.get("total_detected") and not stats.get("already_processed"):
+        return
+
+    invoices = stats.get("invoices_created") or []
+    if get_notification_mode() == NOTIFICATION_MODE_PER_EMAIL:
+        summary = {field: cint(stats.get(field)) for field in COUNTER_FIELDS}
+        summary.update(emails=1, invoices=len(invoices))
+        _enqueue_notification_logs(summary, build_message(summary, invoices, [email_subject or ""]))
+
+    try:
+        cache = frappe.cache()
+        buffer_key, invoices_key, subjects_key = _keys(cache)
+        pipe = cache.pipeline()
+        for field in COUNTER_FIELDS:
+            if stats.get(field):
+                pipe.hincrby(buffer_key, field, cint(stats.get(field)))
+        pipe.hincrby(buffer_key, "emails", 1)
+        pipe.hincrby(buffer_key, "invoices", len(invoices))
+        pipe.hsetnx(buffer_key, "first_at", time.time())
+        if invoices:
+            pipe.rpush(invoices_key, *(json.dumps(inv, default=str) for inv in invoices))
+            pipe.ltrim(invoices_key, -NOTIFICATION_INVOICE_LIMIT, -1)
+        pipe.rpush(subjects_key, (email_subject or "")[:60])
+        pipe.ltrim(subjects_key, -NOTIFICATION_INVOICE_LIMIT, -1)
+        pipe.execute()
+    except Exception as e:
+        # Redis yoksa özeti hemen yayınla (tek yayın)
+        logger.warning(f"Bildirim tamponuna yazılamadı, doğrudan gönderiliyor: {str(e)}")
+        summary = {field: cint(stats.get(field)) for field in COUNTER_FIELDS}
+        summary.update(emails=1, invoices=len(invoices))
+        _publish(summary, invoices, [email_subject or ""])
+
+
+def _take_window(cache, force=False):
+    """Pencere dolduysa tamponu atomik olarak oku ve temizle → (özet, faturalar, konular) veya None"""
+    buffer_key, invoices_key, subjects_key = _keys(cache)
+    first_at = cache.hget(buffer_key, "first_at")
+    if first_at is None:
+        return None
+    if not force and time.time() - float(first_at) < get_notification_window():
+        return None
+
+    pipe = cache.pipeline(transaction=True)
+    pipe.hgetall(buffer_key)
+    pipe.lrange(invoices_key, 0, -1)
+    pipe.lrange(subjects_key, 0, -1)
+    pipe.delete(buffer_key, invoices_key, subjects_key)
+    buffer, invoices, subjects, _deleted = pipe.execute()
+    if not buffer:
+        # first_at okunduktan sonra başka bir flush tamponu boşalttı: "0 email" özeti yayınlanmaz
+        return None
+
+    summary = {key.decode(): value.decode() for key, value in buffer.items()}
+    summary = {field: cint(summary.get(field)) for field in (*COUNTER_FIELDS, "emails", "invoices")}
+    return (
+        summary,
+        [json.loads(inv) for inv in invoices],
+        [subject.decode() for subject in subjects],
+    )
+
+
+def _platform_label(doctype):
+    return doctype.replace(" Invoice", "")
+
+
+def build_message(summary, invoices, subjects):
+    from frappe.utils.data import get_url_to_form
+
+    parts = [f"📧 <b>Email İşleme Özeti</b><br><b>İşlenen Email Sayısı:</b> {summary['emails']}<br>"]
+    if summary["emails"] == 1 and subjects:
+        parts.append(f"<b>Email:</b> {subjects[-1]}<br>")
+    parts.append("<br>")
+    if summary["total_detected"]:
+        parts.append(f"✅ <b>Yakalanan Fatura:</b> {summary['total_detected']}<br>")
+    if summary["already_processed"]:
+        parts.append(f"⚠️ <b>Daha Önce İşlenmiş:</b> {summary['already_processed']}<br>")
+    if summary["newly_processed"]:
+        parts.append(f"🆕 <b>Yeni İşlenen:</b> {summary['newly_processed']}<br>")
+    if summary["errors"]:
+        parts.append(f"❌ <b>Hata:</b> {summary['errors']}<br>")
+
+    if invoices:
+        parts.append(f"<br><b>Oluşturulan Faturalar ({summary['invoices']}):</b><br>")
+        for inv in invoices[-10:]:
+            invoice_link = get_url_to_form(inv["doctype"], inv["name"])
+            parts.append(f"• <a href='{invoice_link}'>{_platform_label(inv['doctype'])} - {inv['invoice_number']}</a><br>")
+        if summary["invoices"] > 10:
+            parts.append(f"... ve {summary['invoices'] - 10} fatura daha<br>")
+    return "".join(parts)
+
+
+def _indicator(summary):
+    if summary["errors"]:
+        return "red"
+    if summary["already_processed"] and not summary["newly_processed"]:
+        return "orange"
+    return "green"
+
+
+def _notification_subject(summary):
+    subject = (
+        f"Fatura İşleme Özeti: {summary['emails']} email, {summary['newly_processed']} yeni, "
+        f"{summary['already_processed']} tekrar"
+    )
+    if summary["errors"]:
+        subject += f", {summary['errors']} hata"
+    return subject
+
+
+def _enqueue_notification_logs(summary, message):
+    """Notification Log'ları arka planda oluştur (mod'a göre) - kullanıcı sayısını döndürür"""
+    users = get_active_system_users()
+    if not users:
+        return 0
+    notification = {
+        "type": NOTIFICATION_TYPE_ALERT,
+        "document_type": DOCTYPE_COMMUNICATION,
+        "subject": _notification_subject(summary),
+        "email_content": message,
+    }
+    if get_notification_mode() == NOTIFICATION_MODE_PER_EMAIL:
+        from frappe.desk.doctype.notification_log.notification_log import enqueue_create_notification
+
+        enqueue_create_notification(users, notification)
+    else:
+        frappe.enqueue(
+            "invoice.api.notification_aggregator.create_notification_logs",
+            queue="short",
+            users=users,
+            notification=notification,
+        )
+    return len(users)
+
+
+def create_notification_logs(users, notification):
+    """
+    Digest job'u: tüm kullanıcılar için Notification Log'ları tek çok satırlı insert ile yaz.
+    bulk_insert doc hook'larını çalıştırmaz; okunmadı işareti tek UPDATE, zil güncellemesi tek
+    site odası yayını ile yapılır. Notification Log email'i gönderilmez (özet email içeriği log'da).
+    """
+    disabled = set(
+        frappe.get_all(
+            "Notification Settings", filters={"name": ["in", users], "enabled": 0}, pluck="name"
+        )
+    )
+    users = [user for user in users if user not in disabled]
+    if not users:
+        return 0
+
+    now = frappe.utils.now()
+    owner = frappe.session.user
+    frappe.db.bulk_insert(
+        DOCTYPE_NOTIFICATION_LOG,
+        (
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "for_user", "from_user", "type", "document_type", "subject", "email_content", "read",
+        ),
+        (
+            (
+                frappe.generate_hash(length=10), now, now, owner, owner, 0,
+                user, notification.get("from_user"), notification["type"], notification.get("document_type"),
+                notification["subject"], notification.get("email_content"), 0,
+            )
+            for user in users
+        ),
+    )
+    frappe.db.set_value("Notification Settings", {"name": ["in", users]}, "seen", 0, update_modified=False)
+    # Job sonunda commit edilir
+    frappe.publish_realtime("notification", room=get_site_room(), after_commit=True)
+    logger.info(f"Digest Notification Log: {len(users)} kullanıcı, tek insert")
+    return len(users)
+
+
+def _publish(summary, invoices, subjects):
+    """Pencere özetini tek yayınla gönder, tasarruf edilen yayın sayısını döndür"""
+    message = build_message(summary, invoices, subjects)
+    # Kullanıcı başına değil, site odasına tek yayın
+    frappe.publish_realtime(
+        REALTIME_EVENT_SHOW_ALERT,
+        {
+            "message": message,
+            "alert": True,
+            "indicator": _indicator(summary),
+            "title": NOTIFICATION_TITLE_BATCH_SUMMARY,
+        },
+        room=get_site_room(),
+    )
+
+    digest = get_notification_mode() == NOTIFICATION_MODE_DIGEST
+    # per_email modunda Notification Log'lar add_email_stats'ta oluşturuldu
+    user_count = _enqueue_notification_logs(summary, message) if digest else len(get_active_system_users())
+
+    # Eski akış: email başına kullanıcı sayısı kadar show_alert + fatura başına bir msgprint
+    saved = summary["emails"] * user_count + summary["invoices"] - 1
+    try:
+        cache = frappe.cache()
+        pipe = cache.pipeline()
+        stats_key = cache.make_key(NOTIFICATION_STATS_KEY)
+        pipe.hincrby(stats_key, "windows", 1)
+        pipe.hincrby(stats_key, "emails", summary["emails"])
+        pipe.hincrby(stats_key, "publishes", 1)
+        pipe.hincrby(stats_key, "publishes_saved", max(saved, 0))
+        if digest and user_count:
+            # Eski akış: email başına bir job, kullanıcı başına bir insert
+            pipe.hincrby(stats_key, "notification_jobs", 1)
+            pipe.hincrby(stats_key, "notification_jobs_saved", summary["emails"] - 1)
+            pipe.hincrby(stats_key, "notification_logs", user_count)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Bildirim istatistikleri yazılamadı: {str(e)}")
+
+    logger.info(
+        f"Bildirim penceresi gönderildi: {summary['emails']} email, {summary['invoices']} fatura, "
+        f"1 yayın ({max(saved, 0)} yayın tasarruf edildi)"
+    )
+    return max(saved, 0)
+
+
+def flush_notifications(force=False):
+    """Scheduler (her dakika): pencere dolduysa özeti gönder"""
+    try:
+        window = _take_window(frappe.cache(), force=force)
+    except Exception as e:
+        logger.warning(f"Bildirim tamponu okunamadı: {str(e)}")
+        return None
+    if window is None:
+        return None
+    try:
+        return _publish(*window)
+    except Exception as e:
+        logger.error(f"Bildirim özeti gönderilemedi: {str(e)}")
+        frappe.log_error(title="Invoice Notification Flush Error", message=frappe.get_traceback())
+        return None
+
+
+@frappe.whitelist()
+def get_notification_stats():
+    """Toplam pencere / yayın / tasarruf edilen yayın ve Notification Log job sayıları"""
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    stats = cache.hgetall(cache.make_key(NOTIFICATION_STATS_KEY)) or {}
+    return {key.decode(): cint(value) for key, value in stats.items()}
@@ -0,0 +1,179 @@
+"""
+PDF metin çıkarma backend'leri
+Her backend aynı arayüzü sunar: open(bytes) → doküman (page_count, page_text(i), iter_pages()).
+Varsayılan PyPDF2'dir (extraction regex'leri bu çıktıya göre yazıldı); pypdf, pypdfium2 ve
+pdfminer.six kuruluysa kullanılabilir. Seçim site config "invoice_pdf_backend" ile yapılır
+(invoice.tools.pdf_backend_benchmark en hızlı uyumlu backend'i seçip buraya yazar).
+"""
+
+import io
+
+import frappe
+
+from invoice.api.constants import PDF_BACKEND_DEFAULT
+
+logger = frappe.logger("invoice.pdf_backends", allow_site=frappe.local.site)
+
+
+class PdfDocument:
+    """Açılmış PDF - sayfa metinleri sadece istendiğinde çıkarılır"""
+
+    page_count = 0
+
+    def page_text(self, index: int) -> str:
+        raise NotImplementedError
+
+    def iter_pages(self):
+        for index in range(self.page_count):
+            yield self.page_text(index)
+
+
+class PdfBackend:
+    """Backend tanımı: name + kurulu kütüphane varsa open()"""
+
+    name = None
+
+    def __init__(self):
+        self._lib = None
+        self._checked = False
+
+    @property
+    def lib(self):
+        if not self._checked:
+            self._checked = True
+            try:
+                self._lib = self.load()
+            except ImportError:
+                self._lib = None
+        return self._lib
+
+    def load(self):
+        raise NotImplementedError
+
+    def is_available(self) -> bool:
+        return self.lib is not None
+
+    def open(self, content: bytes) -> PdfDocument:
+        raise NotImplementedError
+
+
+class _ReaderDocument(PdfDocument):
+    """PyPDF2/pypdf PdfReader sarmalayıcısı"""
+
+    def __init__(self, reader):
+        self._reader = reader
+        self.page_count = len(reader.pages)
+
+    def page_text(self, index):
+        return self._reader.pages[index].extract_text() or ""
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+
+    def load(self):
+        import PyPDF2
+
+        return PyPDF2
+
+    def open(self, content):
+        return _ReaderDocument(self.lib.PdfReader(io.BytesIO(content)))
+
+
+class PypdfBackend(PdfBackend):
+    name = "pypdf"
+
+    def load(self):
+        import pypdf
+
+        return pypdf
+
+    def open(self, content):
+        return _ReaderDocument(self.lib.PdfReader(io.BytesIO(content)))
+
+
+class _PdfiumDocument(PdfDocument):
+    def __init__(self, pdf):
+        self._pdf = pdf
+        self.page_count = len(pdf)
+
+    def page_text(self, index):
+        page = self._pdf[index]
+        textpage = page.get_textpage()
+        try:
+            return (textpage.get_text_range() or "").replace("\r\n", "\n")
+        finally:
+            textpage.close()
+            page.close()
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pypdfium2"
+
+    def load(self):
+        import pypdfium2
+
+        return pypdfium2
+
+    def open(self, content):
+        return _PdfiumDocument(self.lib.PdfDocument(content))
+
+
+class _PdfMinerDocument(PdfDocument):
+    def __init__(self, lib, content):
+        self._lib = lib
+        self._content = content
+        self.page_count = sum(1 for _ in lib.PDFPage.get_pages(io.BytesIO(content)))
+
+    def page_text(self, index):
+        return self._lib.extract_text(io.BytesIO(self._content), page_numbers=[index]) or ""
+
+
+class PdfMinerBackend(PdfBackend):
+    name = "pdfminer"
+
+    def load(self):
+        from pdfminer.high_level import extract_text
+        from pdfminer.pdfpage import PDFPage
+
+        return frappe._dict(extract_text=extract_text, PDFPage=PDFPage)
+
+    def open(self, content):
+        return _PdfMinerDocument(self.lib, content)
+
+
+# Kayıt sırası = tercih sırası (config yoksa ilk kurulu backend kullanılır)
+_backends = {}
+_fallback_warned = set()
+
+
+def register_backend(backend: PdfBackend):
+    _backends[backend.name] = backend
+
+
+for _backend in (PyPDF2Backend(), PypdfBackend(), PdfiumBackend(), PdfMinerBackend()):
+    register_backend(_backend)
+
+
+def get_registered_backends() -> list:
+    return list(_backends.values())
+
+
+def get_available_backends() -> list:
+    return [backend for backend in _backends.values() if backend.is_available()]
+
+
+def get_backend(name=None):
+    """İstenen (veya site config'teki) backend; kurulu değilse ilk kurulu backend, hiçbiri yoksa None"""
+    name = name or frappe.conf.get("invoice_pdf_backend") or PDF_BACKEND_DEFAULT
+    backend = _backends.get(name)
+    if backend is not None and backend.is_available():
+        return backend
+
+    available = get_available_backends()
+    if not available:
+        return None
+    if name not in _fallback_warned:
+        _fallback_warned.add(name)
+        logger.warning(f"PDF backend '{name}' kullanılamıyor, '{available[0].name}' kullanılacak")
+    return available[0]
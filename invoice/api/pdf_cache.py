@@ -0,0 +1,178 @@
+"""
+PDF parse cache
+Bir email işleme turunda aynı PDF'in sadece bir kez parse edilmesini sağlar.
+Anahtar File.content_hash (Frappe'nin hesapladığı içerik hash'i) değeridir.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import frappe
+
+from invoice.api.pdf_backends import get_backend
+from invoice.api.pdf_text import PdfText
+
+logger = frappe.logger("invoice.pdf_cache", allow_site=frappe.local.site)
+
+# Worker process boyunca yaşayan, boyutu sınırlı LRU (site config: invoice_pdf_cache_size)
+_shared_lru = OrderedDict()
+
+
+class ParsedPDF:
+    """Parse edilmiş PDF - sayfa metinleri ihtiyaç oldukça çıkarılır ve saklanır"""
+
+    def __init__(self, content_hash, content=None, pages=None, backend=None):
+        self.content_hash = content_hash
+        self._content = content
+        self._backend = backend
+        self._reader = None
+        self._text = None
+        self._pages = list(pages) if pages is not None else None
+        if self._pages is not None and all(page is not None for page in self._pages):
+            self._content = None
+
+    def _get_reader(self):
+        if self._reader is None:
+            backend = self._backend or get_backend()
+            if backend is None:
+                raise RuntimeError("PDF metin çıkarma backend'i yüklü değil")
+            self._reader = backend.open(self._content)
+            if self._pages is None:
+                self._pages = [None] * self._reader.page_count
+        return self._reader
+
+    @property
+    def page_count(self) -> int:
+        if self._pages is None:
+            self._get_reader()
+        return len(self._pages)
+
+    def page_text(self, index: int) -> str:
+        """Tek bir sayfanın metnini döndür (gerekirse sadece o sayfayı çıkar)"""
+        if self._pages is None:
+            self._get_reader()
+        if self._pages[index] is None:
+            self._pages[index] = self._get_reader().page_text(index)
+            if all(page is not None for page in self._pages):
+                # Tüm sayfalar çıkarıldı, reader ve ham byte'lara artık gerek yok
+                self._reader = None
+                self._content = None
+        return self._pages[index]
+
+    @property
+    def first_page_text(self) -> str:
+        return self.page_text(0) if self.page_count > 0 else ""
+
+    @property
+    def pages(self) -> list:
+        return [self.page_text(i) for i in range(self.page_count)]
+
+    @property
+    def extracted_pages(self) -> list:
+        """Şimdiye kadar çıkarılmış sayfalar (çıkarılmamışlar None) - process'ler arası aktarım için"""
+        if self._pages is None:
+            self._get_reader()
+        return list(self._pages)
+
+    @property
+    def text(self) -> PdfText:
+        """Sayfa bazlı metin modeli (tüm sayfalar çıkarılır)"""
+        if self._text is None:
+            self._text = PdfText(self.pages)
+        return self._text
+
+    @property
+    def full_text(self) -> str:
+        return self.text.full_text
+
+
+def is_pdf_parser_available():
+    return get_backend() is not None
+
+
+def _get_lru_size():
+    try:
+        return int(frappe.conf.get("invoice_pdf_cache_size") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _lru_get(content_hash):
+    parsed = _shared_lru.get(content_hash)
+    if parsed is not None:
+        _shared_lru.move_to_end(content_hash)
+    return parsed
+
+
+def _lru_put(parsed):
+    size = _get_lru_size()
+    if size <= 0:
+        return
+    _shared_lru[parsed.content_hash] = parsed
+    _shared_lru.move_to_end(parsed.content_hash)
+    while len(_shared_lru) > size:
+        _shared_lru.popitem(last=False)
+
+
+class PDFCache:
+    """Tek bir process_invoice_email çalışması boyunca paylaşılan parse cache'i"""
+
+    def __init__(self):
+        self._by_hash = {}
+        self._hash_by_file = {}
+        self.parse_count = 0
+
+    def get(self, pdf_attachment):
+        """File kaydı için ParsedPDF döndür; hiçbir PDF backend'i yoksa None"""
+        if not is_pdf_parser_available():
+            logger.error("PDF metin çıkarma backend'i yüklü değil (PyPDF2, pypdf, pypdfium2 veya pdfminer.six)")
+            return None
+
+        parsed = self.get_cached(pdf_attachment)
+        if parsed is not None:
+            return parsed
+
+        content_hash, content = self.read_content(pdf_attachment)
+        return self._lookup(content_hash) or self.add(content_hash, content=content)
+
+    def get_cached(self, pdf_attachment):
+        """Daha önce parse edilmiş ParsedPDF (yoksa None) - dosya okunmaz"""
+        file_name = pdf_attachment.name
+        content_hash = self._hash_by_file.get(file_name) or pdf_attachment.get("content_hash")
+        parsed = self._lookup(content_hash)
+        if parsed is not None:
+            self._hash_by_file[file_name] = content_hash
+        return parsed
+
+    def read_content(self, pdf_attachment):
+        """Dosyayı diskten oku → (content_hash, bytes)"""
+        file_doc = frappe.get_doc("File", pdf_attachment.name)
+        with open(file_doc.get_full_path(), "rb") as pdf_file:
+            content = pdf_file.read()
+
+        # Frappe File.content_hash ile aynı algoritma (md5)
+        content_hash = file_doc.content_hash or hashlib.md5(content).hexdigest()
+        self._hash_by_file[pdf_attachment.name] = content_hash
+        return content_hash, content
+
+    def add(self, content_hash, content=None, pages=None):
+        """Yeni ParsedPDF kaydet (pages: başka bir process'te çıkarılmış sayfa metinleri)"""
+        parsed = self._lookup(content_hash)
+        if parsed is not None:
+            return parsed
+        parsed = ParsedPDF(content_hash, content=content, pages=pages)
+        self.parse_count += 1
+        self._by_hash[content_hash] = parsed
+        _lru_put(parsed)
+        return parsed
+
+    def _lookup(self, content_hash):
+        if not content_hash:
+            return None
+        parsed = self._by_hash.get(content_hash)
+        if parsed is None:
+            parsed = _lru_get(content_hash)
+            if parsed is not None:
+                logger.debug(f"PDF LRU cache'den alındı: {content_hash}")
+                self._by_hash[content_hash] = parsed
+        return parsed
@@ -0,0 +1,190 @@
+"""
+PDF sınıflandırıcı
+Dosya adı ve (gerekirse) sadece ilk sayfa metni ile PDF türünü tek geçişte belirler.
+"""
+
+import re
+from dataclasses import dataclass
+
+import frappe
+
+from invoice.api.constants import (
+    PDF_KIND_LIEFERANDO,
+    PDF_KIND_UBER_EATS,
+    PDF_KIND_UBER_EATS_ORDER_SUMMARY,
+    PDF_KIND_UNKNOWN,
+    PDF_KIND_WOLT,
+    PDF_KIND_WOLT_NETTING,
+    PDF_KIND_WOLT_SALES_REPORT,
+    PDF_KIND_WOLT_SELF_BILLING,
+    PLATFORM_LIEFERANDO,
+    PLATFORM_UBER_EATS,
+    PLATFORM_UNKNOWN,
+    PLATFORM_WOLT,
+)
+from invoice.api.pdf_cache import PDFCache
+
+logger = frappe.logger("invoice.pdf_classifier", allow_site=frappe.local.site)
+
+KIND_PLATFORMS = {
+    PDF_KIND_UBER_EATS_ORDER_SUMMARY: PLATFORM_UBER_EATS,
+    PDF_KIND_UBER_EATS: PLATFORM_UBER_EATS,
+    PDF_KIND_WOLT_SELF_BILLING: PLATFORM_WOLT,
+    PDF_KIND_WOLT_NETTING: PLATFORM_WOLT,
+    PDF_KIND_WOLT_SALES_REPORT: PLATFORM_WOLT,
+    PDF_KIND_WOLT: PLATFORM_WOLT,
+    PDF_KIND_LIEFERANDO: PLATFORM_LIEFERANDO,
+    PDF_KIND_UNKNOWN: PLATFORM_UNKNOWN,
+}
+
+# Wolt dosya adı pattern'leri:
+# - Edelweiss_Baumschulenstraße_2025-11-30_00:00:00.000_692cfcbbc3686f9e6b931ea6.pdf
+# - Edelweiss Baumschulenstraße__netting_report__semi_monthly__2025-11-16__2025-12-01.pdf
+# - Edelweiss Baumschulenstraße__sales_report__semi_monthly__2025-11-16__2025-12-01.pdf
+WOLT_FILENAME_PATTERNS = [
+    (re.compile(r'__netting_report__'), 'netting_report'),
+    (re.compile(r'__sales_report__'), 'sales_report'),
+    (re.compile(r'_\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d{3}_[a-f0-9]+\.pdf$'), 'tarih_hash'),  # Tarih ve hash pattern
+    (re.compile(r'_\d{4}-\d{2}-\d{2}__\d{4}-\d{2}-\d{2}\.pdf$'), 'tarih_araligi'),  # Tarih aralığı pattern
+]
+
+LIEFERANDO_FILENAME_PATTERNS = [
+    (re.compile(r'lieferando'), 'lieferando'),
+    (re.compile(r'yourdelivery'), 'yourdelivery'),
+    (re.compile(r'takeaway'), 'takeaway'),
+    (re.compile(r'rechnung_und'), 'rechnung_und'),  # Herhangi bir yerde
+]
+
+# Dosya adı tek başına türü kesin belirliyorsa PDF hiç okunmaz
+CONCLUSIVE_FILENAME_KINDS = {
+    'netting_report': PDF_KIND_WOLT_NETTING,
+    'sales_report': PDF_KIND_WOLT_SALES_REPORT,
+    'rechnung_und_start': PDF_KIND_LIEFERANDO,
+    'lieferando': PDF_KIND_LIEFERANDO,
+    'yourdelivery': PDF_KIND_LIEFERANDO,
+    'takeaway': PDF_KIND_LIEFERANDO,
+    'rechnung_und': PDF_KIND_LIEFERANDO,
+}
+
+LIEFERANDO_KEYWORDS = ("lieferando", "yourdelivery", "takeaway")
+
+
+@dataclass(frozen=True)
+class PdfClassification:
+    """Sınıflandırma sonucu: PDF türü ve türün nereden belirlendiği (filename / content)"""
+
+    kind: str
+    source: str
+
+    @property
+    def platform(self) -> str:
+        return KIND_PLATFORMS.get(self.kind, PLATFORM_UNKNOWN)
+
+
+def _match_filename(file_name_lower: str):
+    """Dosya adını pattern'lerle eşleştir → (platform, pattern adı) veya (None, None)"""
+    # ÖNEMLİ: "rechnung_und" ile başlayan dosyalar kesinlikle Lieferando
+    if file_name_lower.startswith("rechnung_und"):
+        return PLATFORM_LIEFERANDO, 'rechnung_und_start'
+
+    for pattern, pattern_name in WOLT_FILENAME_PATTERNS:
+        if pattern.search(file_name_lower):
+            return PLATFORM_WOLT, pattern_name
+
+    # Lieferando dosya adı pattern'leri (Wolt değilse)
+    for pattern, pattern_name in LIEFERANDO_FILENAME_PATTERNS:
+        if pattern.search(file_name_lower):
+            return PLATFORM_LIEFERANDO, pattern_name
+
+    return None, None
+
+
+def detect_platform_from_filename(file_name: str) -> str:
+    """Dosya adından platform tespit et"""
+    if not file_name:
+        logger.debug("detect_platform_from_filename: Dosya adı boş")
+        return None
+
+    file_name_lower = file_name.lower()
+    logger.debug(f"detect_platform_from_filename: {file_name_lower}")
+
+    platform, pattern_name = _match_filename(file_name_lower)
+    if platform:
+        logger.info(f"{'Wolt' if platform == PLATFORM_WOLT else 'Lieferando'} pattern eşleşti: {pattern_name}")
+        return platform
+
+    logger.debug("Dosya adından platform tespit edilemedi")
+    return None
+
+
+def classify_filename(file_name: str):
+    """Dosya adı türü kesin belirliyorsa PdfClassification, aksi halde None"""
+    if not file_name:
+        return None
+    _platform, pattern_name = _match_filename(file_name.lower())
+    kind = CONCLUSIVE_FILENAME_KINDS.get(pattern_name)
+    return PdfClassification(kind, "filename") if kind else None
+
+
+def classify_text(text: str) -> PdfClassification:
+    """Metni tek seferde küçük harfe çevirip tüm başlık/anahtar kelime kontrollerini yap"""
+    normalized = (text or "").lower()
+
+    # Önce role özgü başlıklar (tek başına belirleyici, platform kelimelerinden bağımsız):
+    # ÖNEMLİ: "Bestell- und Zahlungsübersicht" UberEats faturalarının karakteristik özelliği
+    if "bestell- und zahlungsübersicht" in normalized:
+        kind = PDF_KIND_UBER_EATS_ORDER_SUMMARY
+    # ÖNEMLİ: "Rechnung (Selbstfakturierung)" Wolt faturalarının karakteristik özelliği
+    elif "rechnung" in normalized and "selbstfakturierung" in normalized:
+        kind = PDF_KIND_WOLT_SELF_BILLING
+    elif "übersicht umsätze und auszahlungen" in normalized:
+        kind = PDF_KIND_WOLT_NETTING
+    # Başlık yoksa platform anahtar kelimeleri (sadece kind için fallback)
+    elif "uber eats" in normalized:
+        kind = PDF_KIND_UBER_EATS
+    elif "wolt" in normalized and "lieferando" not in normalized:
+        kind = PDF_KIND_WOLT
+    elif any(keyword in normalized for keyword in LIEFERANDO_KEYWORDS):
+        kind = PDF_KIND_LIEFERANDO
+    else:
+        kind = PDF_KIND_UNKNOWN
+
+    return PdfClassification(kind, "content")
+
+
+def classify_parsed_pdf(parsed) -> PdfClassification:
+    """Önce ilk sayfa; ilk sayfadan sonuç çıkmazsa tüm metin"""
+    if parsed is None or parsed.page_count == 0:
+        return PdfClassification(PDF_KIND_UNKNOWN, "content")
+
+    result = classify_text(parsed.first_page_text)
+    if result.kind == PDF_KIND_UNKNOWN and parsed.page_count > 1:
+        result = classify_text(parsed.full_text)
+    return result
+
+
+def classify_first_page(parsed, file_name="") -> PdfClassification:
+    """Sadece ilk sayfa metni ile sınıflandır; okuma hatası UNKNOWN döner"""
+    try:
+        if parsed is not None and parsed.page_count > 0:
+            return classify_text(parsed.first_page_text)
+    except Exception as e:
+        logger.warning(f"PDF sınıflandırma hatası: {file_name} - {str(e)}")
+    return PdfClassification(PDF_KIND_UNKNOWN, "content")
+
+
+def classify_pdf(pdf_attachment, pdf_cache=None) -> PdfClassification:
+    """PDF türünü belirle - dosya adı kesinse PDF hiç açılmaz, değilse sadece ilk sayfa okunur"""
+    file_name = pdf_attachment.get("file_name") or ""
+
+    result = classify_filename(file_name)
+    if result is None:
+        try:
+            parsed = (pdf_cache or PDFCache()).get(pdf_attachment)
+        except Exception as e:
+            logger.warning(f"PDF sınıflandırma hatası: {file_name} - {str(e)}")
+            parsed = None
+        result = classify_first_page(parsed, file_name)
+
+    logger.debug(f"PDF sınıflandırıldı: {file_name} → {result.kind} ({result.source})")
+    return result
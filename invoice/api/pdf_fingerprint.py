@@ -0,0 +1,86 @@
+"""
+PDF içerik parmak izi (SHA-256)
+Lieferando/Wolt hatırlatma ve forward email'lerinde aynı PDF'i tekrar gönderir. Her ekin SHA-256'sı
+dosya parçalar halinde okunarak hesaplanır (PDF parse edilmez) ve Invoice PDF Fingerprint
+tablosunda oluşan faturaya eşlenir; bilinen hash'ler process_invoice_email'de hiç açılmadan atlanır.
+"""
+
+import hashlib
+
+import frappe
+
+from invoice.api.constants import DOCTYPE_INVOICE_PDF_FINGERPRINT, PDF_FINGERPRINT_CHUNK_SIZE
+
+logger = frappe.logger("invoice.pdf_fingerprint", allow_site=frappe.local.site)
+
+
+def get_attachment_path(pdf_attachment):
+    """file_url'den diskteki yol (File dokümanı yüklenmeden); harici URL'ler için None"""
+    file_url = pdf_attachment.get("file_url") or ""
+    if file_url.startswith("/private/files/"):
+        return frappe.get_site_path("private", "files", file_url[len("/private/files/"):])
+    if file_url.startswith("/files/"):
+        return frappe.get_site_path("public", "files", file_url[len("/files/"):])
+    return None
+
+
+def compute_fingerprint(path, chunk_size=PDF_FINGERPRINT_CHUNK_SIZE):
+    """Dosyanın SHA-256'sı - tamamı belleğe alınmadan parça parça okunur"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_attachments(pdf_attachments):
+    """File adı → SHA-256 (okunamayan dosyalar atlanır, normal akışta işlenir)"""
+    fingerprints = {}
+    for pdf in pdf_attachments:
+        path = get_attachment_path(pdf)
+        if not path:
+            continue
+        try:
+            fingerprints[pdf.name] = compute_fingerprint(path)
+        except OSError as e:
+            logger.warning(f"PDF parmak izi hesaplanamadı: {pdf.get('file_name')} - {str(e)}")
+    return fingerprints
+
+
+def get_known_fingerprints(hashes):
+    """Daha önce fatura üretmiş hash'ler → {sha256: kayıt} (tek sorgu)"""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    rows = frappe.get_all(
+        DOCTYPE_INVOICE_PDF_FINGERPRINT,
+        filters={"name": ["in", hashes]},
+        fields=["name", "invoice_doctype", "invoice_name"],
+    )
+    return {row.name: row for row in rows}
+
+
+def record_fingerprint(sha256, pdf_attachment, communication_name, invoice):
+    """Hash → fatura eşlemesini kaydet (zaten varsa dokunma)"""
+    if not sha256 or frappe.db.exists(DOCTYPE_INVOICE_PDF_FINGERPRINT, sha256):
+        return
+    try:
+        frappe.get_doc({
+            "doctype": DOCTYPE_INVOICE_PDF_FINGERPRINT,
+            "sha256": sha256,
+            "file_name": pdf_attachment.get("file_name"),
+            "file_size": pdf_attachment.get("file_size"),
+            "communication": communication_name,
+            "invoice_doctype": invoice.doctype,
+            "invoice_name": invoice.name,
+        }).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        pass
+
+
+def clear_invoice_fingerprints(doc, method=None):
+    """Fatura silinince parmak izlerini de sil - aynı PDF tekrar gelirse yeniden işlenir"""
+    frappe.db.delete(
+        DOCTYPE_INVOICE_PDF_FINGERPRINT,
+        {"invoice_doctype": doc.doctype, "invoice_name": doc.name},
+    )
@@ -0,0 +1,126 @@
+"""
+Sayfa bazlı PDF metin modeli
+Sayfa sınırları korunur; tablo başlık konumları ilk ihtiyaçta tek geçişte bulunur, tablo satırları
+sayfa sayfa okunur. full_text geriye uyumluluk için sayfaların ayraçsız birleşimidir (regex'ler bu
+metne göre yazıldı).
+"""
+
+from bisect import bisect_left
+
+SOURCE_TEXT = "text"
+SOURCE_CLEAN = "clean"  # "|" karakterleri boşluğa çevrilmiş metin (Wolt tabloları)
+
+SCOPE_DOCUMENT = "document"
+SCOPE_FIRST_PAGE = "first_page"
+
+# Tablo başlıkları (Lieferando): Einzelauflistung ve Trinkgelder tabloları "Datum # €" ile başlar
+TABLE_HEADER = "Datum # €"
+TIPS_TITLE = "Trinkgelder erhalten von"
+
+
+def _is_order_header(stripped):
+    return stripped == TABLE_HEADER or (
+        "Datum" in stripped and "#" in stripped and "€" in stripped and len(stripped) <= 15
+    )
+
+
+class PdfText:
+    """Sayfa listesi + lazy başlık konumları + sayfa sayfa satır okuma"""
+
+    def __init__(self, pages):
+        self.pages = tuple(page or "" for page in pages)
+        self._full_text = None
+        self._lines = None
+        self._headers = None
+        self._variants = {}
+
+    @classmethod
+    def from_text(cls, full_text):
+        return cls([full_text or ""])
+
+    @property
+    def full_text(self) -> str:
+        if self._full_text is None:
+            self._full_text = "".join(self.pages)
+        return self._full_text
+
+    @property
+    def text(self) -> str:
+        return self.full_text
+
+    @property
+    def clean(self) -> str:
+        return self.get(SOURCE_CLEAN)
+
+    def get(self, source=SOURCE_TEXT, scope=SCOPE_DOCUMENT, lower=False) -> str:
+        """Metin varyantı (kaynak/kapsam/küçük harf) - her biri en fazla bir kez üretilir"""
+        key = (source, scope, lower)
+        text = self._variants.get(key)
+        if text is None:
+            if lower:
+                text = self.get(source, scope).lower()
+            elif source == SOURCE_CLEAN:
+                text = self.get(SOURCE_TEXT, scope).replace("|", " ")
+            elif scope == SCOPE_FIRST_PAGE:
+                text = self.pages[0] if self.pages else ""
+            else:
+                text = self.full_text
+            self._variants[key] = text
+        return text
+
+    @property
+    def lines(self) -> list:
+        """Tüm sayfaların satırları; sayfa sınırı her zaman satır sonudur"""
+        if self._lines is None:
+            self._lines = [line for page in self.pages for line in page.splitlines()]
+        return self._lines
+
+    def iter_lines_after(self, position):
+        """(sayfa, satır) konumundan sonraki satırlar - sayfa sayfa, tüm doküman listesi kurulmadan"""
+        page_index, line_index = position
+        for index in range(page_index, len(self.pages)):
+            lines = self.pages[index].splitlines()
+            yield from (lines[line_index + 1:] if index == page_index else lines)
+
+    def _index_headers(self):
+        """Başlık konumlarını (sayfa, satır) olarak tek geçişte bul"""
+        headers = {"order_header": None, "tips_title": None, "tips_title_loose": None, "table_headers": []}
+        for page_index, page in enumerate(self.pages):
+            for line_index, line in enumerate(page.splitlines()):
+                stripped = line.strip()
+                position = (page_index, line_index)
+                if stripped == TABLE_HEADER:
+                    headers["table_headers"].append(position)
+                if headers["order_header"] is None and _is_order_header(stripped):
+                    headers["order_header"] = position
+                if "Trinkgelder" in line:
+                    if headers["tips_title"] is None and TIPS_TITLE in line:
+                        headers["tips_title"] = position
+                    if headers["tips_title_loose"] is None and "erhalten von" in line:
+                        headers["tips_title_loose"] = position
+        self._headers = headers
+
+    @property
+    def order_header(self):
+        """Einzelauflistung tablo başlığının (sayfa, satır) konumu (yoksa None)"""
+        if self._headers is None:
+            self._index_headers()
+        return self._headers["order_header"]
+
+    @property
+    def tips_header(self):
+        """Trinkgelder başlığından sonraki ilk "Datum # €" satırının konumu (yoksa None)"""
+        if self._headers is None:
+            self._index_headers()
+        tips_start = self._headers["tips_title"]
+        if tips_start is None:
+            tips_start = self._headers["tips_title_loose"]
+        if tips_start is None:
+            return None
+        table_headers = self._headers["table_headers"]
+        position = bisect_left(table_headers, tips_start)
+        return table_headers[position] if position < len(table_headers) else None
+
+
+def as_pdf_text(value) -> PdfText:
+    return value if isinstance(value, PdfText) else PdfText.from_text(value)
@@ -0,0 +1,125 @@
+"""
+Ham PDF metni yan deposu
+raw_text / netting_raw_text fatura satırında değil, Invoice Raw Text tablosunda sıkıştırılmış
+(zstandard kuruluysa zstd, değilse zlib) ve base64 olarak tutulur. Metin sadece istendiğinde
+(AI doğrulama, yeniden parse) okunur; frappe.get_doc(fatura) artık bu metni taşımaz.
+"""
+
+import base64
+import zlib
+
+import frappe
+
+from invoice.api.constants import (
+    DOCTYPE_INVOICE_RAW_TEXT,
+    RAW_TEXT_CODEC_ZLIB,
+    RAW_TEXT_CODEC_ZSTD,
+    RAW_TEXT_COMPRESSION_LEVEL,
+    RAW_TEXT_KIND_PDF,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = frappe.logger("invoice.raw_text_store", allow_site=frappe.local.site)
+
+
+def compress_text(text):
+    """Metin → (codec, base64 payload, sıkıştırılmış byte sayısı)"""
+    raw = (text or "").encode("utf-8")
+    if zstandard is not None:
+        codec = RAW_TEXT_CODEC_ZSTD
+        packed = zstandard.ZstdCompressor(level=RAW_TEXT_COMPRESSION_LEVEL).compress(raw)
+    else:
+        codec = RAW_TEXT_CODEC_ZLIB
+        packed = zlib.compress(raw, RAW_TEXT_COMPRESSION_LEVEL)
+    return codec, base64.b64encode(packed).decode("ascii"), len(packed)
+
+
+def decompress_text(codec, payload):
+    packed = base64.b64decode(payload or "")
+    if codec == RAW_TEXT_CODEC_ZSTD:
+        if zstandard is None:
+            frappe.throw("zstandard modülü yüklü değil, ham metin açılamıyor")
+        raw = zstandard.ZstdDecompressor().decompress(packed)
+    else:
+        raw = zlib.decompress(packed)
+    return raw.decode("utf-8")
+
+
+def _filters(doctype, name, kind):
+    return {"reference_doctype": doctype, "reference_name": name, "kind": kind}
+
+
+def build_row(doctype, name, text, kind=RAW_TEXT_KIND_PDF):
+    """Invoice Raw Text alanları (toplu insert ve tekil kayıt için ortak)"""
+    codec, payload, compressed_size = compress_text(text)
+    return {
+        **_filters(doctype, name, kind),
+        "codec": codec,
+        "original_size": len((text or "").encode("utf-8")),
+        "compressed_size": compressed_size,
+        "data": payload,
+    }
+
+
+def save_raw_text(doctype, name, text, kind=RAW_TEXT_KIND_PDF):
+    """Faturanın ham metnini kaydet (varsa üzerine yaz); boş metin kaydedilmez"""
+    if not text:
+        return
+    row = build_row(doctype, name, text, kind)
+    existing = frappe.db.get_value(DOCTYPE_INVOICE_RAW_TEXT, _filters(doctype, name, kind), "name")
+    if existing:
+        frappe.db.set_value(DOCTYPE_INVOICE_RAW_TEXT, existing, row)
+        return
+    frappe.get_doc({"doctype": DOCTYPE_INVOICE_RAW_TEXT, **row}).insert(ignore_permissions=True)
+
+
+def get_raw_text(doctype, name, kind=RAW_TEXT_KIND_PDF):
+    """Ham metni oku - yan depoda yoksa (taşınmamış eski kayıt) fatura satırındaki alana düş"""
+    row = frappe.db.get_value(
+        DOCTYPE_INVOICE_RAW_TEXT, _filters(doctype, name, kind), ["codec", "data"], as_dict=True
+    )
+    if row:
+        return decompress_text(row.codec, row.data)
+    return frappe.db.get_value(doctype, name, kind) or ""
+
+
+def get_raw_texts(doctype, names, kind=RAW_TEXT_KIND_PDF):
+    """Birden fazla fatura için ham metinler {name: metin} - iki toplu sorgu (yan depo + eski alan)"""
+    names = list(names)
+    if not names:
+        return {}
+    texts = {
+        row.reference_name: decompress_text(row.codec, row.data)
+        for row in frappe.get_all(
+            DOCTYPE_INVOICE_RAW_TEXT,
+            filters={"reference_doctype": doctype, "kind": kind, "reference_name": ["in", names]},
+            fields=["reference_name", "codec", "data"],
+        )
+    }
+    missing = [name for name in names if name not in texts]
+    if missing:
+        for row in frappe.get_all(doctype, filters={"name": ["in", missing]}, fields=["name", kind]):
+            if row.get(kind):
+                texts[row.name] = row.get(kind)
+    return texts
+
+
+def move_raw_text(from_doctype, from_name, to_doctype, to_name, kind=RAW_TEXT_KIND_PDF):
+    """Ham metni başka bir kayda taşı (açıp tekrar sıkıştırmadan) - taşındıysa True"""
+    existing = frappe.db.get_value(DOCTYPE_INVOICE_RAW_TEXT, _filters(from_doctype, from_name, kind), "name")
+    if not existing:
+        return False
+    frappe.db.delete(DOCTYPE_INVOICE_RAW_TEXT, _filters(to_doctype, to_name, kind))
+    frappe.db.set_value(
+        DOCTYPE_INVOICE_RAW_TEXT, existing, {"reference_doctype": to_doctype, "reference_name": to_name}
+    )
+    return True
+
+
+def delete_raw_texts(doc, method=None):
+    """Fatura silinince ham metinleri de sil (on_trash)"""
+    frappe.db.delete(DOCTYPE_INVOICE_RAW_TEXT, {"reference_doctype": doc.doctype, "reference_name": doc.name})
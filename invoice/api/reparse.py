@@ -0,0 +1,385 @@
+"""
+Ham metin üzerinden toplu yeniden parse
+Regex düzeltmelerinden sonra eski faturaları PDF açmadan günceller: kayıtlı raw_text güncel
+extractor'lardan geçirilir (process pool), sonuç mevcut değerlerle alan alan karşılaştırılır ve
+sadece değişen satırlar yazılır.
+
+- Varsayılan dry-run: sadece fark raporu üretilir (apply=1 ile yazılır)
+- İş chunk'lar halinde ilerler; her chunk sonunda checkpoint yazılır, run_id ile kaldığı yerden devam eder
+- Rapor: sites/<site>/private/invoice_reparse/<run_id>/diff.jsonl (fatura başına bir satır)
+- Çıkarılamayan değerler mevcut değerin üzerine yazılmaz, raporda "missing" olarak listelenir. Builder'ın
+  `or 0` ile doldurduğu alanlarda 0 da "bulunamadı" sayılır; apply_zeros=1 ile bu alanlara 0 yazılır
+- Submit / cancel edilmiş faturalar yazılmaz, raporda "skipped" ile listelenir; yazılan faturalara
+  değişen alanları listeleyen bir yorum eklenir (set_value hook / versiyon oluşturmaz)
+
+bench --site <site> reparse-invoices --doctype "Wolt Invoice" [--apply [--apply-zeros]] [--resume <run_id>]
+"""
+
+import json
+import os
+
+import frappe
+from frappe.utils import cint, cstr, flt, get_datetime, getdate
+
+from invoice.api.child_rows import bulk_insert_child_rows
+from invoice.api.constants import (
+    DOCTYPE_LIEFERANDO_INVOICE,
+    DOCTYPE_LIEFERANDO_INVOICE_ORDER_ITEM,
+    DOCTYPE_LIEFERANDO_INVOICE_TIP_ITEM,
+    DOCTYPE_UBER_EATS_INVOICE,
+    DOCTYPE_WOLT_INVOICE,
+    PLATFORM_INVOICE_DOCTYPES,
+    REPARSE_CHUNK_SIZE_DEFAULT,
+)
+from invoice.api.extraction_pool import get_extraction_workers, run_extraction_pool
+from invoice.api.extraction_worker import extract_text_job
+from invoice.api.invoice_email_handler import (
+    get_lieferando_invoice_values,
+    get_uber_eats_invoice_values,
+    get_wolt_invoice_values,
+)
+from invoice.api.invoice_ledger import upsert_ledger_entry
+from invoice.api.raw_text_store import get_raw_texts
+
+logger = frappe.logger("invoice.reparse", allow_site=frappe.local.site)
+
+VALUE_BUILDERS = {
+    DOCTYPE_LIEFERANDO_INVOICE: get_lieferando_invoice_values,
+    DOCTYPE_WOLT_INVOICE: get_wolt_invoice_values,
+    DOCTYPE_UBER_EATS_INVOICE: get_uber_eats_invoice_values,
+}
+DOCTYPE_PLATFORMS = {doctype: platform for platform, doctype in PLATFORM_INVOICE_DOCTYPES.items()}
+
+# Lieferando child table'ları: parentfield → (DocType, alanlar)
+CHILD_TABLES = {
+    DOCTYPE_LIEFERANDO_INVOICE: {
+        "order_items": (DOCTYPE_LIEFERANDO_INVOICE_ORDER_ITEM, ("order_date", "order_id", "amount", "is_online")),
+        "tip_items": (DOCTYPE_LIEFERANDO_INVOICE_TIP_ITEM, ("tip_date", "tip_id", "amount")),
+    },
+}
+
+NUMERIC_FIELDTYPES = ("Currency", "Float", "Percent")
+INT_FIELDTYPES = ("Int", "Check")
+
+
+# ============================================================================
+# Extraction sonucu (worker: extraction_worker.extract_text_job)
+# ============================================================================
+
+
+def _build_result(doctype, name, data, error):
+    """Worker'ın extraction sonucu → (name, alan değerleri, child satırları, hata)"""
+    if error:
+        return name, None, None, error
+    try:
+        children = {
+            parentfield: [tuple(row) for row in data.get(parentfield) or ()]
+            for parentfield in CHILD_TABLES.get(doctype, {})
+        }
+        return name, VALUE_BUILDERS[doctype](data), children, None
+    except Exception as e:
+        return name, None, None, f"{type(e).__name__}: {str(e)}"
+
+
+# ============================================================================
+# Karşılaştırma
+# ============================================================================
+
+
+def _normalize(value, fieldtype):
+    if value in (None, ""):
+        return None
+    if fieldtype in NUMERIC_FIELDTYPES:
+        return flt(value, 6)
+    if fieldtype in INT_FIELDTYPES:
+        return cint(value)
+    if fieldtype == "Date":
+        return str(getdate(value))
+    if fieldtype == "Datetime":
+        return str(get_datetime(value))
+    return cstr(value).strip()
+
+
+class _ZeroExtraction(dict):
+    """Her alan için aynı 0 nesnesini döndüren extraction sonucu"""
+
+    def __init__(self, zero):
+        super().__init__()
+        self.zero = zero
+
+    def get(self, key, default=None):
+        return self.zero
+
+
+def get_zero_default_fields(doctype):
+    """
+    Builder'ın `or 0` ile doldurduğu alanlar: çıkarılan 0 ile bulunamayan değer ayırt edilemez.
+    Çıkarılan 0'ı aynen geçiren alanlar (ör. `is not None` kontrolü) bu kümede yer almaz.
+    """
+    zero = type("ExtractedZero", (float,), {})()
+    values = VALUE_BUILDERS[doctype](_ZeroExtraction(zero))
+    return {field for field, value in values.items() if value is not zero and value == 0}
+
+
+def _is_missing(fieldname, value, zero_default_fields):
+    return value is None or (value == 0 and fieldname in zero_default_fields)
+
+
+def diff_values(meta, current, new_values, zero_default_fields=()):
+    """
+    Alan alan fark: (değişenler {alan: [eski, yeni]}, çıkarılamayanlar [alan]).
+    zero_default_fields: 0'ın "çıkarılamadı" sayılacağı alanlar (bkz. get_zero_default_fields)
+    """
+    changes = {}
+    missing = []
+    for fieldname, new_value in new_values.items():
+        df = meta.get_field(fieldname)
+        if df is None:
+            continue
+        old = _normalize(current.get(fieldname), df.fieldtype)
+        new = _normalize(new_value, df.fieldtype)
+        if old == new:
+            continue
+        if _is_missing(fieldname, new, zero_default_fields):
+            # Extractor değeri bulamadı: mevcut değeri silme
+            missing.append(fieldname)
+            continue
+        changes[fieldname] = [current.get(fieldname), new_value]
+    return changes, missing
+
+
+def _normalize_rows(rows, fields, child_meta):
+    return [
+        tuple(_normalize(value, child_meta.get_field(field).fieldtype) for field, value in zip(fields, row, strict=True))
+        for row in rows
+    ]
+
+
+def _load_current(doctype, names):
+    fields = ["name", "docstatus", *VALUE_BUILDERS[doctype]({}).keys()]
+    meta = frappe.get_meta(doctype)
+    fields = [f for f in fields if f in ("name", "docstatus") or meta.get_field(f)]
+    current = {row.name: row for row in frappe.get_all(doctype, filters={"name": ["in", names]}, fields=fields)}
+
+    children = {}
+    for parentfield, (child_doctype, child_fields) in CHILD_TABLES.get(doctype, {}).items():
+        for row in frappe.get_all(
+            child_doctype,
+            filters={"parenttype": doctype, "parentfield": parentfield, "parent": ["in", names]},
+            fields=["parent", *child_fields],
+            order_by="parent asc, idx asc",
+        ):
+            children.setdefault((row.parent, parentfield), []).append(tuple(row.get(f) for f in child_fields))
+    return current, children
+
+
+# ============================================================================
+# Çalıştırma / checkpoint
+# ============================================================================
+
+
+def _run_dir(run_id):
+    path = frappe.get_site_path("private", "invoice_reparse", run_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _load_checkpoint(run_id):
+    path = os.path.join(_run_dir(run_id), "checkpoint.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_checkpoint(run_id, checkpoint):
+    path = os.path.join(_run_dir(run_id), "checkpoint.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=1, default=str)
+    os.replace(path + ".tmp", path)
+
+
+def _append_report(run_id, entries):
+    if not entries:
+        return
+    with open(os.path.join(_run_dir(run_id), "diff.jsonl"), "a") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, default=str, ensure_ascii=False) + "\n")
+
+
+def _apply_changes(run_id, doctype, name, changes, child_changes):
+    if changes:
+        frappe.db.set_value(doctype, name, {field: values[1] for field, values in changes.items()})
+    for parentfield, rows in child_changes.items():
+        child_doctype, child_fields = CHILD_TABLES[doctype][parentfield]
+        frappe.db.delete(child_doctype, {"parenttype": doctype, "parentfield": parentfield, "parent": name})
+        bulk_insert_child_rows(
+            frappe._dict(name=name, doctype=doctype),
+            parentfield,
+            child_doctype,
+            [dict(zip(child_fields, row, strict=True)) for row in rows],
+        )
+    invoice = frappe.get_doc(doctype, name)
+    # set_value Version kaydı oluşturmaz: değişiklik fatura zaman çizelgesinde görünsün
+    invoice.add_comment("Info", f"Reparse {run_id}: {', '.join([*changes, *child_changes])}")
+    if doctype == DOCTYPE_LIEFERANDO_INVOICE:
+        # Analysis JSON senkronu (LieferandoInvoice.on_update); on_update hook'ları defteri de günceller
+        invoice.run_method("on_update")
+    else:
+        upsert_ledger_entry(invoice)
+
+
+def _process_chunk(run_id, doctype, names, checkpoint, apply, workers):
+    zero_default_fields = () if checkpoint.get("apply_zeros") else get_zero_default_fields(doctype)
+    texts = get_raw_texts(doctype, names)
+    platform = DOCTYPE_PLATFORMS[doctype]
+    jobs = [(name, texts[name], platform) for name in names if texts.get(name)]
+    checkpoint["no_raw_text"] += len(names) - len(jobs)
+
+    workers = workers or get_extraction_workers(len(jobs))
+    extracted = None
+    if workers > 1 and len(jobs) > 1:
+        today = frappe.utils.today()
+        try:
+            extracted = run_extraction_pool(extract_text_job, [(today, *job) for job in jobs], min(workers, len(jobs)))
+        except Exception as e:
+            logger.warning(f"Process pool extraction başarısız, seri moda geçiliyor: {str(e)}")
+    if extracted is None:
+        extracted = [extract_text_job(None, *job) for job in jobs]
+    results = [_build_result(doctype, *result) for result in extracted]
+
+    meta = frappe.get_meta(doctype)
+    current, current_children = _load_current(doctype, [name for name, *_rest in results])
+    report = []
+    for name, new_values, new_children, error in results:
+        if error or name not in current:
+            checkpoint["errors"] += 1
+            report.append({"doctype": doctype, "name": name, "error": error or "not found"})
+            continue
+
+        changes, missing = diff_values(meta, current[name], new_values, zero_default_fields)
+        child_changes = {}
+        for parentfield, rows in (new_children or {}).items():
+            child_doctype, child_fields = CHILD_TABLES[doctype][parentfield]
+            child_meta = frappe.get_meta(child_doctype)
+            old_rows = current_children.get((name, parentfield), [])
+            if rows and _normalize_rows(rows, child_fields, child_meta) != _normalize_rows(old_rows, child_fields, child_meta):
+                child_changes[parentfield] = rows
+
+        if not changes and not child_changes and not missing:
+            continue
+
+        for field in changes:
+            key = f"{doctype}.{field}"
+            checkpoint["field_changes"][key] = checkpoint["field_changes"].get(key, 0) + 1
+        entry = {"doctype": doctype, "name": name, "changes": changes, "missing": missing}
+        if child_changes:
+            entry["children"] = {
+                field: {"old": len(current_children.get((name, field), [])), "new": len(rows)}
+                for field, rows in child_changes.items()
+            }
+        report.append(entry)
+
+        if not changes and not child_changes:
+            continue
+        if current[name].docstatus != 0:
+            # Submit / cancel edilmiş fatura yeniden parse ile değiştirilmez
+            entry["skipped"] = "submitted" if current[name].docstatus == 1 else "cancelled"
+            checkpoint["skipped_submitted"] = checkpoint.get("skipped_submitted", 0) + 1
+            continue
+        checkpoint["changed"] += 1
+        if apply:
+            _apply_changes(run_id, doctype, name, changes, child_changes)
+
+    _append_report(run_id, report)
+    checkpoint["processed"] += len(names)
+    checkpoint["last_name"] = names[-1]
+    if apply:
+        frappe.db.commit()
+    _save_checkpoint(run_id, checkpoint)
+
+
+def run_reparse(doctypes=None, filters=None, apply=False, chunk_size=None, workers=None, run_id=None, apply_zeros=False):
+    """Yeniden parse çalıştır (run_id verilirse checkpoint'ten devam eder) → checkpoint özeti"""
+    checkpoint = _load_checkpoint(run_id) if run_id else None
+    if checkpoint is None:
+        if isinstance(doctypes, str):
+            doctypes = [doctypes]
+        doctypes = [d for d in (doctypes or VALUE_BUILDERS) if d in VALUE_BUILDERS]
+        run_id = run_id or f"{frappe.utils.now_datetime().strftime('%Y%m%d-%H%M%S')}-{frappe.generate_hash(length=4)}"
+        checkpoint = {
+            "run_id": run_id,
+            "doctypes": doctypes,
+            "filters": filters or {},
+            "apply": bool(cint(apply)),
+            "apply_zeros": bool(cint(apply_zeros)),
+            "chunk_size": cint(chunk_size) or REPARSE_CHUNK_SIZE_DEFAULT,
+            "doctype_index": 0,
+            "last_name": None,
+            "processed": 0,
+            "changed": 0,
+            "skipped_submitted": 0,
+            "errors": 0,
+            "no_raw_text": 0,
+            "field_changes": {},
+            "done": False,
+        }
+        _save_checkpoint(run_id, checkpoint)
+
+    logger.info(f"Reparse başladı: {run_id} ({'apply' if checkpoint['apply'] else 'dry-run'})")
+    while checkpoint["doctype_index"] < len(checkpoint["doctypes"]):
+        doctype = checkpoint["doctypes"][checkpoint["doctype_index"]]
+        filters = dict(checkpoint["filters"])
+        if checkpoint["last_name"]:
+            filters["name"] = [">", checkpoint["last_name"]]
+        names = frappe.get_all(
+            doctype, filters=filters, pluck="name", order_by="name asc", limit=checkpoint["chunk_size"]
+        )
+        if not names:
+            checkpoint["doctype_index"] += 1
+            checkpoint["last_name"] = None
+            _save_checkpoint(run_id, checkpoint)
+            continue
+        _process_chunk(run_id, doctype, names, checkpoint, checkpoint["apply"], cint(workers))
+
+    checkpoint["done"] = True
+    _save_checkpoint(run_id, checkpoint)
+    logger.info(
+        f"Reparse tamamlandı: {run_id} - {checkpoint['processed']} fatura, {checkpoint['changed']} değişen, "
+        f"{checkpoint['errors']} hata"
+    )
+    return checkpoint
+
+
+@frappe.whitelist()
+def start_reparse(doctypes=None, filters=None, apply=0, chunk_size=None, workers=None, run_id=None, apply_zeros=0):
+    """Yeniden parse job'unu arka planda başlat (run_id ile devam ettirilir) → run_id"""
+    frappe.only_for("System Manager")
+    if isinstance(doctypes, str) and doctypes.startswith("["):
+        doctypes = json.loads(doctypes)
+    if isinstance(filters, str):
+        filters = json.loads(filters or "{}")
+
+    run_id = run_id or f"{frappe.utils.now_datetime().strftime('%Y%m%d-%H%M%S')}-{frappe.generate_hash(length=4)}"
+    frappe.enqueue(
+        "invoice.api.reparse.run_reparse",
+        queue="long",
+        timeout=6 * 3600,
+        job_id=f"invoice-reparse::{run_id}",
+        deduplicate=True,
+        doctypes=doctypes,
+        filters=filters,
+        apply=cint(apply),
+        chunk_size=chunk_size,
+        workers=workers,
+        run_id=run_id,
+        apply_zeros=cint(apply_zeros),
+    )
+    return run_id
+
+
+@frappe.whitelist()
+def get_reparse_status(run_id):
+    """Checkpoint özeti (ilerleme, alan bazlı değişiklik sayıları)"""
+    frappe.only_for("System Manager")
+    return _load_checkpoint(run_id)
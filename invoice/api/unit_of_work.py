@@ -0,0 +1,97 @@
+"""
+Unit of work: bir email = tek commit
+process_invoice_email çalışırken yardımcı fonksiyonlardaki commit() çağrıları ertelenir; her PDF
+kendi savepoint'inde işlenir, hatalı PDF sadece kendi değişikliklerini geri alır. Email sonunda
+tek commit yapılır, commit sayısı ve süreleri loglanır.
+"""
+
+import time
+from contextlib import contextmanager
+
+import frappe
+
+logger = frappe.logger("invoice.unit_of_work", allow_site=frappe.local.site)
+
+
+def get_active_unit_of_work():
+    return frappe.flags.invoice_unit_of_work
+
+
+def commit():
+    """Aktif unit of work varsa commit'i ertele, yoksa hemen commit et"""
+    unit_of_work = get_active_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.deferred_commits += 1
+        return
+    frappe.db.commit()
+
+
+class UnitOfWork:
+    """with UnitOfWork(label) as uow: ... uow.commit()"""
+
+    def __init__(self, label):
+        self.label = label
+        self.commit_count = 0
+        self.commit_seconds = 0.0
+        self.deferred_commits = 0
+        self.savepoints = 0
+        self.savepoint_rollbacks = 0
+        self._rollback_callbacks = None
+        self._started = None
+        self._previous = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._previous = get_active_unit_of_work()
+        frappe.flags.invoice_unit_of_work = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        frappe.flags.invoice_unit_of_work = self._previous
+        self.report()
+        return False
+
+    @contextmanager
+    def savepoint(self):
+        """Blok hata verirse sadece bloğun değişikliklerini geri al (exception yeniden fırlatılır)"""
+        name = f"invoice_{frappe.generate_hash(length=8)}"
+        frappe.db.savepoint(name)
+        self.savepoints += 1
+        outer_callbacks, self._rollback_callbacks = self._rollback_callbacks, []
+        try:
+            yield
+        except BaseException:
+            try:
+                frappe.db.rollback(save_point=name)
+            except Exception as e:
+                # Deadlock vb. durumlarda tüm transaction zaten geri alınmıştır
+                logger.warning(f"Savepoint geri alınamadı ({self.label}): {str(e)}")
+            self.savepoint_rollbacks += 1
+            for callback in self._rollback_callbacks:
+                callback()
+            raise
+        else:
+            frappe.db.release_savepoint(name)
+            if outer_callbacks is not None:
+                outer_callbacks.extend(self._rollback_callbacks)
+        finally:
+            self._rollback_callbacks = outer_callbacks
+
+    def on_savepoint_rollback(self, callback):
+        """Aktif savepoint geri alınırsa çağrılır (commit sonrası callback'leri iptal etmek için)"""
+        if self._rollback_callbacks is not None:
+            self._rollback_callbacks.append(callback)
+
+    def commit(self):
+        started = time.perf_counter()
+        frappe.db.commit()
+        self.commit_count += 1
+        self.commit_seconds += time.perf_counter() - started
+
+    def report(self):
+        total_ms = (time.perf_counter() - self._started) * 1000 if self._started else 0
+        logger.info(
+            f"{self.label}: {self.commit_count} commit ({self.commit_seconds * 1000:.1f} ms), "
+            f"{self.deferred_commits} ertelenen commit, {self.savepoints} savepoint "
+            f"({self.savepoint_rollbacks} geri alındı), toplam {total_ms:.1f} ms"
+        )
@@ -0,0 +1,116 @@
+"""
+Wolt netting raporları
+Netting raporu, ait olduğu Wolt Invoice'tan önce gelirse parse sonucu Wolt Pending Netting
+tablosunda (name = normalize edilmiş Rechnungsnummer) bekletilir. Wolt Invoice oluşturulduğunda
+(after_insert) bekleyen kayıt primary key ile bulunur ve PDF tekrar açılmadan faturaya eklenir.
+"""
+
+import json
+import re
+
+import frappe
+
+from invoice.api.constants import (
+    DOCTYPE_WOLT_INVOICE,
+    DOCTYPE_WOLT_PENDING_NETTING,
+    FIELD_NETTING_REPORT_PDF,
+    INGESTION_OUTCOME_NETTING_ATTACHED,
+    RAW_TEXT_KIND_NETTING,
+)
+from invoice.api.ingestion_ledger import record_outcome
+from invoice.api.raw_text_store import move_raw_text, save_raw_text
+
+logger = frappe.logger("invoice.wolt_netting", allow_site=frappe.local.site)
+
+# Netting parse sonucu → Wolt Invoice alanı (görünür özet)
+NETTING_FIELD_MAP = {
+    "merchant_invoice_number": "netting_merchant_invoice",
+    "merchant_net": "netting_merchant_net",
+    "merchant_vat": "netting_merchant_vat",
+    "merchant_gross": "netting_merchant_gross",
+    "wolt_invoice_number": "netting_wolt_invoice",
+    "wolt_net": "netting_wolt_net",
+    "wolt_vat": "netting_wolt_vat",
+    "wolt_gross": "netting_wolt_gross",
+    "net_payout": "netting_net_payout",
+}
+
+
+def normalize_invoice_number(invoice_number):
+    """Eşleştirme anahtarı: boşluksuz, büyük harf"""
+    return re.sub(r"\s+", "", invoice_number or "").upper()
+
+
+def get_netting_update_values(parsed_fields):
+    """Netting parse sonucundan Wolt Invoice'a yazılacak alanlar"""
+    if not parsed_fields:
+        return {}
+    update_values = {"netting_parsed_json": json.dumps(parsed_fields, ensure_ascii=True)}
+    for src, target in NETTING_FIELD_MAP.items():
+        if parsed_fields.get(src) is not None:
+            update_values[target] = parsed_fields[src]
+    return update_values
+
+
+def find_wolt_invoice(invoice_number):
+    """Rechnungsnummer'a ait Wolt Invoice adı (kilitleyen okuma: başka worker'ın son commit'ini görür)"""
+    return frappe.db.get_value(DOCTYPE_WOLT_INVOICE, {"invoice_number": invoice_number}, "name", for_update=True)
+
+
+def apply_netting(invoice_name, pdf_attachment, parsed_fields):
+    """Netting PDF'ini ve parse edilmiş alanları Wolt Invoice'a yaz - yazılan alanları döndürür"""
+    from invoice.api.invoice_email_handler import attach_pdf_to_invoice
+
+    attach_pdf_to_invoice(pdf_attachment, invoice_name, DOCTYPE_WOLT_INVOICE, FIELD_NETTING_REPORT_PDF)
+    update_values = get_netting_update_values(parsed_fields)
+    if update_values:
+        frappe.db.set_value(DOCTYPE_WOLT_INVOICE, invoice_name, update_values)
+    return update_values
+
+
+def park_netting(communication_name, pdf_attachment, invoice_number, full_text, parsed_fields):
+    """Faturası henüz olmayan netting raporunu beklet (aynı fatura için yeni rapor eskisinin yerine geçer)"""
+    invoice_key = normalize_invoice_number(invoice_number)
+    values = {
+        "invoice_number": invoice_number,
+        "communication": communication_name,
+        "file": pdf_attachment.get("name"),
+        "file_name": pdf_attachment.get("file_name"),
+        "content_hash": pdf_attachment.get("content_hash"),
+        "parsed_json": json.dumps(parsed_fields or {}, ensure_ascii=True),
+    }
+    if frappe.db.exists(DOCTYPE_WOLT_PENDING_NETTING, invoice_key):
+        frappe.db.set_value(DOCTYPE_WOLT_PENDING_NETTING, invoice_key, values)
+    else:
+        frappe.get_doc({
+            "doctype": DOCTYPE_WOLT_PENDING_NETTING,
+            "invoice_key": invoice_key,
+            **values,
+        }).insert(ignore_permissions=True)
+    save_raw_text(DOCTYPE_WOLT_PENDING_NETTING, invoice_key, full_text, kind=RAW_TEXT_KIND_NETTING)
+    logger.info(f"Netting raporu bekletiliyor (Rechnungsnummer: {invoice_number}): {pdf_attachment.get('file_name')}")
+
+
+def attach_pending_netting(doc, method=None):
+    """Wolt Invoice after_insert: bu fatura için bekleyen netting raporu varsa ekle"""
+    invoice_key = normalize_invoice_number(doc.invoice_number)
+    if not invoice_key:
+        return
+    pending = frappe.db.get_value(
+        DOCTYPE_WOLT_PENDING_NETTING,
+        invoice_key,
+        ["name", "communication", "file", "file_name", "content_hash", "parsed_json"],
+        as_dict=True,
+        for_update=True,
+    )
+    if not pending:
+        return
+
+    pdf_attachment = frappe._dict(name=pending.file, file_name=pending.file_name, content_hash=pending.content_hash)
+    # Bellekteki doc da güncellenir: create_wolt_invoice_doc defter satırını bu doc'tan yazar
+    doc.update(apply_netting(doc.name, pdf_attachment, json.loads(pending.parsed_json or "{}")))
+    move_raw_text(DOCTYPE_WOLT_PENDING_NETTING, pending.name, DOCTYPE_WOLT_INVOICE, doc.name, RAW_TEXT_KIND_NETTING)
+    frappe.db.delete(DOCTYPE_WOLT_PENDING_NETTING, {"name": pending.name})
+    if pending.communication:
+        record_outcome(pending.communication, pdf_attachment, INGESTION_OUTCOME_NETTING_ATTACHED, invoice=doc)
+    logger.info(f"Bekleyen netting raporu eklendi: {doc.name} ({pending.file_name})")
@@ -0,0 +1,47 @@
+import json
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("reparse-invoices")
+@click.option("--doctype", "doctypes", multiple=True, help="Invoice DocType (repeatable, default: all platforms)")
+@click.option("--filters", default=None, help="JSON filters, e.g. '{\"invoice_date\": [\">=\", \"2025-01-01\"]}'")
+@click.option("--apply", is_flag=True, default=False, help="Write changed values (default: dry run, report only)")
+@click.option("--apply-zeros", is_flag=True, default=False, help="Also write extracted zeros to fields that default to 0")
+@click.option("--chunk-size", type=int, default=None, help="Invoices per chunk / checkpoint")
+@click.option("--workers", type=int, default=None, help="Extraction processes (default: invoice_extraction_workers)")
+@click.option("--resume", "run_id", default=None, help="Resume an interrupted run from its checkpoint")
+@pass_context
+def reparse_invoices(context, doctypes, filters, apply, apply_zeros, chunk_size, workers, run_id):
+	"""Re-run the current extractors over stored raw text and report (or apply) field changes."""
+	import frappe
+
+	from invoice.api.reparse import run_reparse
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		result = run_reparse(
+			doctypes=list(doctypes) or None,
+			filters=json.loads(filters) if filters else None,
+			apply=apply,
+			chunk_size=chunk_size,
+			workers=workers,
+			run_id=run_id,
+			apply_zeros=apply_zeros,
+		)
+		click.echo(
+			f"Run {result['run_id']}: {result['processed']} invoices, {result['changed']} changed, "
+			f"{result.get('skipped_submitted', 0)} submitted skipped, {result['errors']} errors, "
+			f"{result['no_raw_text']} without raw text"
+		)
+		for field, count in sorted(result["field_changes"].items()):
+			click.echo(f"  {field}: {count}")
+		click.echo(f"Report: {frappe.get_site_path('private', 'invoice_reparse', result['run_id'], 'diff.jsonl')}")
+	finally:
+		frappe.destroy()
+
+
+commands = [reparse_invoices]
@@ -245,10 +245,77 @@ app_license = "mit"
  # 	"Logging DocType Name": 30  # days to retain logs
  # }
 
+# Fatura email'leri arka planda işlenir: hook sadece ingestion job'unu kuyruğa alır
 doc_events = {
 	"Communication": {
-		"after_insert": "invoice.api.invoice_email_handler.process_invoice_email",
-		"on_update": "invoice.api.invoice_email_handler.process_invoice_email"
+		"after_insert": "invoice.api.ingestion.enqueue_invoice_email",
+		"on_update": "invoice.api.ingestion.enqueue_invoice_email"
+	},
+	"Lieferando Invoice": {
+		"after_insert": "invoice.api.invoice_index.on_invoice_insert",
+		"on_update": [
+			"invoice.api.invoice_index.on_invoice_update",
+			"invoice.api.invoice_ledger.on_invoice_update"
+		],
+		"on_submit": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_update_after_submit": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_cancel": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_trash": [
+			"invoice.api.invoice_index.on_invoice_change",
+			"invoice.api.pdf_fingerprint.clear_invoice_fingerprints",
+			"invoice.api.raw_text_store.delete_raw_texts",
+			"invoice.api.invoice_ledger.delete_ledger_entry"
+		],
+		"after_rename": [
+			"invoice.api.invoice_index.on_invoice_change",
+			"invoice.api.invoice_ledger.on_invoice_rename"
+		]
+	},
+	"Wolt Invoice": {
+		"after_insert": [
+			"invoice.api.invoice_index.on_invoice_insert",
+			"invoice.api.wolt_netting.attach_pending_netting"
+		],
+		"on_update": [
+			"invoice.api.invoice_index.on_invoice_update",
+			"invoice.api.invoice_ledger.on_invoice_update"
+		],
+		"on_submit": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_update_after_submit": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_cancel": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_trash": [
+			"invoice.api.invoice_index.on_invoice_change",
+			"invoice.api.pdf_fingerprint.clear_invoice_fingerprints",
+			"invoice.api.raw_text_store.delete_raw_texts",
+			"invoice.api.invoice_ledger.delete_ledger_entry"
+		],
+		"after_rename": [
+			"invoice.api.invoice_index.on_invoice_change",
+			"invoice.api.invoice_ledger.on_invoice_rename"
+		]
+	},
+	"Uber Eats Invoice": {
+		"after_insert": "invoice.api.invoice_index.on_invoice_insert",
+		"on_update": [
+			"invoice.api.invoice_index.on_invoice_update",
+			"invoice.api.invoice_ledger.on_invoice_update"
+		],
+		"on_submit": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_update_after_submit": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_cancel": "invoice.api.invoice_ledger.on_invoice_update",
+		"on_trash": [
+			"invoice.api.invoice_index.on_invoice_change",
+			"invoice.api.pdf_fingerprint.clear_invoice_fingerprints",
+			"invoice.api.raw_text_store.delete_raw_texts",
+			"invoice.api.invoice_ledger.delete_ledger_entry"
+		],
+		"after_rename": [
+			"invoice.api.invoice_index.on_invoice_change",
+			"invoice.api.invoice_ledger.on_invoice_rename"
+		]
+	},
+	"Wolt Pending Netting": {
+		"on_trash": "invoice.api.raw_text_store.delete_raw_texts"
 	}
 }
 
@@ -266,3 +333,14 @@ pdf_generator = ["invoice.chrome_pdf.chrome_pdf_generator"]
 # 		"invoice.api.email_tasks.sync_gmail_invoices"
 # 	]
 # }
+
+# Fatura işleme bildirimleri Redis'te biriktirilir, pencere dolunca tek yayın olarak gönderilir
+# Gecikmeli ingestion tekrarları (slot dolu / geçici hata) her dakika kuyruğa alınır
+scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"invoice.api.notification_aggregator.flush_notifications",
+			"invoice.api.ingestion.enqueue_due_retries"
+		]
+	}
+}
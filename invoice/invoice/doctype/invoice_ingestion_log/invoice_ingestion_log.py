@@ -0,0 +1,12 @@
+# Copyright (c) 2026, invoice and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+
+class InvoiceIngestionLog(Document):
+	"""One row per (Communication, PDF content hash) recording the ingestion outcome."""
+
+	def autoname(self):
+		# Deterministic name = primary key lookup for the (communication, content_hash) pair
+		self.name = f"{self.communication}-{self.content_hash}"
@@ -0,0 +1,19 @@
+# Copyright (c) 2026, invoice and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class InvoiceLedgerEntry(Document):
+	"""Platform-independent summary row of one Lieferando / Wolt / Uber Eats invoice."""
+
+	def autoname(self):
+		# One entry per source invoice; upserts address it by primary key
+		self.name = f"{self.source_doctype}-{self.source_name}"
+
+
+def on_doctype_update():
+	# Cross-platform reports: per restaurant over a date range, and per date range over platforms
+	frappe.db.add_index("Invoice Ledger Entry", ["restaurant_name", "invoice_date"])
+	frappe.db.add_index("Invoice Ledger Entry", ["invoice_date", "platform"])
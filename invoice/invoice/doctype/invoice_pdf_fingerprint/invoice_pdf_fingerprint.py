@@ -0,0 +1,12 @@
+# Copyright (c) 2026, invoice and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+
+class InvoicePDFFingerprint(Document):
+	"""SHA-256 of an ingested PDF mapped to the invoice it produced."""
+
+	def autoname(self):
+		# Name = content hash: known-PDF lookups are primary key reads
+		self.name = self.sha256
@@ -0,0 +1,20 @@
+# Copyright (c) 2026, invoice and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class InvoiceRawText(Document):
+	"""Compressed PDF text of an invoice, kept off the invoice row."""
+
+	pass
+
+
+def on_doctype_update():
+	# One row per (invoice, kind); also the lookup path of get_raw_text
+	frappe.db.add_unique(
+		"Invoice Raw Text",
+		["reference_doctype", "reference_name", "kind"],
+		constraint_name="unique_reference_kind",
+	)
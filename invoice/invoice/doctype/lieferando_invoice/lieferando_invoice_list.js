@@ -19,6 +19,7 @@ frappe.listview_settings['Lieferando Invoice'] = {
 };
 
 function show_batch_validation_dialog(doctype, listview) {
+    let batch = null;
     let dialog = new frappe.ui.Dialog({
         title: __('Batch AI Validation'),
         fields: [
@@ -35,6 +36,11 @@ function show_batch_validation_dialog(doctype, listview) {
         ],
         primary_action_label: __('Start Validation'),
         primary_action: function() {
+            // İptal edilmiş / yarım kalmış batch varsa kaldığı yerden devam et
+            if (batch && ['Cancelled', 'Failed'].includes(batch.status)) {
+                call_batch_method('resume_batch_ai_validation', { batch_id: batch.batch_id });
+                return;
+            }
             let checked_items = listview.get_checked_items(true); // only names
             if (!checked_items || checked_items.length === 0) {
                 frappe.msgprint({
@@ -44,70 +50,84 @@ function show_batch_validation_dialog(doctype, listview) {
                 });
                 return;
             }
-            start_batch_validation(doctype, dialog, listview, checked_items);
+            call_batch_method('enqueue_batch_ai_validation', { doctype: doctype, names: checked_items });
+        },
+        secondary_action_label: __('Cancel Validation'),
+        secondary_action: function() {
+            if (batch && ['Queued', 'Running'].includes(batch.status)) {
+                call_batch_method('cancel_batch_ai_validation', { batch_id: batch.batch_id });
+            } else {
+                dialog.hide();
+            }
+        },
+        on_hide: function() {
+            // Job arka planda devam eder, dialog kapanınca sadece dinleme bırakılır
+            frappe.realtime.off('invoice_ai_batch_progress', on_progress);
         }
     });
-    dialog.show();
-}
 
-function start_batch_validation(doctype, dialog, listview, selected_items) {
-    dialog.get_primary_btn().prop('disabled', true);
-    let invoices = selected_items.map(function(name) {
-        return { name: name, invoice_number: name };
-    });
-    let progress_html = dialog.fields_dict.progress_html;
-    if (progress_html) {
-        progress_html.$wrapper.html(`<div style="padding: 10px; text-align: center; color: #666;"><strong>${selected_items.length} seçili invoice validasyon edilecek...</strong></div>`);
-    }
-    process_invoices_sequentially(doctype, invoices, 0, invoices.length, dialog, listview);
-}
-
-function process_invoices_sequentially(doctype, invoices, current_index, total_count, dialog, listview) {
-    if (current_index >= invoices.length) {
-        let progress_html = dialog.fields_dict.progress_html;
-        if (progress_html) {
-            progress_html.$wrapper.html('<div style="padding: 10px; text-align: center; color: green;"><strong>✅ Tamamlandı! List view yenileniyor...</strong></div>');
-        }
-        dialog.get_primary_btn().prop('disabled', false);
-        setTimeout(function() {
-            dialog.hide();
-            if (listview) {
-                listview.refresh();
-            } else {
-                frappe.set_route('List', doctype);
+    function call_batch_method(method, args) {
+        dialog.get_primary_btn().prop('disabled', true);
+        frappe.call({
+            method: 'invoice.api.batch_ai_validation.' + method,
+            args: args,
+            callback: function(r) {
+                if (r.message) {
+                    render_batch_progress(dialog, r.message);
+                    batch = r.message;
+                }
+            },
+            error: function() {
+                dialog.get_primary_btn().prop('disabled', false);
             }
-            frappe.show_alert({
-                message: `${total_count} invoice validasyonu tamamlandı. Sonuçlar list view'da görüntüleniyor.`,
-                indicator: 'green'
-            }, 5);
-        }, 500);
-        return;
-    }
-    let invoice = invoices[current_index];
-    let progress = ((current_index / total_count) * 100).toFixed(1);
-    let progress_html = dialog.fields_dict.progress_html;
-    if (progress_html) {
-        progress_html.$wrapper.html(`<div style="padding: 10px; text-align: center;"><strong>İşleniyor: ${current_index + 1}/${total_count} (${progress}%)</strong><br><small>${invoice.invoice_number || invoice.name}</small></div>`);
+        });
     }
-    frappe.call({
-        method: 'invoice.api.invoice_ai_validation.recheck_invoice_with_ai',
-        args: {
-            doctype: doctype,
-            name: invoice.name,
-            show_message: false
-        },
-        callback: function(r) {
-            setTimeout(function() {
-                process_invoices_sequentially(doctype, invoices, current_index + 1, total_count, dialog, listview);
-            }, 100);
-        },
-        error: function(r) {
+
+    function on_progress(data) {
+        if (!batch || data.batch_id !== batch.batch_id) return;
+        batch = data;
+        render_batch_progress(dialog, data);
+        if (data.status === 'Completed') {
             setTimeout(function() {
-                process_invoices_sequentially(doctype, invoices, current_index + 1, total_count, dialog, listview);
-            }, 100);
+                dialog.hide();
+                listview.refresh();
+                frappe.show_alert({
+                    message: `${data.total} invoice validasyonu tamamlandı. Sonuçlar list view'da görüntüleniyor.`,
+                    indicator: 'green'
+                }, 5);
+            }, 500);
+        } else if (['Cancelled', 'Failed'].includes(data.status)) {
+            dialog.set_primary_action(__('Resume Validation'), dialog.primary_action);
+            dialog.get_primary_btn().prop('disabled', false);
+            listview.refresh();
         }
-    });
-}
-
+    }
 
+    frappe.realtime.on('invoice_ai_batch_progress', on_progress);
+    dialog.show();
+}
 
+function render_batch_progress(dialog, data) {
+    let progress_html = dialog.fields_dict.progress_html;
+    if (!progress_html) return;
+    let percent = data.total ? ((data.processed / data.total) * 100).toFixed(1) : 0;
+    let status_labels = {
+        'Queued': 'Sırada...',
+        'Running': `İşleniyor: ${data.processed}/${data.total} (${percent}%)`,
+        'Completed': '✅ Tamamlandı! List view yenileniyor...',
+        'Cancelled': `⏹ İptal edildi: ${data.processed}/${data.total}`,
+        'Failed': `❌ Hata: ${data.error || ''}`
+    };
+    progress_html.$wrapper.html(`
+        <div style="padding: 10px; text-align: center;">
+            <strong>${status_labels[data.status] || data.status}</strong>
+            <div class="progress" style="margin: 10px 0;">
+                <div class="progress-bar" style="width: ${percent}%;"></div>
+            </div>
+            <small>
+                ✅ ${data.valid || 0} &nbsp; ⚠️ ${data.issues || 0} &nbsp; ❌ ${data.errors || 0}
+                ${data.current ? `<br>${frappe.utils.escape_html(data.current)}` : ''}
+            </small>
+        </div>
+    `);
+}
@@ -0,0 +1,12 @@
+# Copyright (c) 2026, invoice and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+
+class WoltPendingNetting(Document):
+	"""Parsed Wolt netting report waiting for its Wolt Invoice to be created."""
+
+	def autoname(self):
+		# Name = normalized invoice number: Wolt Invoice inserts look it up by primary key
+		self.name = self.invoice_key
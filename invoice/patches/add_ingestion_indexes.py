@@ -0,0 +1,61 @@
+import frappe
+
+from invoice.api.constants import DOCTYPE_INVOICE_INGESTION_LOG
+
+# (doctype, columns, index name)
+# Columns may carry a MariaDB prefix length for TEXT columns, e.g. "file_url(255)".
+# invoice_number (invoice doctypes) and lieferando_invoice (analysis) are not listed: they are
+# "unique": 1 in the DocType JSON, so Frappe already keeps a unique key on them.
+INDEXES = (
+	# Attachment listing / old PDF deletion: attached_to_doctype + attached_to_name (+ file_name)
+	("File", ("attached_to_doctype", "attached_to_name", "file_name"), "invoice_attached_file_name"),
+	# convert_image_urls_to_base64: lookup by file_name, then by file_url
+	("File", ("file_name",), "invoice_file_name"),
+	("File", ("file_url(255)",), "invoice_file_url"),
+	# Ingestion ledger: settled attachments of a Communication
+	(DOCTYPE_INVOICE_INGESTION_LOG, ("communication", "outcome"), "invoice_communication_outcome"),
+)
+
+
+def _column(column):
+	return column.split("(", 1)[0]
+
+
+def get_index_columns(doctype):
+	"""{index name: ([columns in order], unique)} of the doctype table."""
+	indexes = {}
+	for row in frappe.db.sql(
+		"""select index_name, column_name, non_unique
+		from information_schema.statistics
+		where table_schema = database() and table_name = %s
+		order by index_name, seq_in_index""",
+		f"tab{doctype}",
+		as_dict=True,
+	):
+		columns, _unique = indexes.get(row.index_name, ([], not row.non_unique))
+		columns.append(row.column_name)
+		indexes[row.index_name] = (columns, not row.non_unique)
+	return indexes
+
+
+def find_covering_index(doctype, columns):
+	"""Name of an existing index whose leading columns are `columns`."""
+	wanted = [_column(c) for c in columns]
+	for index_name, (index_columns, _unique) in get_index_columns(doctype).items():
+		if index_columns[: len(wanted)] == wanted:
+			return index_name
+	return None
+
+
+def execute():
+	"""Add the composite indexes used by the ingestion and PDF lookups (skips covered ones)."""
+	for doctype, columns, index_name in INDEXES:
+		if not frappe.db.table_exists(doctype):
+			continue
+		existing = find_covering_index(doctype, columns)
+		if existing:
+			print(f"tab{doctype}({', '.join(columns)}): covered by {existing}")
+			continue
+
+		frappe.db.add_index(doctype, list(columns), index_name)
+		print(f"tab{doctype}({', '.join(columns)}): added {index_name}")
@@ -0,0 +1,7 @@
+from invoice.api.invoice_ledger import rebuild_ledger
+
+
+def execute():
+	"""Fill Invoice Ledger Entry from the existing Lieferando / Wolt / Uber Eats invoices."""
+	counts = rebuild_ledger()
+	print("Invoice ledger: " + ", ".join(f"{doctype} {count}" for doctype, count in counts.items()))
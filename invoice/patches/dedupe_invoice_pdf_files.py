@@ -0,0 +1,89 @@
+import os
+
+import frappe
+
+from invoice.api.constants import DOCTYPE_COMMUNICATION, INVOICE_DOCTYPES
+
+CHUNK_SIZE = 500
+
+
+def _file_path(file_url):
+	if file_url.startswith("/private/files/"):
+		return frappe.get_site_path("private", "files", file_url[len("/private/files/") :])
+	if file_url.startswith("/files/"):
+		return frappe.get_site_path("public", "files", file_url[len("/files/") :])
+	return None
+
+
+def _remove_files(paths):
+	for path in paths:
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+
+def execute():
+	"""
+	Invoice PDFs used to be attached as a second physical copy of the Communication attachment.
+	Point those File records at the original file (same content_hash) and delete the copies
+	once nothing references them anymore.
+	"""
+	invoice_files = frappe.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": ["in", INVOICE_DOCTYPES],
+			"content_hash": ["is", "set"],
+			"is_folder": 0,
+		},
+		fields=["name", "file_url", "content_hash", "attached_to_doctype", "attached_to_name", "attached_to_field"],
+	)
+	if not invoice_files:
+		return
+
+	hashes = list({f.content_hash for f in invoice_files})
+	sources = {}
+	for start in range(0, len(hashes), CHUNK_SIZE):
+		for row in frappe.get_all(
+			"File",
+			filters={
+				"content_hash": ["in", hashes[start : start + CHUNK_SIZE]],
+				"attached_to_doctype": DOCTYPE_COMMUNICATION,
+			},
+			fields=["content_hash", "file_url"],
+			order_by="creation asc",
+		):
+			if row.content_hash not in sources and row.file_url:
+				path = _file_path(row.file_url)
+				if path and os.path.exists(path):
+					sources[row.content_hash] = row.file_url
+
+	orphaned_urls = set()
+	for f in invoice_files:
+		source_url = sources.get(f.content_hash)
+		if not source_url or not f.file_url or f.file_url == source_url:
+			continue
+
+		frappe.db.set_value(
+			"File",
+			f.name,
+			{"file_url": source_url, "is_private": int(source_url.startswith("/private/"))},
+			update_modified=False,
+		)
+		if f.attached_to_field:
+			frappe.db.set_value(
+				f.attached_to_doctype,
+				{"name": f.attached_to_name, f.attached_to_field: f.file_url},
+				f.attached_to_field,
+				source_url,
+				update_modified=False,
+			)
+		orphaned_urls.add(f.file_url)
+
+	paths = [
+		_file_path(url)
+		for url in orphaned_urls
+		if not frappe.db.exists("File", {"file_url": url})
+	]
+	# Physical copies are removed only after the new file_urls are committed
+	frappe.db.after_commit.add(lambda: _remove_files(filter(None, paths)))
@@ -0,0 +1,92 @@
+import frappe
+
+from invoice.api.constants import (
+	DOCTYPE_INVOICE_RAW_TEXT,
+	DOCTYPE_LIEFERANDO_INVOICE,
+	DOCTYPE_UBER_EATS_INVOICE,
+	DOCTYPE_WOLT_INVOICE,
+	RAW_TEXT_KIND_NETTING,
+	RAW_TEXT_KIND_PDF,
+)
+from invoice.api.raw_text_store import build_row
+
+BATCH_SIZE = 500
+
+SOURCES = (
+	(DOCTYPE_LIEFERANDO_INVOICE, RAW_TEXT_KIND_PDF),
+	(DOCTYPE_WOLT_INVOICE, RAW_TEXT_KIND_PDF),
+	(DOCTYPE_WOLT_INVOICE, RAW_TEXT_KIND_NETTING),
+	(DOCTYPE_UBER_EATS_INVOICE, RAW_TEXT_KIND_PDF),
+)
+
+ROW_FIELDS = (
+	"reference_doctype",
+	"reference_name",
+	"kind",
+	"codec",
+	"original_size",
+	"compressed_size",
+	"data",
+)
+
+
+def _column_bytes(doctype, column):
+	"""Bytes stored in the column. InnoDB table sizes only shrink after OPTIMIZE TABLE, so they are not used."""
+	size = frappe.db.sql(f"select coalesce(sum(length(`{column}`)), 0) from `tab{doctype}`")
+	return int(size[0][0]) if size else 0
+
+
+def _move(doctype, kind, stats):
+	table = frappe.qb.DocType(doctype)
+	now = frappe.utils.now()
+	while True:
+		rows = frappe.db.get_all(
+			doctype,
+			filters={kind: ["is", "set"]},
+			fields=["name", kind],
+			limit=BATCH_SIZE,
+		)
+		if not rows:
+			return
+
+		names = [row.name for row in rows]
+		frappe.db.delete(
+			DOCTYPE_INVOICE_RAW_TEXT,
+			{"reference_doctype": doctype, "reference_name": ["in", names], "kind": kind},
+		)
+		values = []
+		for row in rows:
+			store_row = build_row(doctype, row.name, row.get(kind), kind)
+			stats["original"] += store_row["original_size"]
+			stats["compressed"] += store_row["compressed_size"]
+			stats["rows"] += 1
+			values.append(
+				(frappe.generate_hash(length=10), now, now, "Administrator", "Administrator", 0)
+				+ tuple(store_row[field] for field in ROW_FIELDS)
+			)
+		frappe.db.bulk_insert(
+			DOCTYPE_INVOICE_RAW_TEXT,
+			("name", "creation", "modified", "owner", "modified_by", "docstatus", *ROW_FIELDS),
+			values,
+		)
+		frappe.qb.update(table).set(table[kind], None).where(table.name.isin(names)).run()
+		frappe.db.commit()
+
+
+def execute():
+	"""Move raw_text / netting_raw_text off the invoice rows into compressed Invoice Raw Text rows."""
+	before = {source: _column_bytes(*source) for source in SOURCES}
+
+	stats = {"rows": 0, "original": 0, "compressed": 0}
+	for doctype, kind in SOURCES:
+		_move(doctype, kind, stats)
+
+	after = {source: _column_bytes(*source) for source in SOURCES}
+
+	print(
+		f"Invoice raw text: {stats['rows']} rows, {stats['original']} bytes text -> "
+		f"{stats['compressed']} bytes compressed"
+	)
+	for doctype, kind in SOURCES:
+		print(f"  tab{doctype}.{kind}: {before[(doctype, kind)]} -> {after[(doctype, kind)]} bytes")
+	print("  Run OPTIMIZE TABLE on the invoice tables to return the freed space to the filesystem")
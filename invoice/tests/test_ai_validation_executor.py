@@ -0,0 +1,340 @@
+# Copyright (c) 2025, invoice and Contributors
+# See license.txt
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from invoice.api import ai_validation_executor
+from invoice.api.ai_validation_executor import (
+	TokenBucket,
+	ValidationExecutor,
+	get_async_openai_client,
+	write_validation_results,
+)
+
+REAL_SLEEP = asyncio.sleep
+VALID_RESULT = {"status": "Valid", "confidence": 0.9, "summary": "ok"}
+MESSAGES = [{"role": "user", "content": "invoice"}]
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+class FakeAPIError(Exception):
+	"""openai.APIStatusError shape: status_code + response.headers"""
+
+	def __init__(self, status_code, retry_after=None):
+		super().__init__(f"HTTP {status_code}")
+		self.status_code = status_code
+		headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+		self.response = SimpleNamespace(headers=headers)
+
+
+def completion(content, total_tokens=100):
+	message = SimpleNamespace(content=content)
+	return SimpleNamespace(
+		choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=total_tokens)
+	)
+
+
+class FakeClient:
+	"""AsyncOpenAI stand-in: chat.completions.create returns (or raises) the queued outcomes in order"""
+
+	def __init__(self, *outcomes):
+		self.outcomes = list(outcomes)
+		self.calls = []
+		self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+	async def create(self, **kwargs):
+		self.calls.append(kwargs)
+		outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+		if isinstance(outcome, Exception):
+			raise outcome
+		return outcome
+
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+	"""POST /v1/chat/completions: the server's queued (status, headers, body) responses, last one repeated"""
+
+	def do_POST(self):
+		server = self.server
+		server.requests.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+		status, headers, body = server.responses.pop(0) if len(server.responses) > 1 else server.responses[0]
+		data = json.dumps(body).encode()
+		self.send_response(status)
+		for key, value in {
+			**headers,
+			"Content-Type": "application/json",
+			"Content-Length": len(data),
+		}.items():
+			self.send_header(key, str(value))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, *args):
+		pass
+
+
+def completion_body(content, total_tokens=100):
+	return {
+		"id": "chatcmpl-test",
+		"object": "chat.completion",
+		"created": 0,
+		"model": "test",
+		"choices": [
+			{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+		],
+		"usage": {"prompt_tokens": total_tokens - 20, "completion_tokens": 20, "total_tokens": total_tokens},
+	}
+
+
+class TestTokenBucket(FrappeTestCase):
+	def setUp(self):
+		self.clock = FakeClock()
+		self.sleeps = []
+
+	async def fake_sleep(self, delay):
+		self.sleeps.append(delay)
+		await REAL_SLEEP(0)
+
+	def run_acquires(self, bucket, *amounts):
+		async def scenario():
+			await asyncio.gather(*(bucket.acquire(amount) for amount in amounts))
+
+		with patch.object(ai_validation_executor.asyncio, "sleep", self.fake_sleep):
+			asyncio.run(scenario())
+
+	def test_burst_up_to_capacity(self):
+		bucket = TokenBucket(60, clock=self.clock)
+		self.run_acquires(bucket, *[1] * 60)
+		self.assertEqual(self.sleeps, [])
+		self.assertAlmostEqual(bucket.tokens, 0)
+
+	def test_refill(self):
+		bucket = TokenBucket(60, clock=self.clock)
+		self.run_acquires(bucket, 60)
+		self.clock.now += 30
+		bucket._refill()
+		self.assertAlmostEqual(bucket.tokens, 30)
+		# Never refills above capacity
+		self.clock.now += 600
+		bucket._refill()
+		self.assertAlmostEqual(bucket.tokens, 60)
+
+	def test_waiters_reserve_in_fifo_order(self):
+		bucket = TokenBucket(60, clock=self.clock)
+		self.run_acquires(bucket, 60)
+		# Empty bucket, 1 token/s: each waiter sleeps only for its own deficit
+		self.run_acquires(bucket, 30, 10, 20)
+		self.assertEqual([round(delay, 6) for delay in self.sleeps], [30, 40, 60])
+		self.assertAlmostEqual(bucket.tokens, -60)
+
+	def test_request_larger_than_capacity_is_capped(self):
+		bucket = TokenBucket(60, clock=self.clock)
+		self.run_acquires(bucket, 600)
+		self.assertEqual(self.sleeps, [])
+		self.run_acquires(bucket, 600)
+		self.assertEqual([round(delay, 6) for delay in self.sleeps], [60])
+
+	def test_unlimited(self):
+		bucket = TokenBucket(0, clock=self.clock)
+		self.run_acquires(bucket, *[1000] * 10)
+		self.assertEqual(self.sleeps, [])
+
+
+class TestValidationExecutor(FrappeTestCase):
+	def setUp(self):
+		self.sleeps = []
+
+	async def fake_sleep(self, delay):
+		self.sleeps.append(delay)
+		await REAL_SLEEP(0)
+
+	def validate(self, client, max_retries=3):
+		executor = ValidationExecutor(client, 1, max_retries=max_retries)
+		with patch.object(ai_validation_executor.asyncio, "sleep", self.fake_sleep):
+			result = asyncio.run(executor.validate(MESSAGES))
+		return executor, result
+
+	def test_retry_after_is_honoured(self):
+		client = FakeClient(FakeAPIError(429, retry_after=2), completion(json.dumps(VALID_RESULT)))
+		executor, result = self.validate(client)
+
+		self.assertEqual(result, VALID_RESULT)
+		self.assertEqual(len(client.calls), 2)
+		self.assertEqual(len(self.sleeps), 1)
+		self.assertGreaterEqual(self.sleeps[0], 2)
+		self.assertEqual(executor.stats, {"requests": 1, "retries": 1, "tokens": 100})
+
+	def test_backoff_is_bounded(self):
+		client = FakeClient(FakeAPIError(503), FakeAPIError(503), completion(json.dumps(VALID_RESULT)))
+		executor, result = self.validate(client)
+
+		self.assertEqual(result, VALID_RESULT)
+		self.assertEqual(executor.stats["retries"], 2)
+		# Full jitter: attempt n sleeps in [0, base * 2^n]
+		for attempt, delay in enumerate(self.sleeps):
+			self.assertGreaterEqual(delay, 0)
+			self.assertLessEqual(delay, ai_validation_executor.AI_VALIDATION_BACKOFF_BASE * 2**attempt)
+
+	def test_gives_up_after_max_retries(self):
+		client = FakeClient(FakeAPIError(429, retry_after=1))
+		with self.assertRaises(FakeAPIError):
+			self.validate(client, max_retries=2)
+		self.assertEqual(len(client.calls), 3)
+		self.assertEqual(len(self.sleeps), 2)
+
+	def test_client_errors_are_not_retried(self):
+		client = FakeClient(FakeAPIError(401))
+		with self.assertRaises(FakeAPIError):
+			self.validate(client)
+		self.assertEqual(len(client.calls), 1)
+		self.assertEqual(self.sleeps, [])
+
+	def test_json_mode_fallback(self):
+		client = FakeClient(FakeAPIError(400), completion(json.dumps(VALID_RESULT)))
+		executor, result = self.validate(client)
+
+		self.assertEqual(result, VALID_RESULT)
+		self.assertEqual(len(client.calls), 2)
+		self.assertIn("response_format", client.calls[0])
+		self.assertNotIn("response_format", client.calls[1])
+		self.assertEqual(client.calls[0]["messages"], client.calls[1]["messages"])
+		# 400 is not a retryable status: no backoff
+		self.assertEqual(self.sleeps, [])
+		self.assertEqual(executor.stats["retries"], 0)
+
+	def test_run_collects_results_and_errors(self):
+		client = FakeClient(completion(json.dumps(VALID_RESULT)), FakeAPIError(401))
+		seen = []
+		executor = ValidationExecutor(
+			client, 2, max_retries=0, on_result=lambda key, result: seen.append(key)
+		)
+		items = [(("Wolt Invoice", "A"), MESSAGES), (("Wolt Invoice", "B"), MESSAGES)]
+
+		results = asyncio.run(executor.run(items))
+
+		self.assertEqual(results[("Wolt Invoice", "A")], VALID_RESULT)
+		self.assertIsInstance(results[("Wolt Invoice", "B")], FakeAPIError)
+		self.assertEqual(sorted(seen), [("Wolt Invoice", "A"), ("Wolt Invoice", "B")])
+
+	def test_should_stop_skips_pending_items(self):
+		client = FakeClient(completion(json.dumps(VALID_RESULT)))
+		executor = ValidationExecutor(client, 1, should_stop=lambda: True)
+		results = asyncio.run(executor.run([(("Wolt Invoice", "A"), MESSAGES)]))
+		self.assertEqual(results, {})
+		self.assertEqual(client.calls, [])
+
+
+class TestWriteValidationResults(FrappeTestCase):
+	def write(self, results):
+		with (
+			patch.object(frappe.db, "bulk_update") as bulk_update,
+			patch.object(frappe.db, "commit") as commit,
+			patch.object(frappe, "log_error") as log_error,
+		):
+			write_validation_results(results)
+		return bulk_update, commit, log_error
+
+	def test_groups_by_doctype_and_fields(self):
+		bulk_update, commit, log_error = self.write(
+			{
+				("Wolt Invoice", "A"): VALID_RESULT,
+				("Wolt Invoice", "B"): {**VALID_RESULT, "status": "Issues Found"},
+				("Wolt Invoice", "C"): FakeAPIError(401),
+				("Uber Eats Invoice", "D"): VALID_RESULT,
+			}
+		)
+
+		commit.assert_called_once()
+		log_error.assert_called_once()
+		updates = {}
+		for call in bulk_update.call_args_list:
+			doctype, doc_updates = call.args
+			self.assertEqual(call.kwargs, {"update_modified": False})
+			updates.setdefault(doctype, []).append(doc_updates)
+
+		self.assertEqual(len(bulk_update.call_args_list), 3)
+		wolt_results, wolt_errors = sorted(updates["Wolt Invoice"], key=len, reverse=True)
+		self.assertEqual(sorted(wolt_results), ["A", "B"])
+		self.assertEqual(wolt_results["A"]["ai_validation_status"], "Valid")
+		self.assertEqual(wolt_results["B"]["ai_validation_status"], "Issues Found")
+		self.assertAlmostEqual(wolt_results["A"]["ai_validation_confidence"], 90)
+		self.assertEqual(json.loads(wolt_results["A"]["ai_validation_result"]), VALID_RESULT)
+		# Error rows keep the previous result JSON
+		self.assertEqual(sorted(wolt_errors), ["C"])
+		self.assertEqual(wolt_errors["C"]["ai_validation_status"], "Error")
+		self.assertNotIn("ai_validation_result", wolt_errors["C"])
+		self.assertEqual(sorted(updates["Uber Eats Invoice"][0]), ["D"])
+
+
+class TestMockServer(FrappeTestCase):
+	"""Real AsyncOpenAI client against a local HTTP server: openai exceptions and headers end to end"""
+
+	def setUp(self):
+		if ai_validation_executor.AsyncOpenAI is None:
+			self.skipTest("openai is not installed")
+		self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockCompletionsHandler)
+		self.server.requests = []
+		self.server.responses = []
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def validate(self, max_retries=3):
+		conf = {"openai_api_key": "test", "openai_base_url": f"http://127.0.0.1:{self.server.server_port}/v1"}
+
+		async def scenario():
+			client = get_async_openai_client()
+			try:
+				executor = ValidationExecutor(client, 1, max_retries=max_retries)
+				return executor, await executor.validate(MESSAGES)
+			finally:
+				await client.close()
+
+		with patch.dict(frappe.conf, conf):
+			return asyncio.run(scenario())
+
+	def test_429_with_retry_after_then_200(self):
+		self.server.responses = [
+			(429, {"Retry-After": "1"}, {"error": {"message": "Rate limit reached", "type": "requests"}}),
+			(200, {}, completion_body(json.dumps(VALID_RESULT))),
+		]
+		started = time.monotonic()
+		executor, result = self.validate()
+
+		self.assertEqual(result, VALID_RESULT)
+		self.assertEqual(len(self.server.requests), 2)
+		self.assertGreaterEqual(time.monotonic() - started, 1)
+		self.assertEqual(executor.stats, {"requests": 1, "retries": 1, "tokens": 100})
+
+	def test_400_falls_back_to_plain_mode(self):
+		self.server.responses = [
+			(
+				400,
+				{},
+				{"error": {"message": "response_format is not supported", "type": "invalid_request_error"}},
+			),
+			(200, {}, completion_body(json.dumps(VALID_RESULT))),
+		]
+		executor, result = self.validate()
+
+		self.assertEqual(result, VALID_RESULT)
+		self.assertIn("response_format", self.server.requests[0])
+		self.assertNotIn("response_format", self.server.requests[1])
+		self.assertEqual(executor.stats["retries"], 0)
@@ -0,0 +1,71 @@
+# Copyright (c) 2025, invoice and Contributors
+# See license.txt
+
+import json
+import os
+
+from frappe.tests.utils import FrappeTestCase
+
+from invoice.api.field_extraction import set_fallback_date
+from invoice.api.invoice_extraction import extract_invoice_data_from_text
+from invoice.api.pdf_classifier import classify_text
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "field_extraction")
+PLATFORMS = ("lieferando", "wolt", "uber_eats")
+
+
+def load_fixture(platform):
+	"""(raw text, expected extraction result) for fixtures/field_extraction/<platform>.txt/.json"""
+	with open(os.path.join(FIXTURES, f"{platform}.txt")) as f:
+		text = f.read()
+	with open(os.path.join(FIXTURES, f"{platform}.json")) as f:
+		expected = json.load(f)
+	return text, expected
+
+
+def normalize(data):
+	"""Extraction result as plain JSON values (child rows as dicts, dates as strings)"""
+	data = dict(data)
+	data.pop("raw_text", None)
+	data.pop("confidence", None)
+	for parentfield in ("order_items", "tip_items"):
+		if parentfield in data:
+			data[parentfield] = [row._asdict() if hasattr(row, "_asdict") else dict(row) for row in data[parentfield]]
+	return json.loads(json.dumps(data, default=str))
+
+
+class TestFieldExtraction(FrappeTestCase):
+	def setUp(self):
+		# parse_date falls back to "today" when no date is found; keep it fixed
+		set_fallback_date("2026-01-01")
+
+	def tearDown(self):
+		set_fallback_date(None)
+
+	def assertExtracted(self, actual, expected, path=""):
+		if isinstance(expected, float):
+			self.assertAlmostEqual(actual, expected, places=6, msg=path)
+		elif isinstance(expected, dict):
+			self.assertIsInstance(actual, dict, msg=path)
+			self.assertEqual(sorted(actual), sorted(expected), msg=path)
+			for key, value in expected.items():
+				self.assertExtracted(actual[key], value, f"{path}.{key}")
+		elif isinstance(expected, list):
+			self.assertEqual(len(actual), len(expected), msg=path)
+			for index, (actual_row, expected_row) in enumerate(zip(actual, expected)):
+				self.assertExtracted(actual_row, expected_row, f"{path}[{index}]")
+		else:
+			self.assertEqual(actual, expected, msg=path)
+
+	def test_fixtures(self):
+		for platform in PLATFORMS:
+			with self.subTest(platform=platform):
+				text, expected = load_fixture(platform)
+				actual = normalize(extract_invoice_data_from_text(text, platform))
+				self.assertExtracted(actual, expected, platform)
+
+	def test_platform_detection(self):
+		for platform in PLATFORMS:
+			with self.subTest(platform=platform):
+				text, _expected = load_fixture(platform)
+				self.assertEqual(classify_text(text).platform, platform)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.child_rows import bulk_insert_child_rows
+from invoice.api.constants import (
+	DOCTYPE_LIEFERANDO_INVOICE,
+	DOCTYPE_LIEFERANDO_INVOICE_ORDER_ITEM,
+	FIELD_STATUS_DRAFT,
+)
+from invoice.api.field_extraction import OrderItem
+
+DEFAULT_SIZES = (100, 1000, 10000)
+
+
+def _synthetic_rows(count: int) -> list[OrderItem]:
+	start = datetime(2025, 1, 1, 12, 0, 0)
+	return [
+		OrderItem(start + timedelta(minutes=i), f"BENCH{i:08d}", 10.0 + (i % 50), i % 2)
+		for i in range(count)
+	]
+
+
+def _new_invoice(label: str):
+	invoice = frappe.new_doc(DOCTYPE_LIEFERANDO_INVOICE)
+	invoice.update(
+		{
+			"invoice_number": f"BENCH-{label}-{frappe.generate_hash(length=6)}",
+			"invoice_date": frappe.utils.today(),
+			"status": FIELD_STATUS_DRAFT,
+		}
+	)
+	invoice.name = invoice.invoice_number
+	return invoice
+
+
+def _time_orm(rows: list[OrderItem]) -> float:
+	started = time.perf_counter()
+	invoice = _new_invoice("orm")
+	for row in rows:
+		invoice.append("order_items", row._asdict())
+	invoice.insert(ignore_permissions=True, ignore_mandatory=True)
+	return time.perf_counter() - started
+
+
+def _time_bulk(rows: list[OrderItem]) -> float:
+	started = time.perf_counter()
+	invoice = _new_invoice("bulk")
+	invoice.insert(ignore_permissions=True, ignore_mandatory=True)
+	bulk_insert_child_rows(invoice, "order_items", DOCTYPE_LIEFERANDO_INVOICE_ORDER_ITEM, rows)
+	return time.perf_counter() - started
+
+
+@frappe.whitelist()
+def run(sizes: str | None = None) -> list[dict[str, Any]]:
+	"""
+	Compare ORM (append + insert) vs bulk child row inserts for Lieferando Invoice order_items.
+	Every measurement runs inside the current transaction and is rolled back - nothing is kept.
+
+	bench --site <site> execute invoice.tools.child_insert_benchmark.run --kwargs "{'sizes': '100,1000,10000'}"
+	"""
+	frappe.only_for("System Manager")
+
+	counts = [cint(s) for s in (sizes or "").split(",") if cint(s) > 0] or list(DEFAULT_SIZES)
+	results = []
+	for count in counts:
+		rows = _synthetic_rows(count)
+		try:
+			orm_seconds = _time_orm(rows)
+			frappe.db.rollback()
+			bulk_seconds = _time_bulk(rows)
+		finally:
+			frappe.db.rollback()
+
+		results.append(
+			{
+				"rows": count,
+				"orm_seconds": round(orm_seconds, 4),
+				"bulk_seconds": round(bulk_seconds, 4),
+				"speedup": round(orm_seconds / bulk_seconds, 2) if bulk_seconds else None,
+			}
+		)
+		print(f"{count:>6} rows  orm {orm_seconds:8.3f}s  bulk {bulk_seconds:8.3f}s")
+
+	return results
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from typing import Any, Callable
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import (
+	DOCTYPE_INVOICE_INGESTION_LOG,
+	DOCTYPE_LIEFERANDO_INVOICE,
+	DOCTYPE_LIEFERANDO_INVOICE_ANALYSIS,
+	DOCTYPE_WOLT_INVOICE,
+	INGESTION_RETRY_OUTCOMES,
+	INVOICE_DOCTYPES,
+)
+from invoice.patches import add_ingestion_indexes
+
+PREFIX = "IDXBENCH"
+SEED_CHUNK_SIZE = 10000
+DEFAULT_INVOICES = 100_000
+DEFAULT_FILES = 1_000_000
+DEFAULT_SAMPLES = 200
+
+SEEDED_DOCTYPES = (*INVOICE_DOCTYPES, DOCTYPE_LIEFERANDO_INVOICE_ANALYSIS, DOCTYPE_INVOICE_INGESTION_LOG, "File")
+
+
+def _invoice_number(i: int) -> str:
+	return f"{PREFIX}-{i:07d}"
+
+
+def _seed_rows(doctype: str, fields: tuple[str, ...], count: int, make_row: Callable[[int], tuple]) -> None:
+	"""make_row(i) -> (name, *fields); rows are written with bulk_insert and committed per chunk."""
+	now = frappe.utils.now()
+	for start in range(0, count, SEED_CHUNK_SIZE):
+		values = []
+		for i in range(start, min(start + SEED_CHUNK_SIZE, count)):
+			name, *row = make_row(i)
+			values.append((name, now, now, "Administrator", "Administrator", 0, *row))
+		frappe.db.bulk_insert(
+			doctype,
+			("name", "creation", "modified", "owner", "modified_by", "docstatus", *fields),
+			values,
+			chunk_size=SEED_CHUNK_SIZE,
+		)
+		frappe.db.commit()
+
+
+def seed(invoices: int = DEFAULT_INVOICES, files: int = DEFAULT_FILES) -> None:
+	"""Synthetic invoices (spread over the three invoice doctypes), analyses, ledger rows and Files."""
+	per_doctype = invoices // len(INVOICE_DOCTYPES)
+	for offset, doctype in enumerate(INVOICE_DOCTYPES):
+		base = offset * per_doctype
+		_seed_rows(
+			doctype,
+			("invoice_number",),
+			per_doctype,
+			lambda i, base=base: (_invoice_number(base + i), _invoice_number(base + i)),
+		)
+
+	_seed_rows(
+		DOCTYPE_LIEFERANDO_INVOICE_ANALYSIS,
+		("lieferando_invoice",),
+		per_doctype,
+		lambda i: (f"{PREFIX}-ANA-{i:08d}", _invoice_number(i)),
+	)
+	_seed_rows(
+		DOCTYPE_INVOICE_INGESTION_LOG,
+		("communication", "content_hash", "outcome"),
+		invoices,
+		lambda i: (f"{PREFIX}-LOG-{i:08d}", f"{PREFIX}-COM-{i // 3:08d}", f"{i:064x}", "Created"),
+	)
+
+	attach_doctypes = (*INVOICE_DOCTYPES, DOCTYPE_LIEFERANDO_INVOICE_ANALYSIS, "Communication")
+
+	def file_row(i: int) -> tuple:
+		file_name = f"{PREFIX}-{i:08d}.pdf"
+		return (
+			f"{PREFIX}-FIL-{i:08d}",
+			file_name,
+			f"/private/files/{file_name}",
+			1,
+			"Home/Attachments",
+			attach_doctypes[i % len(attach_doctypes)],
+			_invoice_number(i % max(invoices, 1)),
+		)
+
+	_seed_rows(
+		"File",
+		("file_name", "file_url", "is_private", "folder", "attached_to_doctype", "attached_to_name"),
+		files,
+		file_row,
+	)
+
+
+def cleanup() -> None:
+	"""Remove every seeded row."""
+	for doctype in SEEDED_DOCTYPES:
+		frappe.db.sql(f"delete from `tab{doctype}` where name like %s", f"{PREFIX}-%")
+		frappe.db.commit()
+
+
+def drop_benchmark_indexes() -> list[str]:
+	"""Drop the indexes add_ingestion_indexes created (by name) so the 'before' run sees the old schema."""
+	dropped = []
+	for doctype, _columns, index_name in add_ingestion_indexes.INDEXES:
+		if index_name in add_ingestion_indexes.get_index_columns(doctype):
+			frappe.db.sql_ddl(f"alter table `tab{doctype}` drop index `{index_name}`")
+			dropped.append(f"tab{doctype}.{index_name}")
+	return dropped
+
+
+def _queries(invoices: int, files: int) -> list[tuple[str, str, Callable[[], tuple]]]:
+	"""
+	(label, query, random parameters) - the lookups the ingestion / PDF code runs. Lookups on the
+	DocType unique keys are kept as a control; add_ingestion_indexes does not touch them.
+	"""
+	rand_invoice = lambda: _invoice_number(random.randrange(max(invoices, 1)))  # noqa: E731
+	rand_file = lambda: f"{PREFIX}-{random.randrange(max(files, 1)):08d}.pdf"  # noqa: E731
+	batch = lambda: tuple(rand_invoice() for _ in range(200))  # noqa: E731
+	return [
+		(
+			"invoice_number = %s (Wolt Invoice) [already unique]",
+			f"select name from `tab{DOCTYPE_WOLT_INVOICE}` where invoice_number = %s",
+			lambda: (rand_invoice(),),
+		),
+		(
+			"invoice_number in (200) (Lieferando) [already unique]",
+			f"select invoice_number from `tab{DOCTYPE_LIEFERANDO_INVOICE}` where invoice_number in %s",
+			lambda: (batch(),),
+		),
+		(
+			"File by attached_to_doctype/name/file_name",
+			"""select name from `tabFile`
+			where attached_to_doctype = %s and attached_to_name = %s and file_name = %s""",
+			lambda: (DOCTYPE_LIEFERANDO_INVOICE_ANALYSIS, rand_invoice(), rand_file()),
+		),
+		(
+			"File by file_name",
+			"select name, file_url from `tabFile` where file_name = %s",
+			lambda: (rand_file(),),
+		),
+		(
+			"File by file_url",
+			"select name, file_url from `tabFile` where file_url = %s",
+			lambda: (f"/private/files/{rand_file()}",),
+		),
+		(
+			"Analysis by lieferando_invoice [already unique]",
+			f"select name from `tab{DOCTYPE_LIEFERANDO_INVOICE_ANALYSIS}` where lieferando_invoice = %s",
+			lambda: (rand_invoice(),),
+		),
+		(
+			"Ingestion log settled keys",
+			f"""select content_hash from `tab{DOCTYPE_INVOICE_INGESTION_LOG}`
+			where communication = %s and outcome not in %s""",
+			lambda: (f"{PREFIX}-COM-{random.randrange(max(invoices // 3, 1)):08d}", INGESTION_RETRY_OUTCOMES),
+		),
+	]
+
+
+def measure(invoices: int, files: int, samples: int = DEFAULT_SAMPLES) -> list[dict[str, Any]]:
+	"""EXPLAIN plan + p50/p95 latency of every hot query."""
+	results = []
+	for label, query, params in _queries(invoices, files):
+		plan = frappe.db.sql(f"explain {query}", params(), as_dict=True)
+		timings = []
+		for _ in range(samples):
+			values = params()
+			started = time.perf_counter()
+			frappe.db.sql(query, values)
+			timings.append((time.perf_counter() - started) * 1000)
+		timings.sort()
+		results.append(
+			{
+				"query": label,
+				"plan": [
+					{"table": row.get("table"), "type": row.get("type"), "key": row.get("key"), "rows": row.get("rows")}
+					for row in plan
+				],
+				"p50_ms": round(statistics.median(timings), 3),
+				"p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+			}
+		)
+	return results
+
+
+def ensure_scratch_site() -> None:
+	"""Seeding commits and the File table indexes are dropped / re-created: never on a real site."""
+	if not (frappe.conf.get("developer_mode") or frappe.conf.get("invoice_benchmark_scratch_site")):
+		frappe.throw(
+			"index_benchmark only runs on a scratch site: enable developer_mode or set "
+			"invoice_benchmark_scratch_site in site config"
+		)
+
+
+def _print(title: str, results: list[dict[str, Any]]) -> None:
+	print(title)
+	for result in results:
+		plan = ", ".join(f"{p['type']}/{p['key'] or '-'}/{p['rows']}" for p in result["plan"])
+		print(f"  {result['query']:<52} p50 {result['p50_ms']:8.3f} ms  p95 {result['p95_ms']:8.3f} ms  [{plan}]")
+
+
+def run(
+	invoices: int | None = None,
+	files: int | None = None,
+	samples: int | None = None,
+	reseed: int = 1,
+	keep: int = 0,
+) -> dict[str, Any]:
+	"""
+	Seed synthetic invoices / Files, then compare EXPLAIN plans and latencies of the ingestion
+	lookups without and with the add_ingestion_indexes indexes. Only runs on a scratch site
+	(developer_mode or invoice_benchmark_scratch_site): seeding commits, and the indexes are
+	dropped and re-created (DDL cannot be rolled back).
+
+	bench --site <site> execute invoice.tools.index_benchmark.run --kwargs "{'invoices': 100000, 'files': 1000000}"
+	"""
+	ensure_scratch_site()
+
+	invoices = cint(invoices) or DEFAULT_INVOICES
+	files = cint(files) or DEFAULT_FILES
+	samples = cint(samples) or DEFAULT_SAMPLES
+
+	if cint(reseed):
+		cleanup()
+		started = time.perf_counter()
+		seed(invoices, files)
+		print(f"Seeded {invoices} invoices and {files} files in {time.perf_counter() - started:.1f}s")
+
+	try:
+		dropped = drop_benchmark_indexes()
+		for doctype in SEEDED_DOCTYPES:
+			frappe.db.sql(f"analyze table `tab{doctype}`")
+		before = measure(invoices, files, samples)
+		_print(f"Before (dropped: {', '.join(dropped) or 'none'})", before)
+
+		add_ingestion_indexes.execute()
+		for doctype in SEEDED_DOCTYPES:
+			frappe.db.sql(f"analyze table `tab{doctype}`")
+		after = measure(invoices, files, samples)
+		_print("After", after)
+	finally:
+		if not cint(keep):
+			cleanup()
+
+	return {"invoices": invoices, "files": files, "samples": samples, "before": before, "after": after}
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import DOCTYPE_COMMUNICATION, NOTIFICATION_TYPE_ALERT
+from invoice.api.notification_aggregator import create_notification_logs, get_active_system_users
+
+DEFAULT_EMAILS = 200
+
+
+def _notification(label: str) -> dict[str, Any]:
+	return {
+		"type": NOTIFICATION_TYPE_ALERT,
+		"document_type": DOCTYPE_COMMUNICATION,
+		"subject": f"Notification benchmark: {label}",
+		"email_content": "<b>Notification benchmark</b>",
+	}
+
+
+def _time_per_email(emails: int, users: list[str]) -> float:
+	"""What per_email mode runs: one make_notification_logs job per email, one insert per user."""
+	from frappe.desk.doctype.notification_log.notification_log import make_notification_logs
+
+	started = time.perf_counter()
+	for i in range(emails):
+		make_notification_logs(frappe._dict(_notification(f"email {i}")), users)
+	return time.perf_counter() - started
+
+
+def _time_digest(users: list[str]) -> float:
+	"""What digest mode runs: one job per sync window, one multi-row insert."""
+	started = time.perf_counter()
+	create_notification_logs(users, _notification("digest"))
+	return time.perf_counter() - started
+
+
+@frappe.whitelist()
+def run(emails: int | None = None) -> dict[str, Any]:
+	"""
+	Compare Notification Log creation for a sync run of `emails` emails: per_email mode (one job and
+	one insert per user for every email) vs digest mode (one job, one multi-row insert). Uses the
+	site's active System Users; both measurements are rolled back.
+
+	bench --site <site> execute invoice.tools.notification_benchmark.run --kwargs "{'emails': 200}"
+	"""
+	frappe.only_for("System Manager")
+
+	emails = cint(emails) or DEFAULT_EMAILS
+	users = get_active_system_users()
+	if not users:
+		frappe.throw("No active System Users")
+
+	try:
+		per_email_seconds = _time_per_email(emails, users)
+		frappe.db.rollback()
+		digest_seconds = _time_digest(users)
+	finally:
+		frappe.db.rollback()
+
+	result = {
+		"emails": emails,
+		"users": len(users),
+		"per_email": {"jobs": emails, "inserts": emails * len(users), "seconds": round(per_email_seconds, 4)},
+		"digest": {"jobs": 1, "inserts": 1, "seconds": round(digest_seconds, 4)},
+		"speedup": round(per_email_seconds / digest_seconds, 2) if digest_seconds else None,
+	}
+	print(
+		f"{emails} emails x {len(users)} users  "
+		f"per_email {emails} jobs / {emails * len(users)} inserts {per_email_seconds:8.3f}s  "
+		f"digest 1 job / 1 insert {digest_seconds:8.3f}s"
+	)
+	return result
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import frappe
+from frappe.utils import cint
+
+from invoice.api.constants import (
+	DOCTYPE_LIEFERANDO_INVOICE,
+	DOCTYPE_UBER_EATS_INVOICE,
+	DOCTYPE_WOLT_INVOICE,
+	PDF_BACKEND_DEFAULT,
+)
+from invoice.api.invoice_extraction import extract_invoice_data_from_text
+from invoice.api.pdf_backends import get_available_backends, get_backend
+from invoice.api.pdf_classifier import classify_text
+
+
+def _fields(text: str, platform: str) -> dict[str, Any]:
+	"""
+	Extraction result as plain JSON values. The regexes depend on line breaks ([^\\n]+, splitlines()
+	row parsing), so backends are compared on what they extract rather than on normalized text.
+	"""
+	data = extract_invoice_data_from_text(text, platform)
+	data.pop("raw_text", None)
+	return json.loads(json.dumps(data, default=str))
+
+
+def _lines(text: str) -> list[str]:
+	return [line.rstrip() for line in (text or "").splitlines()]
+
+
+def _corpus_from_dir(corpus_dir: str) -> list[tuple[str, bytes, str | None]]:
+	"""<name>.pdf files; an optional <name>.txt next to it is used as the golden text."""
+	items = []
+	for pdf_path in sorted(Path(corpus_dir).glob("*.pdf")):
+		golden_path = pdf_path.with_suffix(".txt")
+		golden = golden_path.read_text(encoding="utf-8") if golden_path.exists() else None
+		items.append((pdf_path.name, pdf_path.read_bytes(), golden))
+	return items
+
+
+def _corpus_from_site(limit: int) -> list[tuple[str, bytes, str | None]]:
+	"""Most recent PDFs attached to invoice documents."""
+	files = frappe.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": ["in", [DOCTYPE_LIEFERANDO_INVOICE, DOCTYPE_WOLT_INVOICE, DOCTYPE_UBER_EATS_INVOICE]],
+			"file_name": ["like", "%.pdf"],
+		},
+		fields=["name", "file_name"],
+		order_by="creation desc",
+		limit=limit,
+	)
+	items = []
+	for f in files:
+		try:
+			items.append((f.file_name, frappe.get_doc("File", f.name).get_content(), None))
+		except Exception:
+			continue
+	return items
+
+
+def _extract(backend, content: bytes) -> str:
+	return "".join(backend.open(content).iter_pages())
+
+
+@frappe.whitelist()
+def run(corpus_dir: str | None = None, limit: int = 50, save: int = 0) -> dict[str, Any]:
+	"""
+	Time every installed PDF backend on a sample corpus and pick the fastest one whose extracted
+	invoice fields match those of the golden text (a <name>.txt next to the PDF, otherwise the
+	PyPDF2 output the extraction regexes were written against). Line-by-line text differences are
+	reported but do not disqualify a backend on their own. With save=1 the winner is written to
+	site config as "invoice_pdf_backend".
+
+	bench --site <site> execute invoice.tools.pdf_backend_benchmark.run --kwargs "{'corpus_dir': '/path/to/pdfs'}"
+	"""
+	frappe.only_for("System Manager")
+
+	corpus = _corpus_from_dir(corpus_dir) if corpus_dir else _corpus_from_site(cint(limit) or 50)
+	if not corpus:
+		frappe.throw("No sample PDFs found for the benchmark")
+
+	reference = get_backend(PDF_BACKEND_DEFAULT)
+	golden = {}
+	for name, content, golden_text in corpus:
+		if golden_text is None and reference is not None:
+			golden_text = _extract(reference, content)
+		if golden_text is not None:
+			platform = classify_text(golden_text).platform
+			golden[name] = (platform, _lines(golden_text), _fields(golden_text, platform))
+
+	results = []
+	for backend in get_available_backends():
+		texts = {}
+		errors = 0
+		started = time.perf_counter()
+		for name, content, _golden_text in corpus:
+			try:
+				texts[name] = _extract(backend, content)
+			except Exception:
+				errors += 1
+		seconds = time.perf_counter() - started
+
+		# Compared outside the timed loop: extraction cost is the same for every backend
+		mismatches, line_mismatches = [], []
+		for name, _content, _golden_text in corpus:
+			if name not in texts:
+				mismatches.append(name)
+			elif name in golden:
+				platform, golden_lines, golden_fields = golden[name]
+				if _lines(texts[name]) != golden_lines:
+					line_mismatches.append(name)
+				try:
+					if _fields(texts[name], platform) != golden_fields:
+						mismatches.append(name)
+				except Exception:
+					mismatches.append(name)
+
+		results.append(
+			{
+				"backend": backend.name,
+				"seconds": round(seconds, 4),
+				"ms_per_pdf": round(seconds * 1000 / len(corpus), 2),
+				"matches": not mismatches,
+				"errors": errors,
+				"mismatches": mismatches[:20],
+				"line_mismatches": line_mismatches[:20],
+			}
+		)
+		print(
+			f"{backend.name:<10} {seconds:8.3f}s  matches={not mismatches}  mismatches={len(mismatches)}  "
+			f"line_mismatches={len(line_mismatches)}"
+		)
+
+	matching = sorted((r for r in results if r["matches"]), key=lambda r: r["seconds"])
+	selected = matching[0]["backend"] if matching else None
+
+	if selected and cint(save):
+		from frappe.installer import update_site_config
+
+		update_site_config("invoice_pdf_backend", selected)
+
+	return {"pdfs": len(corpus), "selected": selected, "results": results}